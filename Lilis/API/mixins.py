@@ -0,0 +1,274 @@
+import hashlib
+from collections import defaultdict
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count, Max
+from django.utils.cache import get_conditional_response
+from django.utils.dateparse import parse_datetime
+from django.utils.http import http_date, quote_etag
+from django.utils import timezone
+from rest_framework import serializers, status
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework.validators import UniqueValidator
+from Main.cache import invalidar, version_modelo
+from Products.fulltext import CAMPOS_RELACIONADOS
+from Sells.services import InventarioService, TransactionService
+from .parsers import NDJSONParser
+
+
+def campos_solicitados(request):
+    if request is None:
+        return None
+    fields = request.query_params.get('fields')
+    if not fields:
+        return None
+    return [f.strip() for f in fields.split(',') if f.strip()]
+
+
+def filas_bulk(request):
+    filas = request.data
+    if not isinstance(filas, list):
+        raise ValidationError({'detail': 'Se espera una lista de objetos o NDJSON.'})
+    if len(filas) > settings.API_BULK_MAX_FILAS:
+        raise ValidationError({'detail': f'Máximo {settings.API_BULK_MAX_FILAS} filas por solicitud.'})
+    return filas
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def to_internal_value(self, data):
+        relacionados = self.context.get('relacionados', {}).get(self.field_name)
+        if relacionados is None:
+            return super().to_internal_value(data)
+        try:
+            obj = relacionados.get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class SparseFieldsMixin:
+    serializer_related_field = BulkPrimaryKeyRelatedField
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        campos = campos_solicitados(self.context.get('request'))
+        if campos is None:
+            return
+        desconocidos = set(campos) - set(self.fields)
+        if desconocidos:
+            raise ValidationError({'fields': f"Campos desconocidos: {', '.join(sorted(desconocidos))}"})
+        for nombre in set(self.fields) - set(campos):
+            self.fields.pop(nombre)
+
+
+class DeltaConditionalMixin:
+    updated_field = 'updated_at'
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        updated_since = self.request.query_params.get('updated_since')
+        if updated_since:
+            fecha = parse_datetime(updated_since)
+            if fecha is None:
+                raise ValidationError({'updated_since': 'Fecha inválida, use formato ISO 8601.'})
+            if timezone.is_naive(fecha):
+                fecha = timezone.make_aware(fecha)
+            qs = qs.filter(**{f'{self.updated_field}__gt': fecha})
+        campos = campos_solicitados(self.request)
+        if campos:
+            modelo = {f.name for f in qs.model._meta.concrete_fields}
+            qs = qs.only(*({'id', self.updated_field} | (set(campos) & modelo)))
+        return qs
+
+    def validadores(self, qs):
+        resumen = qs.order_by().aggregate(ultimo=Max(self.updated_field), total=Count('id'))
+        firma = f"{self.request.get_full_path()}|{resumen['ultimo']}|{resumen['total']}"
+        etag = quote_etag(hashlib.md5(firma.encode()).hexdigest())
+        ultimo = resumen['ultimo']
+        return etag, int(ultimo.timestamp()) if ultimo else None
+
+    def condicional(self, qs, generar):
+        etag, ultimo = self.validadores(qs)
+        response = get_conditional_response(self.request._request, etag=etag, last_modified=ultimo)
+        if response is None:
+            response = generar()
+        response['ETag'] = etag
+        if ultimo is not None:
+            response['Last-Modified'] = http_date(ultimo)
+        response['Cache-Control'] = 'private, no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        qs = self.filter_queryset(self.get_queryset())
+        return self.condicional(qs, lambda: super(DeltaConditionalMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        qs = self.filter_queryset(self.get_queryset()).filter(**{self.lookup_field: kwargs[lookup]})
+        return self.condicional(qs, lambda: super(DeltaConditionalMixin, self).retrieve(request, *args, **kwargs))
+
+
+class BulkUpsertMixin:
+    bulk_key = None
+    bulk_modos = ('upsert', 'create', 'update')
+    transaction_service = TransactionService()
+
+    def bulk_serializer(self, relacionados):
+        serializer = self.get_serializer_class()(context={**self.get_serializer_context(), 'relacionados': relacionados})
+        campo = serializer.fields[self.bulk_key]
+        campo.validators = [v for v in campo.validators if not isinstance(v, UniqueValidator)]
+        for field in serializer.fields.values():
+            if isinstance(field, serializers.FileField):
+                field.read_only = True
+        return serializer
+
+    def bulk_relacionados(self, filas):
+        relacionados = {}
+        serializer = self.get_serializer_class()()
+        for nombre, field in serializer.fields.items():
+            if isinstance(field, serializers.PrimaryKeyRelatedField) and not field.read_only:
+                ids = set()
+                for fila in filas:
+                    try:
+                        ids.add(int(fila[nombre]))
+                    except (KeyError, TypeError, ValueError):
+                        pass
+                relacionados[nombre] = field.get_queryset().in_bulk(ids)
+        return relacionados
+
+    def bulk_claves(self, serializer, filas):
+        campo = serializer.fields[self.bulk_key]
+        claves = {}
+        for indice, fila in enumerate(filas):
+            if not isinstance(fila, dict) or fila.get(self.bulk_key) is None:
+                continue
+            try:
+                claves[indice] = campo.to_internal_value(fila[self.bulk_key])
+            except ValidationError as e:
+                claves[indice] = e
+        return claves
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        modo = request.query_params.get('modo', 'upsert')
+        if modo not in self.bulk_modos:
+            raise ValidationError({'modo': f"Modo inválido, use {', '.join(self.bulk_modos)}."})
+        filas = filas_bulk(request)
+        model = self.get_queryset().model
+        key = self.bulk_key
+
+        serializer = self.bulk_serializer(self.bulk_relacionados([f for f in filas if isinstance(f, dict)]))
+        claves = self.bulk_claves(serializer, filas)
+        existentes = model.objects.filter(
+            **{f'{key}__in': [c for c in claves.values() if not isinstance(c, ValidationError)]}
+        ).in_bulk(field_name=key)
+
+        resultados = []
+        nuevos = []
+        actualizados = []
+        campos_actualizados = set()
+        campos_busqueda = CAMPOS_RELACIONADOS.get(model._meta.label_lower, (None, ()))[1]
+        renombrados = []
+        vistos = set()
+        ahora = timezone.now()
+        for indice, fila in enumerate(filas):
+            resultado = {'indice': indice, 'clave': fila.get(key) if isinstance(fila, dict) else None}
+            resultados.append(resultado)
+            if not isinstance(fila, dict):
+                resultado.update(estado='error', errores={'detail': 'Se espera un objeto.'})
+                continue
+            clave = claves.get(indice)
+            if isinstance(clave, ValidationError):
+                resultado.update(estado='error', errores={key: clave.detail})
+                continue
+            instancia = existentes.get(clave)
+            if clave in vistos:
+                resultado.update(estado='error', errores={key: ['Clave repetida en la solicitud.']})
+                continue
+            if modo == 'create' and instancia is not None:
+                resultado.update(estado='error', errores={key: ['Ya existe.']})
+                continue
+            if modo == 'update' and instancia is None:
+                resultado.update(estado='error', errores={key: ['No existe.']})
+                continue
+            serializer.instance = instancia
+            serializer.partial = instancia is not None
+            try:
+                datos = serializer.run_validation(fila)
+            except ValidationError as e:
+                resultado.update(estado='error', errores=e.detail)
+                continue
+            vistos.add(datos.get(key, clave))
+            if instancia is None:
+                nuevos.append((resultado, model(**datos, updated_at=ahora), frozenset(datos)))
+            else:
+                if any(campo in datos and datos[campo] != getattr(instancia, campo) for campo in campos_busqueda):
+                    renombrados.append(instancia.pk)
+                for campo, valor in datos.items():
+                    setattr(instancia, campo, valor)
+                instancia.updated_at = ahora
+                campos_actualizados.update(datos)
+                actualizados.append((resultado, instancia))
+
+        chunk_size = settings.API_BULK_CHUNK_SIZE
+        with transaction.atomic():
+            if modo == 'upsert':
+                grupos = defaultdict(list)
+                for _, obj, campos in nuevos:
+                    grupos[campos].append(obj)
+                for campos, objs in grupos.items():
+                    opciones = {'update_conflicts': True, 'update_fields': sorted(campos - {key}) + ['updated_at']}
+                    if connection.features.supports_update_conflicts_with_target:
+                        opciones['unique_fields'] = [key]
+                    model.objects.bulk_create(objs, batch_size=chunk_size, **opciones)
+            elif nuevos:
+                model.objects.bulk_create([obj for _, obj, _ in nuevos], batch_size=chunk_size)
+            if actualizados:
+                campos_actualizados.discard(key)
+                campos_actualizados.add('updated_at')
+                model.objects.bulk_update([obj for _, obj in actualizados], list(campos_actualizados), batch_size=chunk_size)
+            transaction.on_commit(lambda: invalidar('catalogos', version_modelo(model)))
+            if renombrados:
+                transaction.on_commit(lambda: self.transaction_service.actualizar_documentos_relacionados(model, renombrados))
+
+        ids = model.objects.filter(**{f'{key}__in': [getattr(obj, key) for _, obj, _ in nuevos]}).in_bulk(field_name=key)
+        for resultado, obj, _ in nuevos:
+            resultado.update(estado='creado', id=ids[getattr(obj, key)].pk)
+        for resultado, obj in actualizados:
+            resultado.update(estado='actualizado', id=obj.pk)
+
+        resumen = {estado: sum(1 for r in resultados if r['estado'] == estado) for estado in ('creado', 'actualizado', 'error')}
+        codigo = status.HTTP_200_OK if not resumen['error'] else status.HTTP_207_MULTI_STATUS
+        return Response({'resumen': resumen, 'resultados': resultados}, status=codigo)
+
+
+class ChangeTokenMixin:
+    bodega_field = None
+    inventario_service = InventarioService()
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        desde = self.request.query_params.get('desde')
+        if desde:
+            try:
+                qs = self.inventario_service.cambios_desde(qs, int(desde))
+            except (ValueError, OverflowError):
+                raise ValidationError({'desde': 'Token inválido.'})
+        bodega = self.request.query_params.get('bodega')
+        if bodega and self.bodega_field:
+            if not bodega.isdigit():
+                raise ValidationError({'bodega': 'Bodega inválida.'})
+            qs = qs.filter(**{self.bodega_field: bodega})
+        return qs
+
+    def list(self, request, *args, **kwargs):
+        token = self.inventario_service.token_cambios()
+        response = super().list(request, *args, **kwargs)
+        response.data['token'] = str(token)
+        return response
+
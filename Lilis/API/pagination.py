@@ -0,0 +1,16 @@
+from rest_framework.pagination import CursorPagination
+
+
+class UpdatedCursorPagination(CursorPagination):
+    ordering = ('updated_at', 'id')
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
+
+class IdCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 100
+    page_size_query_param = 'page_size'
+    max_page_size = 1000
+
@@ -0,0 +1,19 @@
+import json
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+
+
+class NDJSONParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        filas = []
+        for numero, linea in enumerate(stream, start=1):
+            linea = linea.strip()
+            if not linea:
+                continue
+            try:
+                filas.append(json.loads(linea))
+            except ValueError as e:
+                raise ParseError(f'Línea {numero} inválida: {e}')
+        return filas
@@ -0,0 +1,12 @@
+from rest_framework.permissions import SAFE_METHODS, BasePermission
+from Main.permisos import autorizacion
+
+
+class EnGrupo(BasePermission):
+    message = 'No tienes permiso para realizar esta acción.'
+
+    def has_permission(self, request, view):
+        grupos = view.required_group
+        if request.method not in SAFE_METHODS:
+            grupos = getattr(view, 'write_group', None) or grupos
+        return autorizacion(request.user).en_grupo(*grupos)
@@ -1,18 +1,66 @@
+from decimal import Decimal
 from rest_framework import serializers
-from Products.models import Producto, Supplier
+from Products.models import Producto, Supplier, RawMaterialClass, Inventario, Lote, Serie, Transaction, TransactionDetail
 from Accounts.models import Lilis
+from .mixins import SparseFieldsMixin
 
-class ProductSerializer(serializers.ModelSerializer):
+class ProductSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Producto
         fields = '__all__'
 
-class SupplierSerializer(serializers.ModelSerializer):
+class SupplierSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     class Meta:
         model = Supplier
         fields = '__all__'
 
+class RawMaterialSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = RawMaterialClass
+        fields = '__all__'
+
 class LilisSerializer(serializers.ModelSerializer):
     class Meta:
         model = Lilis
         fields = ['bussiness_name', 'fantasy_name', 'rut', 'email', 'phone', 'address','web_site']
+
+class InventarioSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    sku = serializers.CharField(read_only=True)
+
+    class Meta:
+        model = Inventario
+        fields = ['id', 'sku', 'producto', 'materia_prima', 'bodega', 'stock_total']
+
+class LoteSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Lote
+        fields = ['id', 'codigo', 'inventario', 'cantidad_actual', 'fecha_creacion', 'fecha_expiracion', 'origen']
+
+class SerieSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    class Meta:
+        model = Serie
+        fields = ['id', 'codigo', 'inventario', 'estado', 'fecha_creacion', 'fecha_expiracion']
+
+class TransactionDetailSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TransactionDetail
+        fields = ['code', 'batch', 'serie']
+
+class TransactionSerializer(SparseFieldsMixin, serializers.ModelSerializer):
+    details = TransactionDetailSerializer(many=True, read_only=True)
+
+    class Meta:
+        model = Transaction
+        fields = ['id', 'type', 'code', 'date', 'warehouse', 'client', 'quantity', 'expiration_date', 'notes', 'idempotency_key', 'details']
+
+class TransactionPostSerializer(serializers.Serializer):
+    type = serializers.ChoiceField(choices=['ingreso', 'salida', 'devolucion', 'transferencia', 'produccion'])
+    product = serializers.CharField()
+    quantity = serializers.DecimalField(max_digits=20, decimal_places=2, min_value=Decimal('0.01'))
+    warehouse = serializers.IntegerField(required=False, allow_null=True)
+    client = serializers.IntegerField(required=False, allow_null=True)
+    code = serializers.CharField(max_length=100)
+    expiration_date = serializers.DateField(required=False, allow_null=True)
+    notes = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    idempotency_key = serializers.CharField(max_length=64)
+
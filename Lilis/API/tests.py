@@ -1,3 +1,160 @@
-from django.test import TestCase
+import datetime
+from unittest import mock
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+from Accounts.models import Profile
+from Products.models import Category, MovimientoStock, Supplier, RawMaterialClass, Transaction
+from Sells.models import Warehouse
+from .views import supplier_view_set
 
-# Create your tests here.
+
+def usuario(username, *grupos):
+    user = User.objects.create_user(username, password='x')
+    for nombre in grupos:
+        user.groups.add(Group.objects.get_or_create(name=nombre)[0])
+    Profile.objects.create(user=user, run=username, is_new=False)
+    return user
+
+
+def cliente_api(user=None):
+    client = APIClient()
+    if user is not None:
+        client.force_authenticate(user)
+    return client
+
+
+class CatalogoPermisosTest(TestCase):
+    def setUp(self):
+        self.categoria = Category.objects.create(name='c')
+        self.filas = [{'rut': '9-9', 'bussiness_name': 'nuevo'}]
+
+    def test_bulk_anonimo_rechazado(self):
+        respuesta = cliente_api().post('/api/proveedores/bulk/', self.filas, format='json')
+        self.assertIn(respuesta.status_code, (401, 403))
+        self.assertFalse(Supplier.objects.filter(rut='9-9').exists())
+
+    def test_bulk_sin_grupo_rechazado(self):
+        respuesta = cliente_api(usuario('sin_grupo')).post('/api/proveedores/bulk/', self.filas, format='json')
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertFalse(Supplier.objects.filter(rut='9-9').exists())
+
+    def test_lectura_no_permite_escritura(self):
+        user = usuario('finanzas', 'Acceso limitado a Finanzas')
+        self.assertEqual(cliente_api(user).get('/api/proveedores/').status_code, 200)
+        respuesta = cliente_api(user).post('/api/proveedores/bulk/', self.filas, format='json')
+        self.assertEqual(respuesta.status_code, 403)
+
+    def test_bulk_con_grupo(self):
+        user = usuario('compras', 'Acceso limitado a Compras')
+        respuesta = cliente_api(user).post('/api/proveedores/bulk/', self.filas, format='json')
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertTrue(Supplier.objects.filter(rut='9-9').exists())
+
+
+class BulkUpsertTest(TestCase):
+    def setUp(self):
+        self.proveedor = Supplier.objects.create(rut='123', bussiness_name='original', email='a@b.cl', payment_terms_days=60)
+        self.client_api = cliente_api(usuario('compras', 'Acceso limitado a Compras'))
+
+    def bulk(self, filas, modo='upsert'):
+        return self.client_api.post(f'/api/proveedores/bulk/?modo={modo}', filas, format='json')
+
+    def test_clave_numerica_se_normaliza(self):
+        respuesta = self.bulk([{'rut': 123, 'bussiness_name': 'nuevo'}])
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertEqual(respuesta.json()['resultados'][0]['estado'], 'actualizado')
+        self.assertEqual(self.bulk([{'rut': 123, 'bussiness_name': 'x'}], modo='create').json()['resultados'][0]['estado'], 'error')
+
+    def test_claves_repetidas_reportadas_por_fila(self):
+        respuesta = self.bulk([{'rut': 456, 'bussiness_name': 'a'}, {'rut': ' 456', 'bussiness_name': 'b'}, {'rut': {}, 'bussiness_name': 'c'}])
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([r['estado'] for r in respuesta.json()['resultados']], ['creado', 'error', 'error'])
+        self.assertEqual(Supplier.objects.get(rut='456').bussiness_name, 'a')
+
+    def test_conflicto_solo_actualiza_campos_enviados(self):
+        with mock.patch.object(supplier_view_set, 'bulk_claves', return_value={}):
+            respuesta = self.bulk([{'rut': '123', 'bussiness_name': 'carrera'}])
+        self.assertEqual(respuesta.status_code, 200)
+        self.proveedor.refresh_from_db()
+        self.assertEqual(self.proveedor.bussiness_name, 'carrera')
+        self.assertEqual(self.proveedor.email, 'a@b.cl')
+        self.assertEqual(self.proveedor.payment_terms_days, 60)
+
+
+class TransaccionesBulkTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        proveedor = Supplier.objects.create(bussiness_name='s', rut='1-1')
+        self.materia_prima = RawMaterialClass.objects.create(sku='R1', name='r', category=categoria, supplier=proveedor, batch_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+
+    def fila(self, clave, **kwargs):
+        return {
+            'type': 'ingreso', 'product': str(self.materia_prima.id), 'quantity': '5',
+            'warehouse': self.bodega.id, 'code': clave, 'idempotency_key': clave, **kwargs,
+        }
+
+    def test_renombrar_materia_prima_actualiza_busqueda(self):
+        user = usuario('ventas', 'Acceso limitado a Ventas', 'Acceso limitado a Compras')
+        cliente_api(user).post('/api/transacciones/bulk/', [self.fila('k1')], format='json')
+        with self.captureOnCommitCallbacks(execute=True):
+            respuesta = cliente_api(user).post(
+                '/api/materias_primas/bulk/?modo=update', [{'sku': 'R1', 'name': 'renombrada'}], format='json',
+            )
+        self.assertEqual(respuesta.status_code, 200)
+        self.assertIn('renombrada', Transaction.objects.get(code='k1').search_document)
+
+    def test_sin_grupo_rechazado(self):
+        respuesta = cliente_api(usuario('sin_grupo')).post('/api/transacciones/bulk/', [self.fila('k1')], format='json')
+        self.assertEqual(respuesta.status_code, 403)
+        self.assertFalse(Transaction.objects.exists())
+
+    def test_fila_invalida_reportada_por_fila(self):
+        user = usuario('ventas', 'Acceso limitado a Ventas')
+        filas = [
+            self.fila('k1'),
+            self.fila('k2', type='transferencia', product=f'producto-{self.materia_prima.id}'),
+            self.fila('k3'),
+        ]
+        respuesta = cliente_api(user).post('/api/transacciones/bulk/', filas, format='json')
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([r['estado'] for r in respuesta.json()['resultados']], ['creado', 'error', 'creado'])
+        self.assertEqual(Transaction.objects.count(), 2)
+
+    def test_item_inexistente_o_mal_formado_es_error_de_fila(self):
+        user = usuario('ventas', 'Acceso limitado a Ventas')
+        filas = [self.fila('k1', product='999999'), self.fila('k2', type='salida', product='sin-guion-extra'), self.fila('k3')]
+        respuesta = cliente_api(user).post('/api/transacciones/bulk/', filas, format='json')
+        self.assertEqual(respuesta.status_code, 207)
+        self.assertEqual([r['estado'] for r in respuesta.json()['resultados']], ['error', 'error', 'creado'])
+
+    def test_error_inesperado_se_registra_y_propaga(self):
+        user = usuario('ventas', 'Acceso limitado a Ventas')
+        with mock.patch('API.views.transaction_service.crear_transaccion', side_effect=RuntimeError('bug')):
+            with self.assertLogs('API.views', level='ERROR'), self.assertRaises(RuntimeError):
+                cliente_api(user).post('/api/transacciones/bulk/', [self.fila('k1')], format='json')
+
+
+@override_settings(SYNC_MARGEN_SEGUNDOS=0)
+class ChangeTokenTest(TestCase):
+    def setUp(self):
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.antigua = Transaction.objects.create(type='salida', code='T0', warehouse=self.bodega)
+        Transaction.objects.filter(pk=self.antigua.pk).update(updated_at=timezone.now() - datetime.timedelta(minutes=1))
+        self.client_api = cliente_api(usuario('ventas', 'Acceso limitado a Ventas'))
+        self.token = self.client_api.get('/api/transacciones/').json()['token']
+
+    def ids_desde(self):
+        return [t['id'] for t in self.client_api.get(f'/api/transacciones/?desde={self.token}').json()['results']]
+
+    def test_cambios_sin_movimiento_de_stock(self):
+        nueva = Transaction.objects.create(type='salida', code='T1', warehouse=self.bodega)
+        self.antigua.notes = 'editada'
+        self.antigua.save()
+        self.assertFalse(MovimientoStock.objects.exists())
+        self.assertCountEqual(self.ids_desde(), [self.antigua.pk, nueva.pk])
+
+    def test_token_invalido(self):
+        self.assertEqual(self.client_api.get('/api/transacciones/?desde=abc').status_code, 400)
@@ -6,7 +6,12 @@ from rest_framework.authtoken.views import obtain_auth_token
 router = routers.DefaultRouter()
 router.register(r'productos', views.producto_view_set)
 router.register(r'proveedores', views.supplier_view_set)
+router.register(r'materias_primas', views.raw_material_view_set)
 router.register(r'lilis', views.LilisViewSet)
+router.register(r'inventarios', views.inventario_view_set)
+router.register(r'lotes', views.lote_view_set)
+router.register(r'series', views.serie_view_set)
+router.register(r'transacciones', views.transaction_view_set)
 
 urlpatterns = [
     path('health/', views.health, name='health'),
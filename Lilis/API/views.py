@@ -1,19 +1,50 @@
+import logging
+from decimal import InvalidOperation
+from django.core.exceptions import ObjectDoesNotExist
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
 import Lilis
-from Sells.services import WarehouseService
+from Sells.services import WarehouseService, TransactionService
 from django.views import View
 from Sells.views import warehouse_to_dict
 from rest_framework import viewsets
-from .serializers import ProductSerializer, SupplierSerializer, LilisSerializer
+from .serializers import (
+    ProductSerializer, SupplierSerializer, RawMaterialSerializer, LilisSerializer,
+    InventarioSerializer, LoteSerializer, SerieSerializer, TransactionSerializer, TransactionPostSerializer,
+)
+from .mixins import BulkUpsertMixin, ChangeTokenMixin, DeltaConditionalMixin, filas_bulk
+from .pagination import IdCursorPagination, UpdatedCursorPagination
+from .parsers import NDJSONParser
+from rest_framework.decorators import action
+from rest_framework.parsers import JSONParser
+from rest_framework.response import Response
+from rest_framework import status
+from django.db.models.functions import Coalesce
 from rest_framework.permissions import IsAuthenticated
+from .permissions import EnGrupo
 from .forms import LilisForm
-import requests
+from Accounts.services import LilisService
 from Main.mixins import StaffRequiredMixin, GroupRequiredMixin
 
 from API import serializers
 
-API_ENDPOINT = 'http://3.228.61.121/api/lilis/'
+logger = logging.getLogger(__name__)
+
+lilis_service = LilisService()
+transaction_service = TransactionService()
+
+GRUPOS_CATALOGO = (
+    'Acceso Completo',
+    'Acceso limitado a Compras',
+    'Acceso limitado a Inventario',
+    'Acceso limitado a Produccion',
+    'Acceso limitado a Finanzas',
+)
+GRUPOS_CATALOGO_ESCRITURA = (
+    'Acceso Completo',
+    'Acceso limitado a Compras',
+    'Acceso limitado a Inventario',
+)
 
 def health(request):
     return JsonResponse({'status': 'ok'})
@@ -22,14 +53,118 @@ def info(request):
     return JsonResponse({'name': 'Lilis', 'version': '1.0', 'autor': 'imVic'})
 
 
-class producto_view_set(viewsets.ModelViewSet):
+class producto_view_set(BulkUpsertMixin, DeltaConditionalMixin, viewsets.ModelViewSet):
     queryset = ProductSerializer.Meta.model.objects.all()
     serializer_class = ProductSerializer
-    permission_classes = [IsAuthenticated]
+    permission_classes = [IsAuthenticated, EnGrupo]
+    pagination_class = UpdatedCursorPagination
+    required_group = GRUPOS_CATALOGO
+    write_group = GRUPOS_CATALOGO_ESCRITURA
+    bulk_key = 'sku'
 
-class supplier_view_set(viewsets.ModelViewSet):
+class supplier_view_set(BulkUpsertMixin, DeltaConditionalMixin, viewsets.ModelViewSet):
     queryset = SupplierSerializer.Meta.model.objects.all()
     serializer_class = SupplierSerializer
+    permission_classes = [IsAuthenticated, EnGrupo]
+    pagination_class = UpdatedCursorPagination
+    required_group = GRUPOS_CATALOGO
+    write_group = GRUPOS_CATALOGO_ESCRITURA
+    bulk_key = 'rut'
+
+class raw_material_view_set(BulkUpsertMixin, DeltaConditionalMixin, viewsets.ModelViewSet):
+    queryset = RawMaterialSerializer.Meta.model.objects.all()
+    serializer_class = RawMaterialSerializer
+    permission_classes = [IsAuthenticated, EnGrupo]
+    pagination_class = UpdatedCursorPagination
+    required_group = GRUPOS_CATALOGO
+    write_group = GRUPOS_CATALOGO_ESCRITURA
+    bulk_key = 'sku'
+
+class inventario_view_set(ChangeTokenMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = InventarioSerializer.Meta.model.objects.annotate(sku=Coalesce('producto__sku', 'materia_prima__sku'))
+    serializer_class = InventarioSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+    bodega_field = 'bodega'
+
+class lote_view_set(ChangeTokenMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = LoteSerializer.Meta.model.objects.all()
+    serializer_class = LoteSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+    bodega_field = 'inventario__bodega'
+
+class serie_view_set(ChangeTokenMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = SerieSerializer.Meta.model.objects.all()
+    serializer_class = SerieSerializer
+    permission_classes = [IsAuthenticated]
+    pagination_class = IdCursorPagination
+    bodega_field = 'inventario__bodega'
+
+class transaction_view_set(ChangeTokenMixin, viewsets.ReadOnlyModelViewSet):
+    queryset = TransactionSerializer.Meta.model.objects.prefetch_related('details')
+    serializer_class = TransactionSerializer
+    permission_classes = [IsAuthenticated, EnGrupo]
+    pagination_class = IdCursorPagination
+    bodega_field = 'warehouse'
+    required_group = (
+        'Acceso Completo',
+        'Acceso limitado a Ventas',
+        'Acceso limitado a Produccion',
+        'Acceso limitado a Finanzas',
+    )
+    write_group = (
+        'Acceso Completo',
+        'Acceso limitado a Ventas',
+        'Acceso limitado a Produccion',
+    )
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        filas = filas_bulk(request)
+        claves = [f.get('idempotency_key') for f in filas if isinstance(f, dict)]
+        existentes = dict(
+            transaction_service.model.objects
+            .filter(idempotency_key__in=[c for c in claves if isinstance(c, str)])
+            .values_list('idempotency_key', 'id')
+        )
+        profile = getattr(request.user, 'profile', None)
+        resultados = []
+        for indice, fila in enumerate(filas):
+            resultado = {'indice': indice, 'idempotency_key': fila.get('idempotency_key') if isinstance(fila, dict) else None}
+            resultados.append(resultado)
+            serializer = TransactionPostSerializer(data=fila)
+            if not serializer.is_valid():
+                resultado.update(estado='error', errores=serializer.errors)
+                continue
+            data = {
+                'warehouse': None, 'client': None,
+                'expiration_date': None, 'notes': None,
+                **serializer.validated_data,
+                'user': profile,
+            }
+            if data['idempotency_key'] in existentes:
+                resultado.update(estado='existente', id=existentes[data['idempotency_key']])
+                continue
+            try:
+                ok, transaction = transaction_service.crear_transaccion(data)
+            except (ObjectDoesNotExist, ValueError, InvalidOperation):
+                ok, transaction = False, None
+            except Exception:
+                logger.exception('Error inesperado registrando la fila %s del bulk de transacciones', indice)
+                raise
+            if not ok:
+                resultado.update(estado='error', errores={'detail': 'No se pudo registrar el movimiento.'})
+                continue
+            existentes[data['idempotency_key']] = transaction.id
+            resultado.update(estado='creado', id=transaction.id)
+        resumen = {estado: sum(1 for r in resultados if r['estado'] == estado) for estado in ('creado', 'existente', 'error')}
+        codigo = status.HTTP_200_OK if not resumen['error'] else status.HTTP_207_MULTI_STATUS
+        return Response({
+            'resumen': resumen,
+            'resultados': resultados,
+            'token': str(transaction_service.inventario.token_cambios()),
+        }, status=codigo)
 
 class LilisViewSet(viewsets.ModelViewSet):
     queryset = LilisSerializer.Meta.model.objects.all()
@@ -47,27 +182,13 @@ class LilisDetailView(GroupRequiredMixin, View):
     warehouse_service = WarehouseService()
 
     def get(self, request):
-        try:
-            response = requests.get(API_ENDPOINT)
-            if response.status_code == 200:
-                lilis_data = response.json()
-                data = {
-                    'rut': lilis_data[0]['rut'],
-                    'bussiness_name': lilis_data[0]['bussiness_name'],
-                    'fantasy_name': lilis_data[0]['fantasy_name'],
-                    'email': lilis_data[0]['email'],
-                    'phone': lilis_data[0]['phone'],
-                    'address': lilis_data[0]['address'],
-                    'web_site': lilis_data[0]['web_site'],
-                    'warehouse': self.warehouse_service.list().filter(lilis=True)
-                }
-                context = {'b': data}
-                return render(request, 'lilis_detail.html', context)
-            else:
-                return render(request, 'lilis_detail.html', {'error': 'Error fetching data from API.'})
-        except requests.exceptions.RequestException as e:
-            print("Request Exception:", e)
-            return render(request, 'lilis_detail.html', {'error': 'Error connecting to API.'})
+        lilis_data = lilis_service.perfil()
+        if lilis_data is None:
+            return render(request, 'lilis_detail.html', {'error': 'Error fetching data from API.'})
+        data = dict(lilis_data)
+        data['warehouse'] = self.warehouse_service.list().filter(lilis=True)
+        context = {'b': data}
+        return render(request, 'lilis_detail.html', context)
     
 class LilisCreateView(StaffRequiredMixin, View):
     form_class = LilisForm
@@ -81,20 +202,12 @@ class LilisCreateView(StaffRequiredMixin, View):
     def post(self, request, *args, **kwargs):
         form = self.form_class(request.POST)
         if form.is_valid():
-            data = form.cleaned_data
-            try:
-                response = requests.post(API_ENDPOINT, json=data)
-                if response.status_code == 201:
-                    return redirect('lilis_detail')
-                else:
-                    error_api = response.json()
-                    print("Error API:", error_api)
-                    context = {'form': form, 'api_error': error_api}
-                    return render(request, self.template_name, context)
-            except requests.exceptions.RequestException as e:
-                print("Request Exception:", e)
-                context = {'form': form, 'api_error': 'Error connecting to API.'}
-                return render(request, self.template_name, context)
+            ok, error_api = lilis_service.guardar(form.cleaned_data)
+            if ok:
+                return redirect('lilis_detail')
+            print("Error API:", error_api)
+            context = {'form': form, 'api_error': error_api}
+            return render(request, self.template_name, context)
         else:
             context = {'form': form}
             return render(request, self.template_name, context)
@@ -107,37 +220,22 @@ class LilisUpdateView(GroupRequiredMixin, View):
     template_name = 'lilis_update.html'
 
     def get(self, request, *args, **kwargs):
-        try:
-            response = requests.get(API_ENDPOINT)
-            if response.status_code == 200:
-                lilis_data = response.json()[0]
-                form = self.form_class(initial=lilis_data)
-                context = {'form': form}
-                return render(request, self.template_name, context)
-            else:
-                return render(request, self.template_name, {'error': 'Error fetching data from API.'})
-        except requests.exceptions.RequestException as e:
-            print("Request Exception:", e)
-            return render(request, self.template_name, {'error': 'Error connecting to API.'})
+        lilis_data = lilis_service.perfil()
+        if lilis_data is None:
+            return render(request, self.template_name, {'error': 'Error fetching data from API.'})
+        form = self.form_class(initial=lilis_data)
+        context = {'form': form}
+        return render(request, self.template_name, context)
     
     def post(self, request, *args, **kwargs):
         form = self.form_class(request.POST)
         if form.is_valid():
-            data = form.cleaned_data
-            try:
-                API_DETAIL_ENDPOINT = f"{API_ENDPOINT}1/"
-                response = requests.put(API_DETAIL_ENDPOINT, json=data)
-                if response.status_code == 200:
-                    return redirect('lilis_detail')
-                else:
-                    error_api = response.json()
-                    print("Error API:", error_api)
-                    context = {'form': form, 'api_error': error_api}
-                    return render(request, self.template_name, context)
-            except requests.exceptions.RequestException as e:
-                print("Request Exception:", e)
-                context = {'form': form, 'api_error': 'Error connecting to API.'}
-                return render(request, self.template_name, context)
+            ok, error_api = lilis_service.guardar(form.cleaned_data)
+            if ok:
+                return redirect('lilis_detail')
+            print("Error API:", error_api)
+            context = {'form': form, 'api_error': error_api}
+            return render(request, self.template_name, context)
         else:
             context = {'form': form}
             return render(request, self.template_name, context)
@@ -1,11 +1,15 @@
 from .forms import RegistroForm, UserForm, ProfileForm, UpdateFieldForm, RoleForm
 from django.contrib.auth.models import User, Group
-from .models import Profile, password_reset_token,Role
+from .models import Profile, password_reset_token,Role, Lilis
 from Main.CRUD import CRUD
 import re
 from django.core.mail import send_mail
 from django.conf import settings
 import random
+import threading
+import time
+import requests
+from django.core.cache import cache
 
 class UserService(CRUD ):
     def __init__(self):
@@ -187,3 +191,105 @@ class UserService(CRUD ):
             return True
         except:
             return False
+
+
+LILIS_CACHE_KEY = 'lilis:perfil'
+LILIS_CAMPOS = ('rut', 'bussiness_name', 'fantasy_name', 'email', 'phone', 'address', 'web_site')
+
+
+class LilisService(CRUD):
+    fallos = 0
+    abierto_hasta = 0
+    circuito_lock = threading.Lock()
+
+    def __init__(self):
+        self.model = Lilis
+
+    def remoto(self):
+        return settings.LILIS_PERFIL_MODO == 'remoto'
+
+    def perfil(self):
+        perfil = cache.get(LILIS_CACHE_KEY)
+        if perfil is None:
+            perfil = self.perfil_remoto() if self.remoto() else self.perfil_local()
+            if perfil is not None:
+                cache.set(LILIS_CACHE_KEY, perfil, settings.LILIS_PERFIL_CACHE_TTL)
+        return perfil
+
+    def perfil_local(self):
+        return self.model.objects.order_by('id').values(*LILIS_CAMPOS).first()
+
+    def circuito_abierto(self):
+        with LilisService.circuito_lock:
+            return LilisService.abierto_hasta > time.monotonic()
+
+    def registrar_fallo(self):
+        with LilisService.circuito_lock:
+            LilisService.fallos += 1
+            if LilisService.fallos >= settings.LILIS_CIRCUITO_UMBRAL:
+                LilisService.abierto_hasta = time.monotonic() + settings.LILIS_CIRCUITO_ENFRIAMIENTO
+                LilisService.fallos = 0
+
+    def registrar_exito(self):
+        with LilisService.circuito_lock:
+            LilisService.fallos = 0
+
+    def llamar_api(self, metodo, url, **kwargs):
+        if self.circuito_abierto():
+            raise requests.exceptions.ConnectionError('Circuito abierto')
+        try:
+            response = requests.request(metodo, url, timeout=settings.LILIS_API_TIMEOUT, **kwargs)
+        except requests.exceptions.RequestException:
+            self.registrar_fallo()
+            raise
+        if response.status_code >= 500:
+            self.registrar_fallo()
+        else:
+            self.registrar_exito()
+        return response
+
+    def perfil_remoto(self):
+        try:
+            response = self.llamar_api('GET', settings.LILIS_API_ENDPOINT)
+            if response.status_code != 200:
+                return None
+            data = response.json()
+        except (requests.exceptions.RequestException, ValueError):
+            return None
+        if not data:
+            return None
+        return {campo: data[0].get(campo) for campo in LILIS_CAMPOS}
+
+    def invalidar(self):
+        cache.delete(LILIS_CACHE_KEY)
+
+    def guardar(self, data):
+        data = {campo: data.get(campo) for campo in LILIS_CAMPOS}
+        if self.remoto():
+            return self.guardar_remoto(data)
+        lilis = self.model.objects.order_by('id').first()
+        if lilis is None:
+            lilis = self.model(**data)
+        else:
+            for campo, valor in data.items():
+                setattr(lilis, campo, valor)
+        lilis.save()
+        cache.set(LILIS_CACHE_KEY, data, settings.LILIS_PERFIL_CACHE_TTL)
+        return True, None
+
+    def guardar_remoto(self, data):
+        actual = self.perfil_remoto()
+        try:
+            if actual is None:
+                response = self.llamar_api('POST', settings.LILIS_API_ENDPOINT, json=data)
+            else:
+                response = self.llamar_api('PUT', f"{settings.LILIS_API_ENDPOINT}1/", json=data)
+        except requests.exceptions.RequestException:
+            return False, 'Error connecting to API.'
+        if response.status_code not in (200, 201):
+            try:
+                return False, response.json()
+            except ValueError:
+                return False, 'Error fetching data from API.'
+        cache.set(LILIS_CACHE_KEY, data, settings.LILIS_PERFIL_CACHE_TTL)
+        return True, None
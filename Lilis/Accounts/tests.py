@@ -1,3 +1,64 @@
-from django.test import TestCase
+import threading
+from unittest import mock
+import requests
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from .models import Lilis
+from .services import LILIS_CACHE_KEY, LilisService
 
-# Create your tests here.
+
+class LilisServiceTest(TestCase):
+    def setUp(self):
+        cache.delete(LILIS_CACHE_KEY)
+        self.addCleanup(cache.delete, LILIS_CACHE_KEY)
+        LilisService.fallos, LilisService.abierto_hasta = 0, 0
+        self.addCleanup(setattr, LilisService, 'abierto_hasta', 0)
+        self.addCleanup(setattr, LilisService, 'fallos', 0)
+        self.service = LilisService()
+
+    def test_perfil_local_sin_http_y_cacheado(self):
+        lilis = Lilis.objects.create(rut='1-9', bussiness_name='Lilis')
+        with mock.patch('Accounts.services.requests.request') as request:
+            self.assertEqual(self.service.perfil()['bussiness_name'], 'Lilis')
+            Lilis.objects.filter(id=lilis.id).update(bussiness_name='Sin señal')
+            self.assertEqual(self.service.perfil()['bussiness_name'], 'Lilis')
+        request.assert_not_called()
+
+    @override_settings(LILIS_PERFIL_MODO='remoto', LILIS_CIRCUITO_UMBRAL=2, LILIS_CIRCUITO_ENFRIAMIENTO=30)
+    def test_circuito_se_abre_y_espera_el_enfriamiento(self):
+        ahora = [1000.0]
+        with mock.patch('Accounts.services.time.monotonic', side_effect=lambda: ahora[0]), \
+                mock.patch('Accounts.services.requests.request', side_effect=requests.exceptions.ConnectionError) as request:
+            self.assertIsNone(self.service.perfil_remoto())
+            self.assertIsNone(self.service.perfil_remoto())
+            self.assertEqual(request.call_count, 2)
+            self.assertTrue(self.service.circuito_abierto())
+            ahora[0] += 29
+            self.assertIsNone(self.service.perfil_remoto())
+            self.assertEqual(request.call_count, 2)
+            ahora[0] += 2
+            self.assertFalse(self.service.circuito_abierto())
+            self.assertIsNone(self.service.perfil_remoto())
+            self.assertEqual(request.call_count, 3)
+
+    @override_settings(LILIS_CIRCUITO_UMBRAL=10000)
+    def test_fallos_concurrentes_no_se_pierden(self):
+        def fallar():
+            for _ in range(500):
+                self.service.registrar_fallo()
+
+        hilos = [threading.Thread(target=fallar) for _ in range(8)]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(LilisService.fallos, 4000)
+
+    def test_guardar_refresca_la_cache(self):
+        Lilis.objects.create(rut='1-9', bussiness_name='Lilis')
+        self.service.perfil()
+        ok, _ = self.service.guardar({'rut': '1-9', 'bussiness_name': 'Nueva'})
+        self.assertTrue(ok)
+        self.assertEqual(cache.get(LILIS_CACHE_KEY)['bussiness_name'], 'Nueva')
+        self.assertEqual(self.service.perfil()['bussiness_name'], 'Nueva')
+        self.assertEqual(Lilis.objects.get().bussiness_name, 'Nueva')
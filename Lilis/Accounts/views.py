@@ -5,8 +5,7 @@ from django.contrib.auth.decorators import login_required
 from Main.decorator import permission_or_redirect
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
 from django.db.models import Q
-from Main.utils import generate_excel_response
-from Main.mixins import GroupRequiredMixin
+from Main.mixins import GroupRequiredMixin, ExportMixin
 from django.views.generic import View, ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from .forms import RegistrarUsuarioForm
@@ -139,13 +138,25 @@ class UserListView(GroupRequiredMixin, ListView):
             per_page = default_per_page
         return per_page
 
-class export_users_excel(GroupRequiredMixin, View):
+class export_users_excel(GroupRequiredMixin, ExportMixin, View):
     required_group =('Acceso Completo',)
     
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
-        limit = request.GET.get("limit")
-        qs = user_service.list().select_related("profile", "profile__role").order_by("username")
+    headers = [
+        "Nombre de Usuario",
+        "Nombre",
+        "Apellido",
+        "Email",
+        "Run",
+        "Rol",
+        "¿Activo?",
+        "Fecha de Creación",
+    ]
+    filename_prefix = "Lilis_Usuarios"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
+        limit = params.get("limit")
+        qs = user_service.list().select_related("profile", "profile__role__group").order_by("username")
         if q:
             qs = qs.filter(
             Q(first_name__icontains=q) |
@@ -160,30 +171,19 @@ class export_users_excel(GroupRequiredMixin, View):
                 qs = qs[:limit]
             except ValueError:
                 pass
-        headers = [
-            "Nombre de Usuario",
-            "Nombre",
-            "Apellido",
-            "Email",
-            "Run",
-            "Rol",
-            "¿Activo?",
-            "Fecha de Creación",
-        ]
-        data_rows = []
-        for user in qs:
-            data_rows.append([
-                user.username,
-                user.first_name,
-                user.last_name,
-                user.email,
-                user.profile.run if hasattr(user, 'profile') else '',
-                user.profile.role.group.name if hasattr(user, 'profile') and user.profile.role else '',
-                "Si" if user.is_active else "No",
-                user.date_joined.strftime("%Y-%m-%d"),
-            ])
+        return qs
 
-        return generate_excel_response(headers, data_rows, "Lilis_Usuarios")
+    def export_row(self, user):
+        return [
+            user.username,
+            user.first_name,
+            user.last_name,
+            user.email,
+            user.profile.run if hasattr(user, 'profile') else '',
+            user.profile.role.group.name if hasattr(user, 'profile') and user.profile.role else '',
+            "Si" if user.is_active else "No",
+            user.date_joined.strftime("%Y-%m-%d"),
+        ]
 
 def token_verify(request):
     if request.method == 'POST':
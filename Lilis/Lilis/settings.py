@@ -22,7 +22,6 @@ DEBUG = os.getenv('DJANGO_DEBUG', 'False').lower() == 'true'
 ALLOWED_HOSTS = ['3.228.61.121','localhost','127.0.0.1','ec2-35-169-91-111.compute-1.amazonaws.com','35.169.91.111']
 
 
-DEBUG = True
 #ALLOWED_HOSTS = ['127.0.0.1', 'localhost']
 
 
@@ -99,6 +98,23 @@ DATABASES = {
             }
         }
     }
+
+# Cache compartida entre workers: las versiones de invalidación, los permisos y los catálogos
+# deben verse igual en todos los procesos. Redis si REDIS_URL está definido; si no, tabla en la BD.
+if os.getenv('REDIS_URL'):
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.getenv('REDIS_URL'),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+            'LOCATION': os.getenv('CACHE_TABLE', 'lilis_cache'),
+        }
+    }
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -165,3 +181,27 @@ EMAIL_HOST_USER = os.getenv('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
 DEFAULT_FROM_EMAIL = EMAIL_HOST_USER
 
+
+INVENTARIO_ESTRATEGIA_CONSUMO = os.getenv('INVENTARIO_ESTRATEGIA_CONSUMO', 'FEFO')
+KPIS_CACHE_TTL = int(os.getenv('KPIS_CACHE_TTL', 60))
+BOOTSTRAP_CACHE_TTL = int(os.getenv('BOOTSTRAP_CACHE_TTL', 300))
+CACHE_VERSION_TTL = int(os.getenv('CACHE_VERSION_TTL', 300))
+LILIS_PERFIL_MODO = os.getenv('LILIS_PERFIL_MODO', 'local')
+LILIS_PERFIL_CACHE_TTL = int(os.getenv('LILIS_PERFIL_CACHE_TTL', 300))
+LILIS_API_ENDPOINT = os.getenv('LILIS_API_ENDPOINT', 'http://3.228.61.121/api/lilis/')
+LILIS_API_TIMEOUT = float(os.getenv('LILIS_API_TIMEOUT', 2))
+LILIS_CIRCUITO_UMBRAL = int(os.getenv('LILIS_CIRCUITO_UMBRAL', 3))
+LILIS_CIRCUITO_ENFRIAMIENTO = int(os.getenv('LILIS_CIRCUITO_ENFRIAMIENTO', 30))
+EXPORT_WORKERS = int(os.getenv('EXPORT_WORKERS', 2))
+EXPORT_RETENCION_DIAS = int(os.getenv('EXPORT_RETENCION_DIAS', 7))
+EXPORT_ROOT = os.getenv('EXPORT_ROOT', str(BASE_DIR / 'private' / 'exports'))
+EXPORT_TIMEOUT_MINUTOS = int(os.getenv('EXPORT_TIMEOUT_MINUTOS', 30))
+API_BULK_MAX_FILAS = int(os.getenv('API_BULK_MAX_FILAS', 10000))
+API_BULK_CHUNK_SIZE = int(os.getenv('API_BULK_CHUNK_SIZE', 1000))
+SYNC_MARGEN_SEGUNDOS = int(os.getenv('SYNC_MARGEN_SEGUNDOS', 5))
+AUTORIZACION_CACHE_TTL = int(os.getenv('AUTORIZACION_CACHE_TTL', 600))
+AUTORIZACION_REVALIDAR_SEGUNDOS = int(os.getenv('AUTORIZACION_REVALIDAR_SEGUNDOS', 5))
+AUTORIZACION_LOCAL_MAX = int(os.getenv('AUTORIZACION_LOCAL_MAX', 1024))
+DASHBOARD_CACHE_TTL = int(os.getenv('DASHBOARD_CACHE_TTL', 300))
+CATALOGO_CACHE_TTL = int(os.getenv('CATALOGO_CACHE_TTL', 300))
+CATALOGO_LOCAL_MAX = int(os.getenv('CATALOGO_LOCAL_MAX', 32))
@@ -0,0 +1,120 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import DEFAULT_CACHE_ALIAS, cache, caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import HttpResponse
+
+_catalogos = OrderedDict()
+_catalogos_lock = threading.Lock()
+
+
+def _version_key(nombre):
+    return f'version:{nombre}'
+
+
+def _version_ttl():
+    return getattr(settings, 'CACHE_VERSION_TTL', 300)
+
+
+def cache_compartida():
+    return not isinstance(caches[DEFAULT_CACHE_ALIAS], (LocMemCache, DummyCache))
+
+
+def version(nombre):
+    key = _version_key(nombre)
+    valor = cache.get(key)
+    if valor is None:
+        cache.add(key, int(time.time() * 1000), _version_ttl())
+        valor = cache.get(key)
+    return valor
+
+
+def invalidar(*nombres):
+    for nombre in nombres:
+        key = _version_key(nombre)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.set(key, int(time.time() * 1000), _version_ttl())
+
+
+def version_modelo(model):
+    return f'modelo:{model._meta.label_lower}'
+
+
+def invalidar_modelos(*modelos):
+    invalidar(*(version_modelo(m) for m in modelos))
+
+
+def versiones(*nombres):
+    keys = [_version_key(n) for n in nombres]
+    encontrados = cache.get_many(keys)
+    return tuple(encontrados[k] if k in encontrados else version(n) for k, n in zip(keys, nombres))
+
+
+def leer_versionado(key, *nombres):
+    keys = [_version_key(n) for n in nombres]
+    encontrados = cache.get_many(keys + [key])
+    vigente = tuple(encontrados[k] if k in encontrados else version(n) for k, n in zip(keys, nombres))
+    guardado = encontrados.get(key)
+    if guardado is None or guardado[0] != vigente:
+        return vigente, None
+    return vigente, guardado[1]
+
+
+def guardar_versionado(key, vigente, valor, timeout):
+    cache.set(key, (vigente, valor), timeout)
+
+
+def _catalogo_local(nombre, vigente):
+    with _catalogos_lock:
+        entrada = _catalogos.get(nombre)
+        if entrada is None or entrada['versiones'] != vigente:
+            return None
+        _catalogos.move_to_end(nombre)
+        return entrada
+
+
+def _guardar_catalogo_local(nombre, entrada):
+    with _catalogos_lock:
+        _catalogos[nombre] = entrada
+        _catalogos.move_to_end(nombre)
+        while len(_catalogos) > getattr(settings, 'CATALOGO_LOCAL_MAX', 32):
+            _catalogos.popitem(last=False)
+
+
+def _catalogo(nombre, modelos, construir):
+    if not cache_compartida():
+        return {'versiones': None, 'json': json.dumps(construir(), cls=DjangoJSONEncoder).encode(), 'datos': None}
+    vigente = versiones(*(version_modelo(m) for m in modelos))
+    entrada = _catalogo_local(nombre, vigente)
+    if entrada is not None:
+        return entrada
+    key = f"catalogo:{nombre}:{'-'.join(str(v) for v in vigente)}"
+    contenido = cache.get(key)
+    if contenido is None:
+        contenido = json.dumps(construir(), cls=DjangoJSONEncoder).encode()
+        cache.set(key, contenido, getattr(settings, 'CATALOGO_CACHE_TTL', 300))
+    entrada = {'versiones': vigente, 'json': contenido, 'datos': None}
+    _guardar_catalogo_local(nombre, entrada)
+    return entrada
+
+
+def catalogo(nombre, modelos, construir):
+    return _catalogo(nombre, modelos, construir)['json']
+
+
+def catalogo_datos(nombre, modelos, construir):
+    entrada = _catalogo(nombre, modelos, construir)
+    if entrada['datos'] is None:
+        entrada['datos'] = json.loads(entrada['json'])
+    return entrada['datos']
+
+
+def catalogo_response(nombre, modelos, construir):
+    return HttpResponse(b'{"data": ' + catalogo(nombre, modelos, construir) + b'}', content_type='application/json')
@@ -0,0 +1,311 @@
+import datetime
+import random
+from array import array
+from decimal import Decimal
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.utils import timezone
+from Main.cache import invalidar, invalidar_modelos
+from Products.models import (
+    Category, Supplier, RawMaterialClass, Producto, Inventario, Lote, Serie,
+    Transaction, TransactionDetail, MovimientoStock,
+)
+from Sells.models import Client, Warehouse, WareClient
+
+CIUDADES = ('Santiago', 'Valparaíso', 'Concepción', 'La Serena', 'Antofagasta', 'Temuco', 'Rancagua', 'Talca', 'Arica', 'Puerto Montt')
+MARCAS = ('Lilis', 'Andina', 'Austral', 'Pacífico', 'Cordillera', 'Del Valle', 'Patagonia', 'Norte Grande')
+UNIDADES = ('U', 'U', 'U', 'KG', 'L')
+TIPOS_TRANSACCION = ('ingreso', 'salida', 'devolucion', 'transferencia', 'produccion')
+PESOS_TRANSACCION = (40, 40, 8, 7, 5)
+DIAS_HISTORIA = 730
+CAMPOS_ADAPTADOS = ('DecimalField', 'DateField', 'DateTimeField')
+CAMPOS_LOTE = ('codigo', 'inventario', 'cantidad_actual', 'fecha_creacion', 'fecha_expiracion', 'origen', 'updated_at')
+CAMPOS_SERIE = ('codigo', 'inventario', 'estado', 'fecha_creacion', 'fecha_expiracion', 'updated_at')
+CAMPOS_MOVIMIENTO = ('inventario', 'producto', 'materia_prima', 'bodega', 'lote', 'serie', 'cantidad', 'origen', 'fecha')
+CAMPOS_TRANSACCION = ('warehouse', 'client', 'date', 'type', 'quantity', 'code', 'search_document', 'updated_at')
+CAMPOS_DETALLE = ('transaction', 'code', 'batch', 'serie')
+
+
+class GeneradorCarga:
+    def __init__(self, seed=42, chunk_size=5000, prefijo='LOAD', sesgo=3.0, log=None):
+        self.rng = random.Random(seed)
+        self.chunk_size = chunk_size
+        self.prefijo = prefijo
+        self.sesgo = sesgo
+        self.log = log or (lambda mensaje: None)
+        self.ahora = timezone.now()
+        self.hoy = timezone.localdate()
+        self.conteos = {}
+
+    def sesgado(self, n):
+        return min(int(n * self.rng.random() ** self.sesgo), n - 1)
+
+    def elegir(self, ids):
+        return ids[self.sesgado(len(ids))]
+
+    def dias_atras(self):
+        return DIAS_HISTORIA * self.rng.random() ** 2
+
+    def fecha_reciente(self):
+        return self.ahora - datetime.timedelta(days=self.dias_atras())
+
+    def dia_reciente(self):
+        return self.hoy - datetime.timedelta(days=int(self.dias_atras()))
+
+    def monto(self, minimo, maximo):
+        return Decimal(self.rng.randint(minimo * 100, maximo * 100)) / 100
+
+    def bloques(self, total):
+        for inicio in range(0, total, self.chunk_size):
+            yield range(inicio, min(inicio + self.chunk_size, total))
+
+    def insertar(self, model, objetos):
+        if not objetos:
+            return []
+        ultimo = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        creados = model.objects.bulk_create(objetos, batch_size=self.chunk_size)
+        self.conteos[model.__name__] = self.conteos.get(model.__name__, 0) + len(creados)
+        if all(obj.pk is not None for obj in creados):
+            return [obj.pk for obj in creados]
+        return list(model.objects.filter(id__gt=ultimo).order_by('id').values_list('id', flat=True))
+
+    def existe_prefijo(self):
+        return Producto.objects.filter(sku__startswith=f'{self.prefijo}-').exists()
+
+    def generar(self, categorias, proveedores, clientes, bodegas, materias_primas, productos,
+                bodegas_por_item, lotes, series, transacciones):
+        self.categorias = self.crear_categorias(categorias)
+        self.proveedores = self.crear_contrapartes(Supplier, 'Proveedor', 'P', proveedores)
+        self.clientes = self.crear_contrapartes(Client, 'Cliente', 'C', clientes)
+        self.bodegas, self.bodegas_lilis = self.crear_bodegas(bodegas)
+        self.crear_wareclients()
+        items = self.crear_items(RawMaterialClass, 'Materia prima', 'R', materias_primas)
+        items += self.crear_items(Producto, 'Producto', 'P', productos)
+        self.crear_inventarios(items, bodegas_por_item)
+        self.crear_lotes(lotes)
+        self.crear_series(series)
+        self.crear_transacciones(transacciones)
+        invalidar('catalogos', 'inventario', 'transacciones')
+        invalidar_modelos(Category, Supplier, Producto, RawMaterialClass, Client, Warehouse)
+        return self.conteos
+
+    def crear_categorias(self, total):
+        ids = []
+        for bloque in self.bloques(total):
+            ids += self.insertar(Category, [
+                Category(name=f'{self.prefijo} Categoría {i}', description=f'Categoría de carga {i}')
+                for i in bloque
+            ])
+        self.log(f'{len(ids)} categorías')
+        return ids
+
+    def crear_contrapartes(self, model, nombre, letra, total):
+        ids = []
+        for bloque in self.bloques(total):
+            ids += self.insertar(model, [
+                model(
+                    bussiness_name=f'{self.prefijo} {nombre} {i}',
+                    fantasy_name=f'{nombre} {self.rng.choice(MARCAS)} {i}',
+                    rut=f'{self.prefijo}-{letra}{i}',
+                    email=f'{nombre.lower()}{i}@{self.prefijo.lower()}.cl',
+                    phone=f'+569{self.rng.randint(10000000, 99999999)}',
+                    address=f'Calle {self.rng.randint(1, 9999)}',
+                    city=self.rng.choice(CIUDADES),
+                    payment_terms_days=self.rng.choice((15, 30, 30, 45, 60)),
+                    discount_percentage=self.monto(0, 15),
+                    lead_time_days=self.rng.randint(1, 30),
+                    is_preferred=self.rng.random() < 0.1,
+                    is_active=self.rng.random() < 0.9,
+                )
+                for i in bloque
+            ])
+        self.log(f'{len(ids)} {model.__name__}')
+        return ids
+
+    def crear_bodegas(self, total):
+        lilis = max(1, total // 20)
+        ids = []
+        for bloque in self.bloques(total):
+            ids += self.insertar(Warehouse, [
+                Warehouse(
+                    name=f'{self.prefijo} Bodega {i}',
+                    address=f'Camino {self.rng.randint(1, 9999)}',
+                    location=self.rng.choice(CIUDADES),
+                    total_area=self.monto(100, 20000),
+                    lilis=i < lilis,
+                    is_active=i < lilis or self.rng.random() < 0.97,
+                )
+                for i in bloque
+            ])
+        self.log(f'{len(ids)} bodegas ({lilis} de Lilis)')
+        return ids, ids[:lilis]
+
+    def crear_wareclients(self):
+        externas = self.bodegas[len(self.bodegas_lilis):] or self.bodegas
+        objetos = []
+        for cliente in self.clientes:
+            for bodega in self.rng.sample(externas, min(1 + self.sesgado(3), len(externas))):
+                objetos.append(WareClient(client_id=cliente, warehouse_id=bodega))
+        for inicio in range(0, len(objetos), self.chunk_size):
+            self.insertar(WareClient, objetos[inicio:inicio + self.chunk_size])
+        self.log(f'{len(objetos)} asociaciones cliente-bodega')
+
+    def crear_items(self, model, nombre, letra, total):
+        items = []
+        for bloque in self.bloques(total):
+            objetos = []
+            for i in bloque:
+                lote = self.rng.random() < 0.75
+                obj = model(
+                    sku=f'{self.prefijo}-{letra}{i}',
+                    ean_upc=str(7800000000000 + self.rng.randint(0, 99999999)),
+                    name=f'{nombre} {self.rng.choice(MARCAS)} {i}',
+                    description=f'{nombre} de carga {i}',
+                    category_id=self.elegir(self.categorias),
+                    brand=self.rng.choice(MARCAS),
+                    measurement_unit=self.rng.choice(UNIDADES),
+                    cost=self.monto(100, 50000),
+                    price=self.monto(150, 80000),
+                    iva=19,
+                    min_stock=self.rng.randint(0, 50),
+                    max_stock=self.rng.randint(100, 5000),
+                    reordering_level=self.rng.randint(0, 100),
+                    batch_control=lote,
+                    serie_control=not lote,
+                    is_perishable=lote and self.rng.random() < 0.5,
+                    is_active=self.rng.random() < 0.95,
+                )
+                if model is RawMaterialClass:
+                    obj.supplier_id = self.elegir(self.proveedores)
+                objetos.append(obj)
+            ids = self.insertar(model, objetos)
+            items += [(model, id, obj.batch_control, obj.is_perishable) for id, obj in zip(ids, objetos)]
+        self.log(f'{len(items)} {model.__name__}')
+        return items
+
+    def crear_inventarios(self, items, bodegas_por_item):
+        self.inventarios = []
+        self.inventarios_lote = []
+        self.inventarios_serie = []
+        maximo = min(bodegas_por_item, len(self.bodegas))
+        pendientes = []
+        for model, id, lote, perecedero in items:
+            elegidas = set()
+            for _ in range(1 + self.sesgado(maximo)):
+                elegidas.add(self.elegir(self.bodegas))
+            for bodega in sorted(elegidas):
+                producto = id if model is Producto else None
+                materia_prima = id if model is RawMaterialClass else None
+                pendientes.append((Inventario(producto_id=producto, materia_prima_id=materia_prima, bodega_id=bodega), lote, perecedero))
+            if len(pendientes) >= self.chunk_size:
+                self.guardar_inventarios(pendientes)
+                pendientes = []
+        self.guardar_inventarios(pendientes)
+        self.log(f'{len(self.inventarios)} inventarios')
+
+    def guardar_inventarios(self, pendientes):
+        ids = self.insertar(Inventario, [inv for inv, _, _ in pendientes])
+        for id, (inv, lote, perecedero) in zip(ids, pendientes):
+            self.inventarios.append((id, inv.producto_id, inv.materia_prima_id, inv.bodega_id, perecedero))
+            (self.inventarios_lote if lote else self.inventarios_serie).append(len(self.inventarios) - 1)
+
+    def insertar_filas(self, model, campos, filas):
+        if not filas:
+            return []
+        connection = connections[DEFAULT_DB_ALIAS]
+        campos = [model._meta.get_field(campo) for campo in campos]
+        qn = connection.ops.quote_name
+        sql = (
+            f"INSERT INTO {qn(model._meta.db_table)} ({', '.join(qn(campo.column) for campo in campos)}) "
+            f"VALUES ({', '.join(['%s'] * len(campos))})"
+        )
+        adaptar = [(i, campo) for i, campo in enumerate(campos) if campo.get_internal_type() in CAMPOS_ADAPTADOS]
+        if adaptar:
+            filas = [list(fila) for fila in filas]
+            for fila in filas:
+                for i, campo in adaptar:
+                    fila[i] = campo.get_db_prep_save(fila[i], connection)
+        ultimo = model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+        with transaction.atomic(using=DEFAULT_DB_ALIAS), connection.cursor() as cursor:
+            for inicio in range(0, len(filas), self.chunk_size):
+                cursor.executemany(sql, filas[inicio:inicio + self.chunk_size])
+        self.conteos[model.__name__] = self.conteos.get(model.__name__, 0) + len(filas)
+        return list(model.objects.filter(id__gt=ultimo).order_by('id').values_list('id', flat=True))
+
+    def movimiento(self, inventario, cantidad, fecha, lote=None, serie=None):
+        id, producto, materia_prima, bodega, _ = inventario
+        fecha = timezone.make_aware(datetime.datetime.combine(fecha, datetime.time(9)))
+        return (id, producto, materia_prima, bodega, lote, serie, cantidad, 'I', fecha)
+
+    def crear_lotes(self, total):
+        self.lotes = array('q')
+        if not self.inventarios_lote:
+            total = 0
+        for bloque in self.bloques(total):
+            filas = []
+            inventarios = []
+            for i in bloque:
+                inventario = self.inventarios[self.elegir(self.inventarios_lote)]
+                creacion = self.dia_reciente()
+                expiracion = creacion + datetime.timedelta(days=self.rng.randint(30, 540)) if inventario[4] else None
+                cantidad = Decimal(0) if self.rng.random() < 0.3 else Decimal(self.rng.randint(1, 500))
+                filas.append((f'{self.prefijo}-L{i}', inventario[0], cantidad, creacion, expiracion, 'I', self.ahora))
+                inventarios.append(inventario)
+            ids = self.insertar_filas(Lote, CAMPOS_LOTE, filas)
+            self.lotes.extend(ids)
+            self.insertar_filas(MovimientoStock, CAMPOS_MOVIMIENTO, [
+                self.movimiento(inventario, fila[2], fila[3], lote=id)
+                for id, fila, inventario in zip(ids, filas, inventarios) if fila[2] > 0
+            ])
+            self.log(f'{len(self.lotes)}/{total} lotes')
+
+    def crear_series(self, total):
+        self.series = array('q')
+        if not self.inventarios_serie:
+            total = 0
+        for bloque in self.bloques(total):
+            filas = []
+            inventarios = []
+            for i in bloque:
+                inventario = self.inventarios[self.elegir(self.inventarios_serie)]
+                creacion = self.dia_reciente()
+                expiracion = creacion + datetime.timedelta(days=self.rng.randint(365, 1095)) if self.rng.random() < 0.2 else None
+                filas.append((f'{self.prefijo}-S{i}', inventario[0], 'A' if self.rng.random() < 0.7 else 'I', creacion, expiracion, self.ahora))
+                inventarios.append(inventario)
+            ids = self.insertar_filas(Serie, CAMPOS_SERIE, filas)
+            self.series.extend(ids)
+            self.insertar_filas(MovimientoStock, CAMPOS_MOVIMIENTO, [
+                self.movimiento(inventario, 1, fila[3], serie=id)
+                for id, fila, inventario in zip(ids, filas, inventarios) if fila[2] == 'A'
+            ])
+            self.log(f'{len(self.series)}/{total} series')
+
+    def detalle(self, transaction_id):
+        i = self.rng.randrange(len(self.lotes) + len(self.series))
+        if i < len(self.lotes):
+            return (transaction_id, f'{self.prefijo}-L{i}', self.lotes[i], None)
+        i -= len(self.lotes)
+        return (transaction_id, f'{self.prefijo}-S{i}', None, self.series[i])
+
+    def crear_transacciones(self, total):
+        con_detalle = len(self.lotes) + len(self.series) > 0
+        for bloque in self.bloques(total):
+            tipos = self.rng.choices(TIPOS_TRANSACCION, PESOS_TRANSACCION, k=len(bloque))
+            filas = []
+            for i, tipo in zip(bloque, tipos):
+                externa = tipo in ('salida', 'devolucion') and self.clientes
+                filas.append((
+                    self.elegir(self.bodegas) if externa else self.elegir(self.bodegas_lilis),
+                    self.elegir(self.clientes) if externa else None,
+                    self.fecha_reciente(),
+                    tipo,
+                    self.rng.randint(1, 50),
+                    f'{self.prefijo}-T{i}',
+                    '',
+                    self.ahora,
+                ))
+            ids = self.insertar_filas(Transaction, CAMPOS_TRANSACCION, filas)
+            if con_detalle:
+                self.insertar_filas(TransactionDetail, CAMPOS_DETALLE, [
+                    self.detalle(id) for id in ids for _ in range(1 + self.sesgado(3))
+                ])
+            self.log(f'{self.conteos.get("Transaction", 0)}/{total} transacciones')
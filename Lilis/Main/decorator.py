@@ -1,6 +1,7 @@
 from functools import wraps
 from django.contrib import messages
 from django.shortcuts import redirect
+from Main.permisos import autorizacion
 
 def permission_or_redirect(perm_codename, redirect_to, msg="No tienes permisos para esta acción."):
     def _decorator(view_func):
@@ -9,7 +10,7 @@ def permission_or_redirect(perm_codename, redirect_to, msg="No tienes permisos p
             if not request.user.is_authenticated:
                 messages.warning(request, "Inicia sesión para continuar.")
                 return redirect('login')
-            if not request.user.has_perm(perm_codename):
+            if not autorizacion(request.user).tiene_permiso(perm_codename):
                 messages.error(request, msg)
                 return redirect(redirect_to)
             return view_func(request, *args, **kwargs)
@@ -0,0 +1,60 @@
+import datetime
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from Main.planes import plan, escaneos_completos, describir, ordenamientos_temporales
+from Sells.services import TransactionService
+
+
+class Command(BaseCommand):
+    help = "Obtiene el EXPLAIN de las consultas principales de inventario y transacciones y falla si alguna recorre una tabla completa. Los ordenamientos en memoria se informan como advertencia, o como error con --estricto. Ejecutar contra una base con datos de carga (generate_load_data)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--solo', nargs='*', default=None, help='Nombres de las consultas a revisar.')
+        parser.add_argument('--estricto', action='store_true', help='Falla también si alguna consulta ordena en memoria.')
+
+    def consultas(self):
+        ts = TransactionService()
+        inventario = ts.inventario
+        producto = inventario.model.objects.filter(producto__isnull=False).values('producto_id', 'bodega_id').first() or {'producto_id': 0, 'bodega_id': 0}
+        materia_prima = inventario.model.objects.filter(materia_prima__isnull=False).values('materia_prima_id', 'bodega_id').first() or {'materia_prima_id': 0, 'bodega_id': 0}
+        bodega = ts.model.objects.filter(warehouse__isnull=False).values_list('warehouse_id', flat=True).first() or 0
+        codigo = ts.model.objects.filter(code__isnull=False).values_list('code', flat=True).first() or ''
+        inicio = timezone.make_aware(datetime.datetime.combine(timezone.localdate(), datetime.time.min))
+        orden = inventario.orden_consumo()
+        return {
+            'lotes_consumo': inventario.lote.objects.filter(cantidad_actual__gt=0, inventario__producto=producto['producto_id']).order_by(*orden),
+            'series_consumo': inventario.serie.objects.filter(estado='A', inventario__producto=producto['producto_id']).order_by(*orden),
+            'inventario_producto_bodega': inventario.model.objects.filter(producto=producto['producto_id'], materia_prima=None, bodega=producto['bodega_id']),
+            'inventario_materia_prima_bodega': inventario.model.objects.filter(materia_prima=materia_prima['materia_prima_id'], producto=None, bodega=materia_prima['bodega_id']),
+            'transacciones_del_dia': ts.model.objects.filter(date__gte=inicio, date__lt=inicio + datetime.timedelta(days=1)),
+            'transaccion_por_codigo': ts.model.objects.filter(code=codigo),
+            'transacciones_bodega': ts.get_by_warehouse(bodega).order_by('-date')[:25],
+            'transacciones_recientes': ts.listado().order_by('-date')[:25],
+        }
+
+    def handle(self, *args, **options):
+        consultas = self.consultas()
+        if options['solo']:
+            desconocidas = set(options['solo']) - set(consultas)
+            if desconocidas:
+                raise CommandError(f"Consultas desconocidas: {', '.join(sorted(desconocidas))}")
+            consultas = {nombre: qs for nombre, qs in consultas.items() if nombre in options['solo']}
+        regresiones = []
+        for nombre, qs in consultas.items():
+            filas = plan(qs)
+            escaneos = escaneos_completos(filas)
+            ordenamientos = ordenamientos_temporales(filas)
+            if options['verbosity'] > 1 or escaneos or ordenamientos:
+                for linea in describir(filas):
+                    self.stdout.write(f"  {nombre}: {linea}")
+            if escaneos:
+                regresiones.append(f"{nombre} ({', '.join(escaneos)})")
+                self.stdout.write(self.style.ERROR(f"{nombre}: recorrido completo de {', '.join(escaneos)}"))
+            elif ordenamientos:
+                if options['estricto']:
+                    regresiones.append(f"{nombre} (ordena {', '.join(ordenamientos)})")
+                self.stdout.write(self.style.WARNING(f"{nombre}: ordena en memoria ({', '.join(ordenamientos)})"))
+            else:
+                self.stdout.write(self.style.SUCCESS(f"{nombre}: usa índices"))
+        if regresiones:
+            raise CommandError(f"{len(regresiones)} consultas con recorridos completos u ordenamientos en memoria: {'; '.join(regresiones)}")
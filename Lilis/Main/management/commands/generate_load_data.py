@@ -0,0 +1,62 @@
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from Main.carga import GeneradorCarga
+
+
+class Command(BaseCommand):
+    help = (
+        "Genera un volumen configurable de datos sintéticos (catálogos, inventarios, lotes, series y transacciones) "
+        "con distribución sesgada y semilla determinista, usando bulk_create por bloques. "
+        "Ejemplo de escala productiva: --productos 50000 --bodegas 500 --lotes 5000000 --series 5000000 --transacciones 5000000."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--prefijo', default='LOAD', help='Prefijo de SKU, RUT y códigos generados (máx. 8 caracteres).')
+        parser.add_argument('--chunk-size', type=int, default=5000)
+        parser.add_argument('--sesgo', type=float, default=3.0, help='Exponente de sesgo: valores mayores concentran más datos en pocos registros.')
+        parser.add_argument('--categorias', type=int, default=50)
+        parser.add_argument('--proveedores', type=int, default=500)
+        parser.add_argument('--clientes', type=int, default=2000)
+        parser.add_argument('--bodegas', type=int, default=50)
+        parser.add_argument('--materias-primas', type=int, default=2000)
+        parser.add_argument('--productos', type=int, default=5000)
+        parser.add_argument('--bodegas-por-item', type=int, default=5)
+        parser.add_argument('--lotes', type=int, default=100000)
+        parser.add_argument('--series', type=int, default=50000)
+        parser.add_argument('--transacciones', type=int, default=100000)
+        parser.add_argument('--sin-postproceso', action='store_true', help='No recalcula stock, índice de búsqueda ni snapshots al terminar.')
+
+    def handle(self, *args, **options):
+        if len(options['prefijo']) > 8:
+            raise CommandError("El prefijo no puede superar los 8 caracteres")
+        if options['bodegas'] < 1 or options['categorias'] < 1 or options['proveedores'] < 1:
+            raise CommandError("Se requiere al menos una bodega, una categoría y un proveedor")
+        generador = GeneradorCarga(
+            seed=options['seed'],
+            chunk_size=options['chunk_size'],
+            prefijo=options['prefijo'],
+            sesgo=options['sesgo'],
+            log=self.stdout.write if options['verbosity'] > 0 else None,
+        )
+        if generador.existe_prefijo():
+            raise CommandError(f"Ya existen datos con el prefijo {options['prefijo']}; use otro --prefijo")
+        conteos = generador.generar(
+            categorias=options['categorias'],
+            proveedores=options['proveedores'],
+            clientes=options['clientes'],
+            bodegas=options['bodegas'],
+            materias_primas=options['materias_primas'],
+            productos=options['productos'],
+            bodegas_por_item=options['bodegas_por_item'],
+            lotes=options['lotes'],
+            series=options['series'],
+            transacciones=options['transacciones'],
+        )
+        if not options['sin_postproceso']:
+            call_command('reconcile_stock', fix=True, stdout=self.stdout)
+            call_command('rebuild_item_stock', stdout=self.stdout)
+            call_command('rebuild_search_index', stdout=self.stdout)
+            call_command('snapshot_stock', stdout=self.stdout)
+        resumen = ', '.join(f'{total} {nombre}' for nombre, total in conteos.items())
+        self.stdout.write(self.style.SUCCESS(f"Datos de carga generados: {resumen}"))
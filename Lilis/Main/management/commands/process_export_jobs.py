@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from Main.services import ExportJobService
+
+
+class Command(BaseCommand):
+    help = "Procesa las exportaciones pendientes y elimina los archivos de exportaciones antiguas. Útil con EXPORT_WORKERS=0 para ejecutar las exportaciones fuera del servidor web."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int, default=None, help='Días de retención de los archivos generados.')
+
+    def handle(self, *args, **options):
+        service = ExportJobService()
+        procesados = service.procesar_pendientes()
+        eliminados = service.limpiar(options['dias'])
+        self.stdout.write(self.style.SUCCESS(f"{procesados} exportaciones procesadas, {eliminados} exportaciones antiguas eliminadas"))
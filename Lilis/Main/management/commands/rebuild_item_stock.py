@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Sells.services import InventarioService
+
+
+class Command(BaseCommand):
+    help = "Recalcula el stock_actual de productos y materias primas como la suma del stock_total de sus inventarios."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            corregidos = InventarioService().recalcular_stock_items(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"{corregidos} items con stock_actual recalculado"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from Sells.services import TransactionService
+
+
+class Command(BaseCommand):
+    help = "Regenera el documento de búsqueda de cada transacción y reconstruye el índice de texto completo."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        TransactionService().reconstruir_documentos_busqueda(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS("Índice de búsqueda de transacciones reconstruido"))
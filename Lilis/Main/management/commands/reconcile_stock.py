@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from Sells.services import InventarioService
+
+
+class Command(BaseCommand):
+    help = "Verifica el stock_total de cada inventario contra sus lotes y series activas y, con --fix, corrige los descuadres."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true', help='Corrige los inventarios descuadrados.')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument('--verbose-rows', action='store_true', help='Lista cada inventario descuadrado.')
+
+    def handle(self, *args, **options):
+        service = InventarioService()
+        with transaction.atomic():
+            descuadres = service.reconciliar_stock(reparar=options['fix'], chunk_size=options['chunk_size'])
+        if options['verbose_rows']:
+            for id, actual, esperado in descuadres:
+                self.stdout.write(f"Inventario {id}: stock {actual} / esperado {esperado}")
+        if not descuadres:
+            self.stdout.write(self.style.SUCCESS("Stock cuadrado: no hay descuadres"))
+        elif options['fix']:
+            self.stdout.write(self.style.SUCCESS(f"{len(descuadres)} inventarios corregidos"))
+        else:
+            self.stdout.write(self.style.WARNING(f"{len(descuadres)} inventarios descuadrados (use --fix para corregir)"))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from Sells.services import InventarioService
+
+
+class Command(BaseCommand):
+    help = "Registra un snapshot de stock para cada inventario con movimientos desde su último snapshot. Pensado para ejecutarse periódicamente (cron)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        creados = InventarioService().tomar_snapshots(chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f"{creados} snapshots de stock registrados"))
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:25
+
+import Main.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Main', '0002_tabla_cache'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='exportjob',
+            name='fecha_actividad',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AlterField(
+            model_name='exportjob',
+            name='archivo',
+            field=models.FileField(blank=True, storage=Main.models.AlmacenamientoPrivado(), upload_to=Main.models.ruta_export),
+        ),
+    ]
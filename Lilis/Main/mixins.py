@@ -3,6 +3,11 @@ from django.core.exceptions import PermissionDenied
 from django.shortcuts import redirect
 from django.urls import reverse_lazy
 from django.contrib import messages
+from django.http import JsonResponse
+from django.urls import reverse
+from Main.utils import generate_excel_response, generate_csv_response, formato_export, EXPORT_CHUNK_SIZE
+from Main.services import ExportJobService
+from Main.permisos import autorizacion
 
 
 class GroupRequiredMixin(AccessMixin):
@@ -15,9 +20,7 @@ class GroupRequiredMixin(AccessMixin):
             return self.handle_no_permission()
         if self.required_group is None:
             raise ValueError('Debe especificar un grupo')
-        user_groups = [group.name for group in request.user.groups.all()]
-        print(user_groups)
-        is_member = any(group in user_groups for group in self.required_group)
+        is_member = autorizacion(request.user).en_grupo(*self.required_group)
         if not is_member:
             messages.error(request, self.permission_denied_message)
             return redirect(self.permission_denied_url)
@@ -36,4 +39,31 @@ class StaffRequiredMixin(UserPassesTestMixin):
 
 class IsNewUserMixin(UserPassesTestMixin):
     def test_func(self):
-        return self.request.user.profile.is_new
\ No newline at end of file
+        return self.request.user.profile.is_new
+
+class ExportMixin:
+    headers = []
+    filename_prefix = None
+
+    def get_export_queryset(self, params):
+        raise NotImplementedError
+
+    def export_row(self, obj):
+        raise NotImplementedError
+
+    def export_rows(self, qs):
+        return (self.export_row(obj) for obj in qs.iterator(chunk_size=EXPORT_CHUNK_SIZE))
+
+    def get(self, request):
+        if request.GET.get('background'):
+            job = ExportJobService().crear(request.user, type(self), request.GET)
+            return JsonResponse({
+                'id': job.id,
+                'estado': job.estado,
+                'url': reverse('export_job_status', args=[job.id]),
+            }, status=202)
+        qs = self.get_export_queryset(request.GET)
+        formato = formato_export(request.GET)
+        if formato == 'xlsx':
+            return generate_excel_response(self.headers, self.export_rows(qs), self.filename_prefix)
+        return generate_csv_response(self.headers, self.export_rows(qs), self.filename_prefix, comprimir=formato == 'csv.gz')
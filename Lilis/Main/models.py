@@ -1,2 +1,60 @@
+import os
+import uuid
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage
 from django.db import models
+from django.contrib.auth.models import User
+from django.utils.deconstruct import deconstructible
 
+
+@deconstructible
+class AlmacenamientoPrivado(FileSystemStorage):
+    @property
+    def base_location(self):
+        return settings.EXPORT_ROOT
+
+    @property
+    def location(self):
+        return os.path.abspath(self.base_location)
+
+    def url(self, name):
+        raise ValueError('Los archivos de exportación solo se descargan a través de la aplicación.')
+
+
+def ruta_export(instance, filename):
+    return f'{uuid.uuid4().hex}/{filename}'
+
+
+class ExportJob(models.Model):
+    ESTADOS = [
+        ('P', 'Pendiente'),
+        ('E', 'En proceso'),
+        ('C', 'Completado'),
+        ('F', 'Fallido'),
+    ]
+    usuario = models.ForeignKey(User, on_delete=models.CASCADE, related_name='export_jobs')
+    vista = models.CharField(max_length=200)
+    parametros = models.TextField(blank=True, default='')
+    estado = models.CharField(max_length=1, choices=ESTADOS, default='P')
+    procesadas = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(null=True, blank=True)
+    archivo = models.FileField(upload_to=ruta_export, storage=AlmacenamientoPrivado(), blank=True)
+    error = models.TextField(blank=True, default='')
+    fecha_creacion = models.DateTimeField(auto_now_add=True)
+    fecha_actividad = models.DateTimeField(null=True, blank=True)
+    fecha_fin = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['estado', 'fecha_creacion']),
+        ]
+
+    def progreso(self):
+        if self.estado == 'C':
+            return 100
+        if not self.total:
+            return 0
+        return min(99, int(self.procesadas * 100 / self.total))
+
+    def __str__(self):
+        return f"{self.vista} - {self.get_estado_display()}"
@@ -0,0 +1,129 @@
+import base64
+import binascii
+import datetime
+import json
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections
+from django.db.models import DateTimeField, Q
+
+
+def modo_cursor(request):
+    return request.GET.get('paginacion') == 'cursor'
+
+
+def conteo_aproximado(queryset):
+    if queryset.query.has_filters():
+        return None
+    tabla = queryset.model._meta.db_table
+    connection = connections[queryset.db]
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT TABLE_ROWS FROM information_schema.TABLES WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s",
+                [tabla],
+            )
+        elif connection.vendor == 'postgresql':
+            cursor.execute("SELECT reltuples::bigint FROM pg_class WHERE relname = %s", [tabla])
+        else:
+            return None
+        fila = cursor.fetchone()
+    if not fila or fila[0] is None or fila[0] < 0:
+        return None
+    return int(fila[0])
+
+
+def valor_cursor(valor):
+    if isinstance(valor, (datetime.datetime, datetime.date, datetime.time)):
+        return valor.isoformat()
+    return valor
+
+
+def leer_valor_cursor(campo, valor):
+    if isinstance(campo, DateTimeField) and isinstance(valor, str):
+        return datetime.datetime.fromisoformat(valor)
+    return campo.to_python(valor)
+
+
+class CursorPage:
+    def __init__(self, object_list, paginator, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.paginator = paginator
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    def __init__(self, queryset, per_page, ordering=('-id',)):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        ordering = tuple(ordering)
+        if ordering[-1].lstrip('-') not in ('id', 'pk'):
+            ordering += ('-id' if ordering[-1].startswith('-') else 'id',)
+        self.ordering = ordering
+        self.campos = [o.lstrip('-') for o in ordering]
+        self.descendente = [o.startswith('-') for o in ordering]
+
+    def codificar(self, direccion, obj):
+        valores = [valor_cursor(getattr(obj, campo)) for campo in self.campos]
+        data = json.dumps([direccion, valores], cls=DjangoJSONEncoder)
+        return base64.urlsafe_b64encode(data.encode()).decode()
+
+    def decodificar(self, cursor):
+        if not cursor:
+            return 'n', None
+        try:
+            direccion, valores = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+            meta = self.queryset.model._meta
+            valores = [leer_valor_cursor(meta.get_field(campo), v) for campo, v in zip(self.campos, valores)]
+        except (ValueError, TypeError, binascii.Error, LookupError):
+            return 'n', None
+        if direccion not in ('n', 'p') or len(valores) != len(self.campos):
+            return 'n', None
+        return direccion, valores
+
+    def filtro(self, valores, invertir):
+        condicion = Q()
+        iguales = {}
+        for campo, desc, valor in zip(self.campos, self.descendente, valores):
+            lookup = 'lt' if desc != invertir else 'gt'
+            condicion |= Q(**iguales, **{f'{campo}__{lookup}': valor})
+            iguales[campo] = valor
+        return condicion
+
+    def page(self, cursor=None):
+        direccion, valores = self.decodificar(cursor)
+        invertir = direccion == 'p'
+        ordering = self.ordering
+        if invertir:
+            ordering = tuple(o[1:] if o.startswith('-') else f'-{o}' for o in ordering)
+        qs = self.queryset.order_by(*ordering)
+        if valores is not None:
+            qs = qs.filter(self.filtro(valores, invertir))
+        filas = list(qs[:self.per_page + 1])
+        hay_mas = len(filas) > self.per_page
+        filas = filas[:self.per_page]
+        if invertir:
+            filas.reverse()
+        next_cursor = None
+        previous_cursor = None
+        if filas:
+            if hay_mas or invertir:
+                next_cursor = self.codificar('n', filas[-1])
+            if (valores is not None and not invertir) or (invertir and hay_mas):
+                previous_cursor = self.codificar('p', filas[0])
+        return CursorPage(filas, self, next_cursor, previous_cursor)
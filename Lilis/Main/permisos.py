@@ -0,0 +1,111 @@
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+from Accounts.models import RoleModulePermission
+from Main.cache import cache_compartida, guardar_versionado, invalidar, leer_versionado
+
+ACCIONES_MODULO = ('view', 'add', 'edit', 'delete')
+
+_locales = OrderedDict()
+_locales_lock = threading.Lock()
+
+
+def _snapshot_key(user_id):
+    return f'autorizacion:{user_id}'
+
+
+class Autorizacion:
+    def __init__(self, grupos=(), permisos=(), modulos=None, superusuario=False, activo=True):
+        self.grupos = frozenset(grupos)
+        self.permisos = frozenset(permisos)
+        self.modulos = modulos or {}
+        self.superusuario = superusuario
+        self.activo = activo
+
+    def en_grupo(self, *nombres):
+        return any(nombre in self.grupos for nombre in nombres)
+
+    def tiene_permiso(self, perm):
+        if not self.activo:
+            return False
+        return self.superusuario or perm in self.permisos
+
+    def puede(self, modulo, accion='view'):
+        if not self.activo:
+            return False
+        return self.superusuario or accion in self.modulos.get(modulo, ())
+
+
+ANONIMO = Autorizacion(activo=False)
+
+
+def construir(user):
+    grupos = user.groups.values_list('name', flat=True)
+    permisos = ModelBackend().get_all_permissions(user) if user.is_active else set()
+    modulos = {}
+    filas = RoleModulePermission.objects.filter(role__profiles__user=user).values_list(
+        'module__code', 'can_view', 'can_add', 'can_edit', 'can_delete',
+    )
+    for codigo, *flags in filas:
+        modulos[codigo] = frozenset(accion for accion, flag in zip(ACCIONES_MODULO, flags) if flag)
+    return Autorizacion(grupos, permisos, modulos, user.is_superuser, user.is_active)
+
+
+def _snapshot_local(user_id):
+    with _locales_lock:
+        entrada = _locales.get(user_id)
+        if entrada is None or time.monotonic() - entrada[0] > settings.AUTORIZACION_REVALIDAR_SEGUNDOS:
+            return None
+        _locales.move_to_end(user_id)
+        return entrada[1]
+
+
+def _guardar_local(user_id, snapshot):
+    with _locales_lock:
+        _locales[user_id] = (time.monotonic(), snapshot)
+        _locales.move_to_end(user_id)
+        while len(_locales) > settings.AUTORIZACION_LOCAL_MAX:
+            _locales.popitem(last=False)
+
+
+def _olvidar_local(*user_ids):
+    with _locales_lock:
+        if not user_ids:
+            _locales.clear()
+        for user_id in user_ids:
+            _locales.pop(user_id, None)
+
+
+def _snapshot_compartido(user):
+    snapshot = _snapshot_local(user.pk)
+    if snapshot is not None:
+        return snapshot
+    key = _snapshot_key(user.pk)
+    vigente, snapshot = leer_versionado(key, 'autorizacion')
+    if snapshot is None:
+        snapshot = construir(user)
+        guardar_versionado(key, vigente, snapshot, settings.AUTORIZACION_CACHE_TTL)
+    _guardar_local(user.pk, snapshot)
+    return snapshot
+
+
+def autorizacion(user):
+    if not user.is_authenticated:
+        return ANONIMO
+    memo = getattr(user, '_autorizacion', None)
+    if memo is not None:
+        return memo
+    snapshot = _snapshot_compartido(user) if cache_compartida() else construir(user)
+    user._autorizacion = Autorizacion(snapshot.grupos, snapshot.permisos, snapshot.modulos, user.is_superuser, user.is_active)
+    return user._autorizacion
+
+
+def invalidar_autorizacion(*user_ids):
+    _olvidar_local(*user_ids)
+    if user_ids:
+        cache.delete_many([_snapshot_key(user_id) for user_id in user_ids])
+    else:
+        invalidar('autorizacion')
@@ -0,0 +1,49 @@
+from django.db import connection as default_connection
+
+SQLITE_ACCESOS_CON_INDICE = ('USING INDEX', 'USING COVERING INDEX', 'USING INTEGER PRIMARY KEY', 'USING PRIMARY KEY')
+SQLITE_ORDEN_TEMPORAL = 'USE TEMP B-TREE FOR '
+
+
+def plan(qs, connection=default_connection):
+    sql, params = qs.query.sql_with_params()
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f'EXPLAIN {sql}', params)
+            columnas = [c[0] for c in cursor.description]
+            return [dict(zip(columnas, fila)) for fila in cursor.fetchall()]
+        if connection.vendor == 'sqlite':
+            cursor.execute(f'EXPLAIN QUERY PLAN {sql}', params)
+            return [{'detail': fila[-1]} for fila in cursor.fetchall()]
+    return []
+
+
+def escaneos_completos(filas, connection=default_connection):
+    escaneos = []
+    for fila in filas:
+        if connection.vendor == 'mysql':
+            if fila.get('type') == 'ALL':
+                escaneos.append(fila.get('table'))
+        elif connection.vendor == 'sqlite':
+            detalle = fila['detail']
+            if detalle.startswith('SCAN ') and not any(a in detalle for a in SQLITE_ACCESOS_CON_INDICE):
+                escaneos.append(detalle[len('SCAN '):].split(' ')[0])
+    return escaneos
+
+
+def ordenamientos_temporales(filas, connection=default_connection):
+    ordenamientos = []
+    for fila in filas:
+        if connection.vendor == 'mysql':
+            if 'Using filesort' in (fila.get('Extra') or ''):
+                ordenamientos.append(fila.get('table'))
+        elif connection.vendor == 'sqlite':
+            detalle = fila['detail']
+            if detalle.startswith(SQLITE_ORDEN_TEMPORAL):
+                ordenamientos.append(detalle[len(SQLITE_ORDEN_TEMPORAL):])
+    return ordenamientos
+
+
+def describir(filas, connection=default_connection):
+    if connection.vendor == 'mysql':
+        return [f"{f.get('table')}: {f.get('type')} {f.get('key') or '-'} ({f.get('rows')} filas)" for f in filas]
+    return [f['detail'] for f in filas]
@@ -0,0 +1,143 @@
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files import File
+from django.db import close_old_connections, transaction
+from django.db.models import Count, Q
+from django.http import QueryDict
+from django.utils import timezone
+from django.utils.module_loading import import_string
+from Main.CRUD import CRUD
+from Main.cache import guardar_versionado, leer_versionado
+from Main.models import ExportJob
+from Products.models import Producto, Supplier
+from Sells.models import Client
+from Sells.services import TransactionService
+from Main.utils import escribir_csv, escribir_excel, formato_export, nombre_export
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=settings.EXPORT_WORKERS, thread_name_prefix='export')
+    return _executor
+
+
+class ExportJobService(CRUD):
+    def __init__(self):
+        self.model = ExportJob
+
+    def list_by_user(self, user):
+        return self.model.objects.filter(usuario=user).order_by('-fecha_creacion')
+
+    def get_by_user(self, id, user):
+        return self.model.objects.filter(id=id, usuario=user).first()
+
+    def crear(self, user, vista, parametros):
+        parametros = parametros.copy()
+        parametros.pop('background', None)
+        job = self.model.objects.create(
+            usuario=user,
+            vista=f'{vista.__module__}.{vista.__qualname__}',
+            parametros=parametros.urlencode(),
+        )
+        if settings.EXPORT_WORKERS > 0:
+            transaction.on_commit(lambda: executor().submit(self.ejecutar_en_hilo, job.id))
+        return job
+
+    def ejecutar_en_hilo(self, id):
+        close_old_connections()
+        try:
+            self.ejecutar(id)
+        finally:
+            close_old_connections()
+
+    def reclamables(self):
+        limite = timezone.now() - timedelta(minutes=settings.EXPORT_TIMEOUT_MINUTOS)
+        return self.model.objects.filter(Q(estado='P') | Q(estado='E', fecha_actividad__lt=limite))
+
+    def ejecutar(self, id):
+        tomados = self.reclamables().filter(id=id).update(estado='E', procesadas=0, fecha_actividad=timezone.now())
+        if not tomados:
+            return None
+        job = self.model.objects.get(id=id)
+        try:
+            vista = import_string(job.vista)()
+            parametros = QueryDict(job.parametros)
+            formato = formato_export(parametros)
+            qs = vista.get_export_queryset(parametros)
+            job.total = qs.count()
+            self.model.objects.filter(id=id).update(total=job.total)
+
+            def progreso(procesadas):
+                self.model.objects.filter(id=id).update(procesadas=procesadas, fecha_actividad=timezone.now())
+
+            with tempfile.TemporaryFile() as archivo:
+                if formato == 'xlsx':
+                    job.procesadas = escribir_excel(archivo, vista.headers, vista.export_rows(qs), vista.filename_prefix, progreso)
+                else:
+                    job.procesadas = escribir_csv(archivo, vista.headers, vista.export_rows(qs), formato == 'csv.gz', progreso)
+                archivo.seek(0)
+                job.archivo.save(nombre_export(vista.filename_prefix, formato), File(archivo), save=False)
+            job.estado = 'C'
+        except Exception as e:
+            job.estado = 'F'
+            job.error = str(e)
+        job.fecha_fin = timezone.now()
+        job.save(update_fields=['estado', 'procesadas', 'total', 'archivo', 'error', 'fecha_fin'])
+        return job
+
+    def procesar_pendientes(self):
+        procesados = 0
+        for id in self.reclamables().order_by('fecha_creacion').values_list('id', flat=True):
+            if self.ejecutar(id):
+                procesados += 1
+        return procesados
+
+    def limpiar(self, dias=None):
+        dias = settings.EXPORT_RETENCION_DIAS if dias is None else dias
+        limite = timezone.now() - timedelta(days=dias)
+        eliminados = 0
+        for job in self.model.objects.filter(fecha_creacion__lt=limite):
+            if job.archivo:
+                job.archivo.delete(save=False)
+            job.delete()
+            eliminados += 1
+        return eliminados
+
+
+class DashboardService:
+    def __init__(self):
+        self.usuarios = User
+        self.proveedores = Supplier
+        self.productos = Producto
+        self.clientes = Client
+        self.transaction_service = TransactionService()
+
+    def contadores(self):
+        proveedores = self.proveedores.objects.aggregate(total=Count('id'), activos=Count('id', filter=Q(is_active=True)))
+        clientes = self.clientes.objects.aggregate(total=Count('id'), activos=Count('id', filter=Q(is_active=True)))
+        return {
+            'usuarios': self.usuarios.objects.count(),
+            'proveedores_activos': proveedores['activos'],
+            'proveedores': proveedores['total'],
+            'productos': self.productos.objects.count(),
+            'clientes_activos': clientes['activos'],
+            'clientes': clientes['total'],
+        }
+
+    def recientes(self, cantidad=5):
+        return list(self.transaction_service.listado().order_by('-date')[:cantidad])
+
+    def resumen(self, cantidad=5):
+        key = f'dashboard:{cantidad}'
+        vigente, datos = leer_versionado(key, 'catalogos', 'usuarios', 'transacciones')
+        if datos is None:
+            datos = {**self.contadores(), 'transacciones': self.recientes(cantidad)}
+            guardar_versionado(key, vigente, datos, settings.DASHBOARD_CACHE_TTL)
+        return datos
@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import pre_save, post_save, post_delete, m2m_changed
+from django.contrib.auth.models import User, Group
+from Main.cache import invalidar, invalidar_modelos
+from Main.permisos import invalidar_autorizacion
+from Accounts.models import Lilis, Profile, Role, Module, RoleModulePermission
+from Accounts.services import LILIS_CACHE_KEY
+from django.core.cache import cache
+from Products.models import Category, Supplier, Producto, RawMaterialClass, Inventario, Transaction
+from Products.fulltext import CAMPOS_RELACIONADOS
+from Sells.models import Client, Warehouse, WareClient
+from Sells.services import TransactionService
+
+CATALOGOS = (Lilis, Supplier, Producto, RawMaterialClass, Client, Warehouse, WareClient)
+MODELOS_CATALOGO = (Category, Supplier, Producto, RawMaterialClass, Client, Warehouse)
+MODELOS_BUSQUEDA = (Producto, RawMaterialClass, Client)
+
+transaction_service = TransactionService()
+
+
+def invalidar_catalogos(sender, **kwargs):
+    transaction.on_commit(lambda: invalidar('catalogos'))
+
+
+def invalidar_modelo(sender, **kwargs):
+    invalidar_modelos(sender)
+
+
+def invalidar_lilis(sender, **kwargs):
+    cache.delete(LILIS_CACHE_KEY)
+
+
+def invalidar_autorizacion_global(sender, **kwargs):
+    invalidar_autorizacion()
+
+
+def invalidar_autorizacion_usuario(sender, instance, **kwargs):
+    user_id = instance.pk if isinstance(instance, User) else instance.user_id
+    if user_id:
+        invalidar_autorizacion(user_id)
+
+
+def invalidar_autorizacion_m2m(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, User):
+        invalidar_autorizacion(instance.pk)
+    elif reverse and sender is User.groups.through and pk_set:
+        invalidar_autorizacion(*pk_set)
+    else:
+        invalidar_autorizacion()
+
+
+def invalidar_usuarios(sender, update_fields=None, **kwargs):
+    if update_fields and set(update_fields) <= {'last_login'}:
+        return
+    transaction.on_commit(lambda: invalidar('usuarios'))
+
+
+def recordar_campos_busqueda(sender, instance, update_fields=None, **kwargs):
+    _, campos = CAMPOS_RELACIONADOS[sender._meta.label_lower]
+    instance._campos_busqueda = None
+    if instance.pk is None or (update_fields is not None and not set(update_fields) & set(campos)):
+        return
+    instance._campos_busqueda = sender.objects.filter(pk=instance.pk).values_list(*campos).first()
+
+
+def actualizar_documentos_busqueda(sender, instance, created, **kwargs):
+    _, campos = CAMPOS_RELACIONADOS[sender._meta.label_lower]
+    anteriores = getattr(instance, '_campos_busqueda', None)
+    if created or anteriores is None or anteriores == tuple(getattr(instance, campo) for campo in campos):
+        return
+    transaction.on_commit(lambda: transaction_service.actualizar_documentos_relacionados(sender, [instance.pk]))
+
+
+def invalidar_transacciones(sender, **kwargs):
+    transaction.on_commit(lambda: invalidar('transacciones'))
+
+
+def invalidar_inventario(sender, **kwargs):
+    invalidar('inventario')
+
+
+for model in CATALOGOS:
+    post_save.connect(invalidar_catalogos, sender=model, dispatch_uid=f'catalogos_{model.__name__}_save')
+    post_delete.connect(invalidar_catalogos, sender=model, dispatch_uid=f'catalogos_{model.__name__}_delete')
+for model in MODELOS_CATALOGO:
+    post_save.connect(invalidar_modelo, sender=model, dispatch_uid=f'modelo_{model.__name__}_save')
+    post_delete.connect(invalidar_modelo, sender=model, dispatch_uid=f'modelo_{model.__name__}_delete')
+post_save.connect(invalidar_inventario, sender=Inventario, dispatch_uid='inventario_save')
+post_delete.connect(invalidar_inventario, sender=Inventario, dispatch_uid='inventario_delete')
+post_save.connect(invalidar_lilis, sender=Lilis, dispatch_uid='lilis_save')
+post_delete.connect(invalidar_lilis, sender=Lilis, dispatch_uid='lilis_delete')
+for model in (Group, Role, Module, RoleModulePermission):
+    post_save.connect(invalidar_autorizacion_global, sender=model, dispatch_uid=f'autorizacion_{model.__name__}_save')
+    post_delete.connect(invalidar_autorizacion_global, sender=model, dispatch_uid=f'autorizacion_{model.__name__}_delete')
+for model in (User, Profile):
+    post_save.connect(invalidar_autorizacion_usuario, sender=model, dispatch_uid=f'autorizacion_{model.__name__}_save')
+    post_delete.connect(invalidar_autorizacion_usuario, sender=model, dispatch_uid=f'autorizacion_{model.__name__}_delete')
+for through in (User.groups.through, User.user_permissions.through, Group.permissions.through):
+    m2m_changed.connect(invalidar_autorizacion_m2m, sender=through, dispatch_uid=f'autorizacion_{through.__name__}')
+post_save.connect(invalidar_usuarios, sender=User, dispatch_uid='usuarios_save')
+post_delete.connect(invalidar_usuarios, sender=User, dispatch_uid='usuarios_delete')
+post_save.connect(invalidar_transacciones, sender=Transaction, dispatch_uid='transacciones_save')
+post_delete.connect(invalidar_transacciones, sender=Transaction, dispatch_uid='transacciones_delete')
+for model in MODELOS_BUSQUEDA:
+    pre_save.connect(recordar_campos_busqueda, sender=model, dispatch_uid=f'busqueda_{model.__name__}_pre_save')
+    post_save.connect(actualizar_documentos_busqueda, sender=model, dispatch_uid=f'busqueda_{model.__name__}_save')
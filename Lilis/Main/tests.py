@@ -1,3 +1,331 @@
-from django.test import TestCase
+import csv
+import datetime
+import gzip
+import io
+import os
+import shutil
+import tempfile
+from unittest import mock
+from django.conf import settings
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.contrib.auth.models import Group, User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from openpyxl import Workbook, load_workbook
+from Accounts.models import Profile
+from Main.models import ExportJob
+from Main.cache import cache_compartida, version
+from Main.carga import GeneradorCarga
+from Main.management.commands.check_query_plans import Command as CheckQueryPlans
+from Main.services import ExportJobService
+from Main.utils import EXPORT_CHUNK_SIZE, XLSX_CONTENT_TYPE, csv_stream, escribir_csv, escribir_excel
+from Main.pagination import CursorPaginator
+from Main.permisos import autorizacion, invalidar_autorizacion
+from Main.planes import escaneos_completos, ordenamientos_temporales, plan
+from Products.models import Category, Inventario, Lote, Producto, Serie, Supplier, Transaction, TransactionDetail
 
-# Create your tests here.
+
+class CursorPaginatorTest(TestCase):
+    def setUp(self):
+        base = timezone.now().replace(microsecond=461000)
+        self.ids = []
+        for i in range(5):
+            transaction = Transaction.objects.create(type='ingreso', code=f'T{i}')
+            Transaction.objects.filter(id=transaction.id).update(date=base + datetime.timedelta(microseconds=100 * i))
+            self.ids.append(transaction.id)
+        self.ids.reverse()
+
+    def ids_de(self, page):
+        return [t.id for t in page]
+
+    def test_avanza_y_retrocede_bajo_el_milisegundo(self):
+        paginator = CursorPaginator(Transaction.objects.all(), 2, ordering=('-date',))
+        primera = paginator.page()
+        segunda = paginator.page(primera.next_cursor)
+        tercera = paginator.page(segunda.next_cursor)
+        self.assertEqual(self.ids_de(primera) + self.ids_de(segunda) + self.ids_de(tercera), self.ids)
+        self.assertFalse(tercera.has_next())
+        self.assertEqual(self.ids_de(paginator.page(tercera.previous_cursor)), self.ids_de(segunda))
+        self.assertEqual(self.ids_de(paginator.page(segunda.previous_cursor)), self.ids_de(primera))
+
+
+class AutorizacionCacheTest(TestCase):
+    def setUp(self):
+        self.grupo = Group.objects.create(name='Acceso Completo')
+        self.user = User.objects.create_user('u', password='x')
+        self.user.groups.add(self.grupo)
+
+    def revocar_sin_senales(self):
+        User.groups.through.objects.filter(user=self.user).delete()
+
+    def test_cache_por_defecto_es_compartida(self):
+        self.assertTrue(cache_compartida())
+
+    def test_chequeo_en_caliente_no_consulta_la_bd(self):
+        self.assertTrue(autorizacion(User.objects.get(pk=self.user.pk)).en_grupo('Acceso Completo'))
+        user = User.objects.get(pk=self.user.pk)
+        with self.assertNumQueries(0):
+            self.assertTrue(autorizacion(user).en_grupo('Acceso Completo'))
+
+    def test_revalida_contra_la_cache_compartida(self):
+        autorizacion(User.objects.get(pk=self.user.pk))
+        self.revocar_sin_senales()
+        cache.delete(f'autorizacion:{self.user.pk}')
+        self.assertTrue(autorizacion(User.objects.get(pk=self.user.pk)).en_grupo('Acceso Completo'))
+        with override_settings(AUTORIZACION_REVALIDAR_SEGUNDOS=-1):
+            self.assertFalse(autorizacion(User.objects.get(pk=self.user.pk)).en_grupo('Acceso Completo'))
+
+    def test_invalidar_usuario_limpia_el_proceso(self):
+        autorizacion(User.objects.get(pk=self.user.pk))
+        self.revocar_sin_senales()
+        invalidar_autorizacion(self.user.pk)
+        self.assertFalse(autorizacion(User.objects.get(pk=self.user.pk)).en_grupo('Acceso Completo'))
+
+    @override_settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}})
+    def test_cache_local_solo_memoriza_por_request(self):
+        self.assertFalse(cache_compartida())
+        self.assertTrue(autorizacion(User.objects.get(pk=self.user.pk)).en_grupo('Acceso Completo'))
+        self.revocar_sin_senales()
+        self.assertFalse(autorizacion(User.objects.get(pk=self.user.pk)).en_grupo('Acceso Completo'))
+
+
+class ExportJobTest(TestCase):
+    def setUp(self):
+        self.directorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directorio, ignore_errors=True)
+        ajustes = override_settings(EXPORT_WORKERS=0, EXPORT_ROOT=self.directorio)
+        ajustes.enable()
+        self.addCleanup(ajustes.disable)
+        grupo = Group.objects.create(name='Acceso Completo')
+        self.user = User.objects.create_user('dueno', password='x')
+        self.user.groups.add(grupo)
+        Profile.objects.create(user=self.user, run='dueno', is_new=False)
+        self.otro = User.objects.create_user('otro', password='x')
+        self.otro.groups.add(grupo)
+        Profile.objects.create(user=self.otro, run='otro', is_new=False)
+        for i in range(3):
+            Category.objects.create(name=f'c{i}')
+        self.service = ExportJobService()
+        self.client.force_login(self.user)
+
+    def crear(self):
+        response = self.client.get(reverse('export_categories_excel'), {'background': 1, 'format': 'csv'})
+        self.assertEqual(response.status_code, 202)
+        return ExportJob.objects.get(id=response.json()['id'])
+
+    def test_crear_procesar_y_descargar(self):
+        job = self.crear()
+        self.assertEqual((job.estado, job.usuario), ('P', self.user))
+        self.assertEqual(self.service.procesar_pendientes(), 1)
+        estado = self.client.get(reverse('export_job_status', args=[job.id])).json()
+        self.assertEqual((estado['estado'], estado['procesadas'], estado['total'], estado['progreso']), ('C', 3, 3, 100))
+        self.assertEqual(estado['descarga'], reverse('export_job_download', args=[job.id]))
+        job.refresh_from_db()
+        carpeta, nombre = job.archivo.name.split('/')
+        self.assertEqual(len(carpeta), 32)
+        self.assertTrue(nombre.startswith('Lilis_Categorias'))
+        self.assertTrue(job.archivo.path.startswith(os.path.abspath(self.directorio)))
+        self.assertFalse(job.archivo.path.startswith(str(settings.MEDIA_ROOT)))
+        with self.assertRaises(ValueError):
+            job.archivo.url
+        response = self.client.get(estado['descarga'])
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(f'filename="{nombre}"', response['Content-Disposition'])
+        self.assertEqual(len(b''.join(response.streaming_content).splitlines()), 4)
+
+    def test_otro_usuario_no_ve_ni_descarga(self):
+        job = self.crear()
+        self.service.procesar_pendientes()
+        self.client.force_login(self.otro)
+        self.assertEqual(self.client.get(reverse('export_job_status', args=[job.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_job_download', args=[job.id])).status_code, 404)
+        self.assertEqual(self.client.get(reverse('export_job_list')).json()['data'], [])
+
+    def test_recupera_jobs_en_ejecucion_abandonados(self):
+        abandonado, activo = self.crear(), self.crear()
+        hace_una_hora = timezone.now() - datetime.timedelta(hours=1)
+        ExportJob.objects.filter(id=abandonado.id).update(estado='E', fecha_actividad=hace_una_hora, procesadas=2)
+        ExportJob.objects.filter(id=activo.id).update(estado='E', fecha_actividad=timezone.now())
+        self.assertEqual(self.service.procesar_pendientes(), 1)
+        abandonado.refresh_from_db()
+        activo.refresh_from_db()
+        self.assertEqual((abandonado.estado, abandonado.procesadas), ('C', 3))
+        self.assertEqual(activo.estado, 'E')
+
+
+class DashboardTest(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('u', password='x')
+        Profile.objects.create(user=self.user, run='u', is_new=False)
+        Supplier.objects.create(bussiness_name='s', rut='1-1')
+        Transaction.objects.create(type='ingreso', code='T1')
+        self.client.force_login(self.user)
+
+    def test_en_caliente_una_sola_lectura_de_cache(self):
+        self.client.get(reverse('dashboard'))
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len([q for q in consultas if 'lilis_cache' in q['sql']]), 1)
+        self.assertEqual(len(consultas), 4)
+
+    def test_invalida_al_confirmar_la_transaccion(self):
+        self.assertEqual(self.client.get(reverse('dashboard')).context['proveedores'], 1)
+        antes = version('catalogos')
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            Supplier.objects.create(bussiness_name='s2', rut='2-2')
+            Transaction.objects.create(type='salida', code='T2')
+            self.assertEqual(version('catalogos'), antes)
+        self.assertEqual(len(callbacks), 2)
+        response = self.client.get(reverse('dashboard'))
+        self.assertEqual(response.context['proveedores'], 2)
+        self.assertEqual([t['code'] for t in response.context['transacciones']], ['T2', 'T1'])
+
+
+class PlanesConsultaTest(TestCase):
+    ordenan_en_memoria = {'lotes_consumo', 'series_consumo'}
+
+    @classmethod
+    def setUpTestData(cls):
+        GeneradorCarga(seed=7, chunk_size=500).generar(
+            categorias=5, proveedores=5, clientes=20, bodegas=4, materias_primas=40, productos=40,
+            bodegas_por_item=2, lotes=500, series=500, transacciones=500,
+        )
+
+    def test_consultas_principales_usan_indices(self):
+        for nombre, qs in CheckQueryPlans().consultas().items():
+            with self.subTest(consulta=nombre):
+                filas = plan(qs)
+                self.assertEqual(escaneos_completos(filas), [])
+                if nombre not in self.ordenan_en_memoria:
+                    self.assertEqual(ordenamientos_temporales(filas), [])
+
+    def test_comando_informa_ordenamientos_en_memoria(self):
+        salida = io.StringIO()
+        call_command('check_query_plans', stdout=salida)
+        for nombre in self.ordenan_en_memoria:
+            self.assertIn(f'{nombre}: ordena en memoria', salida.getvalue())
+        with self.assertRaises(CommandError):
+            call_command('check_query_plans', '--estricto', stdout=io.StringIO())
+
+
+class ExportExcelTest(TestCase):
+    headers = ['Código', 'Descripción']
+
+    def filas(self, total):
+        return ((f'C{i}', 'x' * (i % 7)) for i in range(total))
+
+    def test_escribe_en_modo_solo_escritura_con_progreso(self):
+        avances = []
+        with tempfile.TemporaryFile() as archivo:
+            with mock.patch('Main.utils.Workbook', wraps=Workbook) as libro:
+                procesadas = escribir_excel(archivo, self.headers, self.filas(EXPORT_CHUNK_SIZE + 5), 'Hoja', avances.append)
+            libro.assert_called_once_with(write_only=True)
+            archivo.seek(0)
+            wb = load_workbook(archivo)
+        ws = wb['Hoja']
+        self.assertEqual(procesadas, EXPORT_CHUNK_SIZE + 5)
+        self.assertEqual(avances, [EXPORT_CHUNK_SIZE, EXPORT_CHUNK_SIZE + 5])
+        self.assertEqual(ws.max_row, EXPORT_CHUNK_SIZE + 6)
+        self.assertEqual([c.value for c in ws[1]], self.headers)
+        self.assertTrue(ws['A1'].font.bold)
+        self.assertEqual([c.value for c in ws[EXPORT_CHUNK_SIZE + 6]], [f'C{EXPORT_CHUNK_SIZE + 4}', 'x' * ((EXPORT_CHUNK_SIZE + 4) % 7)])
+        self.assertEqual(ws.column_dimensions['B'].width, len('Descripción') + 2)
+
+    def test_respuesta_de_la_vista(self):
+        grupo = Group.objects.create(name='Acceso Completo')
+        user = User.objects.create_user('u', password='x')
+        user.groups.add(grupo)
+        Profile.objects.create(user=user, run='u', is_new=False)
+        Category.objects.create(name='Frutas', description='d')
+        self.client.force_login(user)
+        response = self.client.get(reverse('export_categories_excel'))
+        self.assertEqual(response['Content-Type'], XLSX_CONTENT_TYPE)
+        ws = load_workbook(io.BytesIO(b''.join(response.streaming_content))).active
+        self.assertEqual([[c.value for c in fila] for fila in ws.iter_rows()], [['Nombre', 'Descripción'], ['Frutas', 'd']])
+
+
+class ExportCsvTest(TestCase):
+    headers = ['Código', 'Nota']
+
+    def filas(self):
+        return [(f'C{i}', 'coma, "comillas" y ñ' if i % 3 == 0 else i) for i in range(EXPORT_CHUNK_SIZE * 2 + 7)]
+
+    def leer(self, contenido):
+        return list(csv.reader(io.StringIO(contenido.decode())))
+
+    def test_csv_y_csv_gz_tienen_las_mismas_filas(self):
+        plano = b''.join(csv_stream(self.headers, self.filas()))
+        comprimido = b''.join(csv_stream(self.headers, self.filas(), comprimir=True))
+        self.assertLess(len(comprimido), len(plano))
+        filas = self.leer(gzip.decompress(comprimido))
+        self.assertEqual(filas, self.leer(plano))
+        self.assertEqual(filas[0], self.headers)
+        self.assertEqual(len(filas), EXPORT_CHUNK_SIZE * 2 + 8)
+        self.assertEqual(filas[1], ['C0', 'coma, "comillas" y ñ'])
+
+    def test_escribir_csv_gz_en_archivo(self):
+        avances = []
+        with tempfile.TemporaryFile() as archivo:
+            procesadas = escribir_csv(archivo, self.headers, self.filas(), True, avances.append)
+            archivo.seek(0)
+            filas = self.leer(gzip.decompress(archivo.read()))
+        self.assertEqual(procesadas, EXPORT_CHUNK_SIZE * 2 + 7)
+        self.assertEqual(avances, [EXPORT_CHUNK_SIZE, EXPORT_CHUNK_SIZE * 2, EXPORT_CHUNK_SIZE * 2 + 7])
+        self.assertEqual(filas, self.leer(b''.join(csv_stream(self.headers, self.filas()))))
+
+    def test_vista_entrega_los_mismos_datos_en_ambos_formatos(self):
+        user = User.objects.create_user('u', password='x')
+        user.groups.add(Group.objects.create(name='Acceso Completo'))
+        Profile.objects.create(user=user, run='u', is_new=False)
+        for i in range(3):
+            Category.objects.create(name=f'c{i}', description='d')
+        self.client.force_login(user)
+        plano = self.client.get(reverse('export_categories_excel'), {'format': 'csv'})
+        comprimido = self.client.get(reverse('export_categories_excel'), {'format': 'csv.gz'})
+        self.assertEqual(comprimido['Content-Type'], 'application/gzip')
+        self.assertTrue(comprimido['Content-Disposition'].endswith('.csv.gz"'))
+        self.assertEqual(
+            self.leer(gzip.decompress(b''.join(comprimido.streaming_content))),
+            self.leer(b''.join(plano.streaming_content)),
+        )
+
+
+class GenerarDatosCargaTest(TestCase):
+    def generar(self, prefijo, seed):
+        call_command(
+            'generate_load_data', '--seed', str(seed), '--prefijo', prefijo, '--categorias', '3', '--proveedores', '4',
+            '--clientes', '6', '--bodegas', '3', '--materias-primas', '8', '--productos', '8', '--bodegas-por-item', '2',
+            '--lotes', '40', '--series', '30', '--transacciones', '50', '--chunk-size', '7', stdout=io.StringIO(),
+        )
+        sin_prefijo = lambda filas: [tuple(str(v).replace(prefijo, '') for v in fila) for fila in filas]
+        return {
+            'productos': sin_prefijo(Producto.objects.filter(sku__startswith=f'{prefijo}-').order_by('id').values_list(
+                'sku', 'name', 'category__name', 'price', 'batch_control', 'stock_actual')),
+            'inventarios': sin_prefijo(Inventario.objects.filter(bodega__name__startswith=f'{prefijo} ').order_by('id').values_list(
+                'producto__sku', 'materia_prima__sku', 'bodega__name', 'stock_total')),
+            'lotes': sin_prefijo(Lote.objects.filter(codigo__startswith=f'{prefijo}-').order_by('id').values_list(
+                'codigo', 'inventario__bodega__name', 'cantidad_actual', 'fecha_creacion', 'fecha_expiracion')),
+            'series': sin_prefijo(Serie.objects.filter(codigo__startswith=f'{prefijo}-').order_by('id').values_list(
+                'codigo', 'inventario__bodega__name', 'estado', 'fecha_expiracion')),
+            'transacciones': sin_prefijo(Transaction.objects.filter(code__startswith=f'{prefijo}-').order_by('id').values_list(
+                'code', 'type', 'quantity', 'warehouse__name', 'client__rut')),
+            'detalles': sin_prefijo(TransactionDetail.objects.filter(code__startswith=f'{prefijo}-').order_by('id').values_list(
+                'transaction__code', 'code')),
+        }
+
+    def test_misma_semilla_mismos_datos(self):
+        primera = self.generar('SEMILLAA', 11)
+        self.assertEqual(len(primera['productos']), 8)
+        self.assertEqual(len(primera['transacciones']), 50)
+        self.assertEqual(self.generar('SEMILLAB', 11), primera)
+        self.assertNotEqual(self.generar('SEMILLAC', 12), primera)
+
+    def test_prefijo_repetido_rechazado(self):
+        self.generar('SEMILLAA', 11)
+        with self.assertRaises(CommandError):
+            self.generar('SEMILLAA', 11)
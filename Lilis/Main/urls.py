@@ -3,4 +3,7 @@ from . import views
 
 urlpatterns = [
     path('', views.DashboardView.as_view(), name='dashboard'),
+    path('exports/', views.ExportJobListView.as_view(), name='export_job_list'),
+    path('exports/<int:pk>/', views.ExportJobStatusView.as_view(), name='export_job_status'),
+    path('exports/<int:pk>/descargar/', views.ExportJobDownloadView.as_view(), name='export_job_download'),
 ]
\ No newline at end of file
@@ -1,38 +1,138 @@
+import csv
 import datetime
-from django.http import HttpResponse
+import tempfile
+import zlib
+from itertools import chain, islice
+from django.http import FileResponse, StreamingHttpResponse
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font
+from openpyxl.utils import get_column_letter
+
+EXPORT_CHUNK_SIZE = 2000
+EXPORT_MUESTRA_ANCHO = 500
+EXPORT_ANCHO_MAXIMO = 60
+XLSX_CONTENT_TYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+EXPORT_FORMATOS = {
+    'xlsx': ('xlsx', XLSX_CONTENT_TYPE),
+    'csv': ('csv', 'text/csv; charset=utf-8'),
+    'csv.gz': ('csv.gz', 'application/gzip'),
+}
+
+
+def anchos_columnas(headers, filas):
+    anchos = [len(str(h)) for h in headers]
+    for fila in filas:
+        for i, valor in enumerate(fila):
+            if valor is None:
+                continue
+            largo = len(str(valor))
+            if i >= len(anchos):
+                anchos.append(largo)
+            elif largo > anchos[i]:
+                anchos[i] = largo
+    return [min(ancho + 2, EXPORT_ANCHO_MAXIMO) for ancho in anchos]
 
-def generate_excel_response(headers, data_rows, filename_prefix):
-    wb = Workbook()
-    ws = wb.active
-    ws.title = filename_prefix
 
-    ws.append(headers)
+def escribir_excel(archivo, headers, data_rows, titulo, progreso=None):
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title=titulo)
+
+    data_rows = iter(data_rows)
+    muestra = list(islice(data_rows, EXPORT_MUESTRA_ANCHO))
+    for i, ancho in enumerate(anchos_columnas(headers, muestra), start=1):
+        ws.column_dimensions[get_column_letter(i)].width = ancho
+
     bold_font = Font(bold=True)
-    for cell in ws[1]:
+    encabezado = []
+    for header in headers:
+        cell = WriteOnlyCell(ws, value=header)
         cell.font = bold_font
+        encabezado.append(cell)
+    ws.append(encabezado)
 
-    for row in data_rows:
+    procesadas = 0
+    for row in chain(muestra, data_rows):
         ws.append(row)
+        procesadas += 1
+        if progreso and procesadas % EXPORT_CHUNK_SIZE == 0:
+            progreso(procesadas)
+    if progreso:
+        progreso(procesadas)
+
+    wb.save(archivo)
+    return procesadas
+
+
+def formato_export(params):
+    formato = params.get('format') or 'xlsx'
+    return formato if formato in EXPORT_FORMATOS else 'xlsx'
+
+
+def nombre_export(filename_prefix, formato='xlsx'):
+    return f"{filename_prefix}_{datetime.date.today()}.{EXPORT_FORMATOS[formato][0]}"
+
 
-    for col in ws.columns:
-        max_length = 0
-        column = col[0].column_letter
-        for cell in col:
-            try:
-                if len(str(cell.value)) > max_length:
-                    max_length = len(str(cell.value))
-            except:
-                pass
-        adjusted_width = (max_length + 2)
-        ws.column_dimensions[column].width = adjusted_width
-
-    response = HttpResponse(
-        content_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+class Eco:
+    def write(self, value):
+        return value
+
+
+def csv_stream(headers, data_rows, comprimir=False, progreso=None):
+    writer = csv.writer(Eco())
+    compresor = zlib.compressobj(wbits=31) if comprimir else None
+    bloque = [writer.writerow(headers)]
+    procesadas = 0
+    for row in data_rows:
+        bloque.append(writer.writerow(row))
+        procesadas += 1
+        if procesadas % EXPORT_CHUNK_SIZE == 0:
+            datos = ''.join(bloque).encode()
+            bloque = []
+            if progreso:
+                progreso(procesadas)
+            yield compresor.compress(datos) if compresor else datos
+    datos = ''.join(bloque).encode()
+    if progreso:
+        progreso(procesadas)
+    if compresor:
+        yield compresor.compress(datos) + compresor.flush()
+    else:
+        yield datos
+
+
+def escribir_csv(archivo, headers, data_rows, comprimir=False, progreso=None):
+    procesadas = 0
+
+    def contar(n):
+        nonlocal procesadas
+        procesadas = n
+        if progreso:
+            progreso(n)
+
+    for datos in csv_stream(headers, data_rows, comprimir, contar):
+        archivo.write(datos)
+    return procesadas
+
+
+def generate_csv_response(headers, data_rows, filename_prefix, comprimir=False):
+    formato = 'csv.gz' if comprimir else 'csv'
+    response = StreamingHttpResponse(
+        csv_stream(headers, data_rows, comprimir),
+        content_type=EXPORT_FORMATOS[formato][1],
     )
-    filename = f"{filename_prefix}_{datetime.date.today()}.xlsx"
-    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Content-Disposition'] = f'attachment; filename="{nombre_export(filename_prefix, formato)}"'
+    return response
+
 
-    wb.save(response)
-    return response
\ No newline at end of file
+def generate_excel_response(headers, data_rows, filename_prefix):
+    archivo = tempfile.TemporaryFile()
+    escribir_excel(archivo, headers, data_rows, filename_prefix)
+    archivo.seek(0)
+
+    return FileResponse(
+        archivo,
+        as_attachment=True,
+        filename=nombre_export(filename_prefix),
+        content_type=XLSX_CONTENT_TYPE,
+    )
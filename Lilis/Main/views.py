@@ -1,16 +1,13 @@
 from django.shortcuts import render, redirect
-from Accounts.services import UserService
-from Products.services import SupplierService, ProductService
-from Sells.services import ClientService, TransactionService
+from django.http import JsonResponse, FileResponse, Http404
+from django.urls import reverse
+from Main.services import ExportJobService, DashboardService
 from django.views import View
 from django.urls import reverse_lazy
 from django.contrib.auth.mixins import LoginRequiredMixin
 
-user_service = UserService()
-supplier_service = SupplierService()
-product_service = ProductService()
-client_service = ClientService()
-transaction_service = TransactionService()
+export_job_service = ExportJobService()
+dashboard_service = DashboardService()
 
 
 class DashboardView(LoginRequiredMixin,View):
@@ -19,21 +16,45 @@ class DashboardView(LoginRequiredMixin,View):
     def get(self, request):
         if self.request.user.profile.is_new:
             return redirect('nueva_contraseña')
-        usuarios = user_service.count()
-        proveedores_activos = supplier_service.count_actives()
-        proveedores = supplier_service.count()
-        productos = product_service.count()
-        clientes_activos = client_service.count_actives()
-        clientes= client_service.count()
-        transacciones = transaction_service.list().order_by('-date')[:5]
-        return render(request, 'main/dashboard.html',
-                  {
-                      'productos': productos,
-                      'proveedores_activos': proveedores_activos,
-                      'proveedores': proveedores,
-                      'usuarios': usuarios,
-                      'clientes_activos': clientes_activos,
-                      'clientes': clientes,
-                      'transacciones': transacciones
-                  })
+        return render(request, 'main/dashboard.html', dashboard_service.resumen())
+
+
+def export_job_to_dict(job):
+    data = {
+        'id': job.id,
+        'estado': job.estado,
+        'estado_display': job.get_estado_display(),
+        'procesadas': job.procesadas,
+        'total': job.total,
+        'progreso': job.progreso(),
+        'fecha_creacion': job.fecha_creacion,
+        'fecha_fin': job.fecha_fin,
+        'error': job.error,
+        'descarga': None,
+    }
+    if job.estado == 'C' and job.archivo:
+        data['descarga'] = reverse('export_job_download', args=[job.id])
+    return data
+
+
+class ExportJobListView(LoginRequiredMixin, View):
+    def get(self, request):
+        jobs = export_job_service.list_by_user(request.user)[:20]
+        return JsonResponse({'data': [export_job_to_dict(job) for job in jobs]})
+
+
+class ExportJobStatusView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        job = export_job_service.get_by_user(pk, request.user)
+        if job is None:
+            raise Http404
+        return JsonResponse(export_job_to_dict(job))
+
+
+class ExportJobDownloadView(LoginRequiredMixin, View):
+    def get(self, request, pk):
+        job = export_job_service.get_by_user(pk, request.user)
+        if job is None or job.estado != 'C' or not job.archivo:
+            raise Http404
+        return FileResponse(job.archivo.open('rb'), as_attachment=True, filename=job.archivo.name.rsplit('/', 1)[-1])
 
@@ -0,0 +1,97 @@
+import re
+from collections import defaultdict
+from django.db import connection as default_connection
+
+TABLA = 'Products_transaction'
+TABLA_FTS = 'Products_transaction_fts'
+INDICE_FULLTEXT = 'transaction_search_ft'
+
+CAMPOS_TRANSACCION = ('type', 'code', 'client__rut', 'client__bussiness_name', 'client__fantasy_name')
+CAMPOS_DETALLE = (
+    'batch__inventario__producto__sku', 'batch__inventario__producto__name',
+    'batch__inventario__materia_prima__sku', 'batch__inventario__materia_prima__name',
+    'serie__inventario__producto__sku', 'serie__inventario__producto__name',
+    'serie__inventario__materia_prima__sku', 'serie__inventario__materia_prima__name',
+)
+CAMPOS_RELACIONADOS = {
+    'Products.producto': ('producto', ('sku', 'name')),
+    'Products.rawmaterialclass': ('materia_prima', ('sku', 'name')),
+    'Sells.client': ('client', ('rut', 'bussiness_name', 'fantasy_name')),
+}
+
+
+def terminos(q):
+    return re.findall(r'\w+', q or '')
+
+
+def documentos(transaction_model, detail_model, ids):
+    partes = defaultdict(set)
+    for id, *valores in transaction_model.objects.filter(id__in=ids).values_list('id', *CAMPOS_TRANSACCION):
+        partes[id].update(str(v) for v in valores if v)
+    detalles = detail_model.objects.filter(transaction_id__in=ids).values_list('transaction_id', *CAMPOS_DETALLE).distinct()
+    for id, *valores in detalles:
+        partes[id].update(str(v) for v in valores if v)
+    return {id: ' '.join(sorted(p)) for id, p in partes.items()}
+
+
+def crear_indice(connection=default_connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                [TABLA, INDICE_FULLTEXT],
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"ALTER TABLE `{TABLA}` ADD FULLTEXT INDEX `{INDICE_FULLTEXT}` (`search_document`)")
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} "
+                f"USING fts5(search_document, content='{TABLA}', content_rowid='id')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON {TABLA} BEGIN "
+                f"INSERT INTO {TABLA_FTS}(rowid, search_document) VALUES (new.id, new.search_document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON {TABLA} BEGIN "
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, search_document) VALUES ('delete', old.id, old.search_document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF search_document ON {TABLA} BEGIN "
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, search_document) VALUES ('delete', old.id, old.search_document); "
+                f"INSERT INTO {TABLA_FTS}(rowid, search_document) VALUES (new.id, new.search_document); END"
+            )
+
+
+def eliminar_indice(connection=default_connection):
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f"ALTER TABLE `{TABLA}` DROP INDEX `{INDICE_FULLTEXT}`")
+        elif connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+
+
+def reconstruir_indice(connection=default_connection):
+    if connection.vendor == 'sqlite':
+        crear_indice(connection)
+        with connection.cursor() as cursor:
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def consulta_ids(q, connection=default_connection):
+    palabras = terminos(q)
+    if not palabras:
+        return None
+    if connection.vendor == 'mysql':
+        expresion = ' '.join(f'+{p}*' for p in palabras)
+        return (
+            f"SELECT id FROM `{TABLA}` WHERE MATCH(`search_document`) AGAINST (%s IN BOOLEAN MODE)",
+            [expresion],
+        )
+    if connection.vendor == 'sqlite':
+        expresion = ' '.join(f'"{p}"*' for p in palabras)
+        return f"SELECT rowid FROM {TABLA_FTS} WHERE {TABLA_FTS} MATCH %s", [expresion]
+    return None
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:08
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def snapshot_inicial(apps, schema_editor):
+    Inventario = apps.get_model('Products', 'Inventario')
+    SnapshotStock = apps.get_model('Products', 'SnapshotStock')
+    ahora = django.utils.timezone.now()
+    SnapshotStock.objects.bulk_create(
+        [
+            SnapshotStock(inventario_id=id, fecha=ahora, stock=stock, ultimo_movimiento=0)
+            for id, stock in Inventario.objects.values_list('id', 'stock_total').iterator()
+        ],
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Products', '0015_transaction_idempotency_key'),
+        ('Sells', '0014_warehouse_lilis'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MovimientoStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('cantidad', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('origen', models.CharField(choices=[('I', 'Ingreso'), ('S', 'Salida'), ('D', 'Devolucion'), ('T', 'Transferencia'), ('P', 'Produccion'), ('A', 'Ajuste')], default='A', max_length=20)),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('bodega', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Sells.warehouse')),
+                ('inventario', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Products.inventario')),
+                ('lote', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Products.lote')),
+                ('materia_prima', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Products.rawmaterialclass')),
+                ('producto', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Products.producto')),
+                ('serie', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Products.serie')),
+                ('transaction', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='movimientos', to='Products.transaction')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventario', 'fecha'], name='Products_mo_inventa_2f4f44_idx'), models.Index(fields=['bodega', 'fecha'], name='Products_mo_bodega__0c6035_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='SnapshotStock',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fecha', models.DateTimeField(default=django.utils.timezone.now)),
+                ('stock', models.DecimalField(decimal_places=2, max_digits=20)),
+                ('ultimo_movimiento', models.PositiveBigIntegerField(default=0)),
+                ('inventario', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='Products.inventario')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['inventario', 'fecha'], name='Products_sn_inventa_ee0a90_idx')],
+            },
+        ),
+        migrations.RunPython(snapshot_inicial, migrations.RunPython.noop),
+    ]
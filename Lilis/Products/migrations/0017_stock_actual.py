@@ -0,0 +1,40 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:10
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery, Sum, Value, DecimalField
+from django.db.models.functions import Coalesce
+
+
+def calcular_stock_actual(apps, schema_editor):
+    Inventario = apps.get_model('Products', 'Inventario')
+    for model_name, campo in (('Producto', 'producto'), ('RawMaterialClass', 'materia_prima')):
+        total = (
+            Inventario.objects.filter(**{campo: OuterRef('pk')})
+            .values(campo)
+            .annotate(total=Sum('stock_total'))
+            .values('total')
+        )
+        apps.get_model('Products', model_name).objects.update(
+            stock_actual=Coalesce(Subquery(total), Value(0), output_field=DecimalField(max_digits=20, decimal_places=2))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Products', '0016_movimientostock_snapshotstock'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='producto',
+            name='stock_actual',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=20, verbose_name='Stock total'),
+        ),
+        migrations.AddField(
+            model_name='rawmaterialclass',
+            name='stock_actual',
+            field=models.DecimalField(decimal_places=2, default=0.0, editable=False, max_digits=20, verbose_name='Stock total'),
+        ),
+        migrations.RunPython(calcular_stock_actual, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,94 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:15
+
+from collections import defaultdict
+from django.db import migrations, models
+
+TABLA = 'Products_transaction'
+TABLA_FTS = 'Products_transaction_fts'
+INDICE_FULLTEXT = 'transaction_search_ft'
+
+CAMPOS_TRANSACCION = ('type', 'code', 'client__rut', 'client__bussiness_name', 'client__fantasy_name')
+CAMPOS_DETALLE = (
+    'batch__inventario__producto__sku', 'batch__inventario__producto__name',
+    'batch__inventario__materia_prima__sku', 'batch__inventario__materia_prima__name',
+    'serie__inventario__producto__sku', 'serie__inventario__producto__name',
+    'serie__inventario__materia_prima__sku', 'serie__inventario__materia_prima__name',
+)
+
+
+def llenar_documentos(apps, schema_editor):
+    Transaction = apps.get_model('Products', 'Transaction')
+    TransactionDetail = apps.get_model('Products', 'TransactionDetail')
+    ids = list(Transaction.objects.order_by('id').values_list('id', flat=True))
+    for i in range(0, len(ids), 1000):
+        bloque = ids[i:i + 1000]
+        partes = defaultdict(set)
+        for id, *valores in Transaction.objects.filter(id__in=bloque).values_list('id', *CAMPOS_TRANSACCION):
+            partes[id].update(str(v) for v in valores if v)
+        detalles = TransactionDetail.objects.filter(transaction_id__in=bloque).values_list('transaction_id', *CAMPOS_DETALLE).distinct()
+        for id, *valores in detalles:
+            partes[id].update(str(v) for v in valores if v)
+        Transaction.objects.bulk_update(
+            [Transaction(id=id, search_document=' '.join(sorted(p))) for id, p in partes.items()],
+            ['search_document'],
+        )
+
+
+def crear_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(
+                "SELECT COUNT(*) FROM information_schema.STATISTICS "
+                "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = %s AND INDEX_NAME = %s",
+                [TABLA, INDICE_FULLTEXT],
+            )
+            if not cursor.fetchone()[0]:
+                cursor.execute(f"ALTER TABLE `{TABLA}` ADD FULLTEXT INDEX `{INDICE_FULLTEXT}` (`search_document`)")
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLA_FTS} "
+                f"USING fts5(search_document, content='{TABLA}', content_rowid='id')"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON {TABLA} BEGIN "
+                f"INSERT INTO {TABLA_FTS}(rowid, search_document) VALUES (new.id, new.search_document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON {TABLA} BEGIN "
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, search_document) VALUES ('delete', old.id, old.search_document); END"
+            )
+            cursor.execute(
+                f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF search_document ON {TABLA} BEGIN "
+                f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, search_document) VALUES ('delete', old.id, old.search_document); "
+                f"INSERT INTO {TABLA_FTS}(rowid, search_document) VALUES (new.id, new.search_document); END"
+            )
+            cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+def eliminar_indice(apps, schema_editor):
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        if connection.vendor == 'mysql':
+            cursor.execute(f"ALTER TABLE `{TABLA}` DROP INDEX `{INDICE_FULLTEXT}`")
+        elif connection.vendor == 'sqlite':
+            for sufijo in ('ai', 'ad', 'au'):
+                cursor.execute(f"DROP TRIGGER IF EXISTS {TABLA_FTS}_{sufijo}")
+            cursor.execute(f"DROP TABLE IF EXISTS {TABLA_FTS}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Products', '0017_stock_actual'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transaction',
+            name='search_document',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.RunPython(llenar_documentos, migrations.RunPython.noop),
+        migrations.RunPython(crear_indice, eliminar_indice),
+    ]
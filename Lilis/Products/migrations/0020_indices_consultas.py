@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-18 12:33
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Accounts', '0008_alter_profile_role'),
+        ('Products', '0019_updated_at'),
+        ('Sells', '0014_warehouse_lilis'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['producto', 'bodega'], name='Products_in_product_c0dbd7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='inventario',
+            index=models.Index(fields=['materia_prima', 'bodega'], name='Products_in_materia_eca76c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='lote',
+            index=models.Index(fields=['inventario', 'fecha_expiracion', 'fecha_creacion'], name='Products_lo_inventa_adaaad_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='serie',
+            index=models.Index(fields=['inventario', 'estado', 'fecha_expiracion'], name='Products_se_inventa_7aa6e7_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['date'], name='Products_tr_date_14e250_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['code'], name='Products_tr_code_291e32_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='transaction',
+            index=models.Index(fields=['warehouse', 'date'], name='Products_tr_warehou_672bd9_idx'),
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:10
+
+from django.db import migrations, models
+
+TABLA = 'Products_transaction'
+TABLA_FTS = 'Products_transaction_fts'
+
+
+def restaurar_triggers_fts(apps, schema_editor):
+    # SQLite reconstruye la tabla al agregar la columna y con ello elimina los triggers del índice FTS.
+    connection = schema_editor.connection
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ai AFTER INSERT ON {TABLA} BEGIN "
+            f"INSERT INTO {TABLA_FTS}(rowid, search_document) VALUES (new.id, new.search_document); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_ad AFTER DELETE ON {TABLA} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, search_document) VALUES ('delete', old.id, old.search_document); END"
+        )
+        cursor.execute(
+            f"CREATE TRIGGER IF NOT EXISTS {TABLA_FTS}_au AFTER UPDATE OF search_document ON {TABLA} BEGIN "
+            f"INSERT INTO {TABLA_FTS}({TABLA_FTS}, rowid, search_document) VALUES ('delete', old.id, old.search_document); "
+            f"INSERT INTO {TABLA_FTS}(rowid, search_document) VALUES (new.id, new.search_document); END"
+        )
+        cursor.execute(f"INSERT INTO {TABLA_FTS}({TABLA_FTS}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Products', '0020_indices_consultas'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='inventario',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='lote',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='serie',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación'),
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación'),
+        ),
+        migrations.RunPython(restaurar_triggers_fts, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,62 @@
+# Generated by Django 5.2.18 on 2026-10-18 13:13
+
+from django.db import migrations, models
+from django.db.models import Count, F, Max, Min, Sum
+from django.utils import timezone
+
+
+def fusionar_duplicados(apps, schema_editor):
+    Inventario = apps.get_model('Products', 'Inventario')
+    SnapshotStock = apps.get_model('Products', 'SnapshotStock')
+    MovimientoStock = apps.get_model('Products', 'MovimientoStock')
+    relacionados = [apps.get_model('Products', nombre) for nombre in ('Lote', 'Serie', 'MovimientoStock')]
+    for campo in ('producto', 'materia_prima'):
+        duplicados = (
+            Inventario.objects.filter(**{f'{campo}__isnull': False})
+            .values(campo, 'bodega')
+            .annotate(total=Count('id'), conservar=Min('id'))
+            .filter(total__gt=1)
+        )
+        for duplicado in duplicados:
+            sobrantes = Inventario.objects.filter(**{campo: duplicado[campo]}, bodega=duplicado['bodega']).exclude(id=duplicado['conservar'])
+            ids = list(sobrantes.values_list('id', flat=True))
+            stock = sobrantes.aggregate(total=Sum('stock_total'))['total'] or 0
+            for modelo in relacionados:
+                modelo.objects.filter(inventario_id__in=ids).update(inventario_id=duplicado['conservar'])
+            SnapshotStock.objects.filter(inventario_id__in=ids).delete()
+            Inventario.objects.filter(id=duplicado['conservar']).update(stock_total=F('stock_total') + stock)
+            Inventario.objects.filter(id__in=ids).delete()
+            SnapshotStock.objects.create(
+                inventario_id=duplicado['conservar'],
+                fecha=timezone.now(),
+                stock=Inventario.objects.get(id=duplicado['conservar']).stock_total,
+                ultimo_movimiento=MovimientoStock.objects.filter(inventario_id=duplicado['conservar']).aggregate(ultimo=Max('id'))['ultimo'] or 0,
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('Products', '0021_updated_at_movimientos'),
+        ('Sells', '0014_warehouse_lilis'),
+    ]
+
+    operations = [
+        migrations.RunPython(fusionar_duplicados, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='inventario',
+            constraint=models.UniqueConstraint(fields=('producto', 'bodega'), name='inventario_producto_bodega_unico'),
+        ),
+        migrations.AddConstraint(
+            model_name='inventario',
+            constraint=models.UniqueConstraint(fields=('materia_prima', 'bodega'), name='inventario_materia_prima_bodega_unico'),
+        ),
+        migrations.RemoveIndex(
+            model_name='inventario',
+            name='Products_in_product_c0dbd7_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='inventario',
+            name='Products_in_materia_eca76c_idx',
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.utils import timezone
 from Sells.models import Client, Warehouse
 from Accounts.models import Profile
 
@@ -19,6 +20,7 @@ class Supplier(models.Model):
     is_preferred = models.BooleanField(default=False, verbose_name='Preferido')
     lead_time_days = models.IntegerField(default=7, verbose_name='Días de atención')
     is_active = models.BooleanField(default=True, verbose_name='Activo')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
 
     def __str__(self):
         return f'{self.bussiness_name} - {self.rut}'
@@ -70,15 +72,14 @@ class RawMaterialClass(models.Model):
     is_perishable = models.BooleanField(default=False, verbose_name='Perecedero')
     supplier = models.ForeignKey(Supplier, on_delete=models.PROTECT, related_name="raw_materials", verbose_name='Proveedor')
     deficit = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='Deficit')
+    stock_actual = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, editable=False, verbose_name='Stock total')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
     
     def __str__(self):
         return self.name + " - " + self.sku
 
     def stock_total(self):
-        total = 0
-        for inv in self.inventario.all():
-            total += inv.stock_total
-        return total
+        return self.stock_actual
 
 
 class Producto(models.Model):
@@ -110,15 +111,14 @@ class Producto(models.Model):
     measurement_unit = models.CharField(max_length=100, choices = [('U','Unidades'), ('KG','Kilogramos'), ('L','Litros')], default='U', verbose_name='Unidad de medida')
     is_perishable = models.BooleanField(default=False, verbose_name='Perecedero')
     deficit = models.DecimalField(max_digits=10, decimal_places=2, default=0.00, verbose_name='Deficit')
+    stock_actual = models.DecimalField(max_digits=20, decimal_places=2, default=0.00, editable=False, verbose_name='Stock total')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
 
     def __str__(self):
         return f'{self.name} - {self.sku}'
 
     def stock_total(self):
-        total = 0
-        for inv in self.inventario.all():
-            total += inv.stock_total
-        return total
+        return self.stock_actual
 
 class Transaction(models.Model):
     warehouse = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name="transactions", null=True, blank=True)
@@ -130,6 +130,16 @@ class Transaction(models.Model):
     quantity = models.IntegerField(default=1)
     expiration_date = models.DateField(null=True, blank=True)
     code = models.CharField(max_length=100, blank=True, null=True)
+    idempotency_key = models.CharField(max_length=64, unique=True, blank=True, null=True)
+    search_document = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date']),
+            models.Index(fields=['code']),
+            models.Index(fields=['warehouse', 'date']),
+        ]
 
     def __str__(self):
         return f'{self.type}: Bodega: {self.warehouse.name} - {self.date}'
@@ -139,6 +149,13 @@ class Inventario(models.Model):
     producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name="inventario", blank=True, null=True )
     bodega = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name="inventario")
     stock_total = models.DecimalField(max_digits=20, decimal_places=2, default=0.00)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['producto', 'bodega'], name='inventario_producto_bodega_unico'),
+            models.UniqueConstraint(fields=['materia_prima', 'bodega'], name='inventario_materia_prima_bodega_unico'),
+        ]
 
     def __str__(self):
         if self.producto:
@@ -210,6 +227,12 @@ class Lote(models.Model):
     fecha_creacion = models.DateField(auto_now_add=True)
     fecha_expiracion = models.DateField(null=True, blank=True)
     origen = models.CharField(max_length=20, choices=[('I', 'Ingreso'), ('S', 'Salida'), ('D', 'Devolucion'), ('T', 'Transferencia'), ('A', 'Ajuste')], default='I')
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventario', 'fecha_expiracion', 'fecha_creacion']),
+        ]
 
 class Serie(models.Model):
     codigo = models.CharField(max_length=100)
@@ -217,9 +240,44 @@ class Serie(models.Model):
     estado = models.CharField(max_length=20, choices=[('A', 'Activo'), ('I', 'Inactivo')], default='A')
     fecha_creacion = models.DateField(auto_now_add=True)
     fecha_expiracion = models.DateField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True, verbose_name='Última modificación')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventario', 'estado', 'fecha_expiracion']),
+        ]
 
 class TransactionDetail(models.Model):
     transaction = models.ForeignKey(Transaction, on_delete=models.PROTECT, related_name="details")
     code = models.CharField(max_length=100)
     batch = models.ForeignKey(Lote, on_delete=models.PROTECT, related_name="transactiondetails", null=True, blank=True)
-    serie = models.ForeignKey(Serie, on_delete=models.PROTECT, related_name="transactiondetails", null=True, blank=True)
\ No newline at end of file
+    serie = models.ForeignKey(Serie, on_delete=models.PROTECT, related_name="transactiondetails", null=True, blank=True)
+
+class MovimientoStock(models.Model):
+    inventario = models.ForeignKey(Inventario, on_delete=models.PROTECT, related_name="movimientos")
+    producto = models.ForeignKey(Producto, on_delete=models.PROTECT, related_name="movimientos", null=True, blank=True)
+    materia_prima = models.ForeignKey(RawMaterialClass, on_delete=models.PROTECT, related_name="movimientos", null=True, blank=True)
+    bodega = models.ForeignKey(Warehouse, on_delete=models.PROTECT, related_name="movimientos")
+    lote = models.ForeignKey(Lote, on_delete=models.PROTECT, related_name="movimientos", null=True, blank=True)
+    serie = models.ForeignKey(Serie, on_delete=models.PROTECT, related_name="movimientos", null=True, blank=True)
+    transaction = models.ForeignKey(Transaction, on_delete=models.PROTECT, related_name="movimientos", null=True, blank=True)
+    cantidad = models.DecimalField(max_digits=20, decimal_places=2)
+    origen = models.CharField(max_length=20, choices=[('I', 'Ingreso'), ('S', 'Salida'), ('D', 'Devolucion'), ('T', 'Transferencia'), ('P', 'Produccion'), ('A', 'Ajuste')], default='A')
+    fecha = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventario', 'fecha']),
+            models.Index(fields=['bodega', 'fecha']),
+        ]
+
+class SnapshotStock(models.Model):
+    inventario = models.ForeignKey(Inventario, on_delete=models.CASCADE, related_name="snapshots")
+    fecha = models.DateTimeField(default=timezone.now)
+    stock = models.DecimalField(max_digits=20, decimal_places=2)
+    ultimo_movimiento = models.PositiveBigIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['inventario', 'fecha']),
+        ]
@@ -36,9 +36,7 @@ class ProductService(CRUD):
         return self.model.objects.filter(is_active=True)
     
     def get_stock_by_product(self, product_id):
-        product = self.get(id=product_id)
-        quantity = product.stock_total()
-        return quantity
+        return self.model.objects.filter(id=product_id).values_list('stock_actual', flat=True).first()
     
 class SupplierService(CRUD):
     def __init__(self):
@@ -114,6 +112,4 @@ class RawMaterialService(CRUD):
         return False, form
     
     def get_stock_by_raw_material(self, product_id):
-        product = self.get(id=product_id)
-        quantity = product.stock_total()
-        return quantity
\ No newline at end of file
+        return self.model.objects.filter(id=product_id).values_list('stock_actual', flat=True).first()
\ No newline at end of file
@@ -1,3 +1,101 @@
-from django.test import TestCase
+import datetime
+from django.contrib.auth.models import Group, User
+from decimal import Decimal
+from django.core.management import call_command
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
+from django.db.models import Sum
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+from django.utils import timezone
+from Accounts.models import Profile
+from Products.models import Category, Inventario, Lote, MovimientoStock, Producto, RawMaterialClass, Serie, SnapshotStock, Supplier
+from Sells.models import Warehouse
+from Sells.services import InventarioService
 
-# Create your tests here.
+
+class FixturesTest(TestCase):
+    def test_fixtures_cargan(self):
+        call_command(
+            'loaddata', 'fixtures/00_categories.json', 'fixtures/01_products.json',
+            'fixtures/02_supplier.json', 'fixtures/03_rawmaterial.json', verbosity=0,
+        )
+        self.assertTrue(Producto.objects.exists())
+        self.assertTrue(Supplier.objects.exists())
+        self.assertTrue(RawMaterialClass.objects.exists())
+
+
+class InventoryListQueriesTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        categoria = Category.objects.create(name='c')
+        proveedor = Supplier.objects.create(bussiness_name='s', rut='1-1')
+        bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        vence = timezone.localdate() + datetime.timedelta(days=5)
+        for i in range(60):
+            producto = Producto.objects.create(sku=f'P{i}', name=f'p{i}', category=categoria, batch_control=i % 2 == 0, serie_control=i % 2 == 1)
+            materia_prima = RawMaterialClass.objects.create(sku=f'R{i}', name=f'r{i}', category=categoria, supplier=proveedor, batch_control=True)
+            inventario_producto = Inventario.objects.create(producto=producto, bodega=bodega, stock_total=i)
+            inventario_materia = Inventario.objects.create(materia_prima=materia_prima, bodega=bodega, stock_total=i)
+            Lote.objects.create(codigo=f'L{i}', inventario=inventario_materia, cantidad_actual=i + 1, fecha_expiracion=vence)
+            if producto.serie_control:
+                Serie.objects.create(codigo=f'S{i}', inventario=inventario_producto, fecha_expiracion=vence)
+            else:
+                Lote.objects.create(codigo=f'L{i}', inventario=inventario_producto, cantidad_actual=1)
+        cls.user = User.objects.create_user('u', password='x')
+        cls.user.groups.add(Group.objects.create(name='Acceso Completo'))
+        Profile.objects.create(user=cls.user, run='1', is_new=False)
+
+    def test_consultas_constantes_por_pagina(self):
+        self.client.force_login(self.user)
+        self.client.get(reverse('inventory_list'))
+        for per_page in (25, 50, 100):
+            with self.subTest(per_page=per_page), self.assertNumQueries(5):
+                respuesta = self.client.get(reverse('inventory_list'), {'per_page': per_page})
+            self.assertEqual(len(respuesta.context['inventory']), per_page)
+
+
+class FusionInventariosDuplicadosTest(TransactionTestCase):
+    antes = [('Products', '0021_updated_at_movimientos')]
+    despues = [('Products', '0022_inventario_unico')]
+
+    def migrar(self, destino):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(destino)
+        return executor.loader.project_state(destino).apps
+
+    def setUp(self):
+        apps = self.migrar(self.antes)
+        self.addCleanup(self.migrar, self.despues)
+        modelo = apps.get_model
+        categoria = modelo('Products', 'Category').objects.create(name='c')
+        producto = modelo('Products', 'Producto').objects.create(sku='P1', name='p', category=categoria, batch_control=True)
+        bodega = modelo('Sells', 'Warehouse').objects.create(name='w', address='a', location='l', lilis=True)
+        hace_un_dia = timezone.now() - datetime.timedelta(days=1)
+        self.ids = []
+        for cantidad in (5, 3):
+            inventario = modelo('Products', 'Inventario').objects.create(producto=producto, bodega=bodega, stock_total=cantidad)
+            lote = modelo('Products', 'Lote').objects.create(codigo=f'L{cantidad}', inventario=inventario, cantidad_actual=cantidad)
+            movimiento = modelo('Products', 'MovimientoStock').objects.create(
+                inventario=inventario, producto=producto, bodega=bodega, lote=lote, cantidad=cantidad, fecha=hace_un_dia,
+            )
+            modelo('Products', 'SnapshotStock').objects.create(inventario=inventario, fecha=hace_un_dia, stock=cantidad, ultimo_movimiento=movimiento.id)
+            self.ids.append(inventario.id)
+        self.migrar(self.despues)
+
+    def test_fusiona_libro_y_reinicia_snapshots(self):
+        conservado = Inventario.objects.get()
+        self.assertEqual(conservado.id, self.ids[0])
+        self.assertEqual(conservado.stock_total, Decimal('8'))
+        self.assertEqual(Lote.objects.filter(inventario=conservado).aggregate(total=Sum('cantidad_actual'))['total'], Decimal('8'))
+        self.assertEqual(MovimientoStock.objects.filter(inventario=conservado).aggregate(total=Sum('cantidad'))['total'], Decimal('8'))
+        snapshots = SnapshotStock.objects.filter(inventario=conservado).order_by('fecha')
+        self.assertEqual([s.stock for s in snapshots], [Decimal('5'), Decimal('8')])
+        self.assertEqual(snapshots.last().ultimo_movimiento, MovimientoStock.objects.order_by('-id').first().id)
+        self.assertFalse(SnapshotStock.objects.filter(inventario_id=self.ids[1]).exists())
+        service = InventarioService()
+        self.assertEqual(service.stock_inventario_en_fecha(conservado, timezone.now()), Decimal('8'))
+        service.aplicar_delta_stock(conservado, -2)
+        MovimientoStock.objects.create(inventario=conservado, producto=conservado.producto, bodega=conservado.bodega, cantidad=-2)
+        self.assertEqual(service.stock_inventario_en_fecha(conservado, timezone.now()), Decimal('6'))
@@ -4,12 +4,13 @@ from django.contrib.auth.decorators import login_required
 from Main.decorator import permission_or_redirect
 from django.db.models import Q
 from django.http import HttpResponse, JsonResponse, HttpResponseRedirect 
-from Main.utils import generate_excel_response
 from Sells.services import InventarioService
 from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
-from Main.mixins import GroupRequiredMixin, StaffRequiredMixin
+from Main.mixins import GroupRequiredMixin, ExportMixin, StaffRequiredMixin
+from Main.pagination import CursorPaginator, conteo_aproximado, modo_cursor
+from Main.cache import catalogo_datos, catalogo_response
 from datetime import date, timedelta
 from django.template.defaultfilters import truncatechars
 
@@ -109,7 +110,7 @@ class CategoryDeleteView(GroupRequiredMixin, DeleteView):
         self.object.save()
         return HttpResponseRedirect(self.get_success_url())
         
-class CategoryExportView(GroupRequiredMixin, View):
+class CategoryExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Compras',
@@ -117,8 +118,11 @@ class CategoryExportView(GroupRequiredMixin, View):
         'Acceso limitado a Produccion',
         'Acceso limitado a Finanzas'
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
+    headers = ["Nombre", "Descripción"]
+    filename_prefix = "Lilis_Categorias"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
         qs = category_service.list().order_by('name')
         if q:
             qs = qs.filter(
@@ -126,7 +130,7 @@ class CategoryExportView(GroupRequiredMixin, View):
                 Q(description__icontains=q)
             )
 
-        qs_limit = request.GET.get("limit")
+        qs_limit = params.get("limit")
         if qs_limit:
             try:
                 limit = int(qs_limit)
@@ -134,17 +138,13 @@ class CategoryExportView(GroupRequiredMixin, View):
                     qs = qs[:limit] 
             except ValueError:
                 pass
+        return qs
 
-        headers = ["Nombre", "Descripción"]
-        data_rows = []
-
-        for c in qs:
-            data_rows.append([
-                c.name,
-                c.description
-            ])
-
-        return generate_excel_response(headers, data_rows, "Lilis_Categorias")
+    def export_row(self, c):
+        return [
+            c.name,
+            c.description
+        ]
 
 class ProductListView(GroupRequiredMixin, ListView):
     model = product_service.model
@@ -236,8 +236,8 @@ def product_search(request):
         })
     return JsonResponse({'data':data}, safe=False)
 
-def product_all(request):
-    products = product_service.model.objects.filter(is_active=True)
+def product_catalogo():
+    products = product_service.list_actives().select_related('category')
     data = []
     for p in products:
         data.append({
@@ -257,8 +257,17 @@ def product_all(request):
             'price':p.price,
             'iva':p.iva,
             'min_stock':p.min_stock,
+            'measurement_unit':p.measurement_unit,
         })
-    return JsonResponse({'data':data}, safe=False)
+    return data
+
+CATALOGO_PRODUCTOS = ('productos', (product_service.model, category_service.model), product_catalogo)
+
+def productos_activos():
+    return catalogo_datos(*CATALOGO_PRODUCTOS)
+
+def product_all(request):
+    return catalogo_response(*CATALOGO_PRODUCTOS)
 
 class ProductView(GroupRequiredMixin, DetailView):
     model = product_service.model
@@ -330,7 +339,7 @@ class ProductSearchView(GroupRequiredMixin, View):
         ).values('id', 'name', 'description', 'category__name', 'is_perishable')    
         return JsonResponse(list(products), safe=False)
 
-class ProductExportView(GroupRequiredMixin, View):
+class ProductExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Compras',
@@ -338,8 +347,19 @@ class ProductExportView(GroupRequiredMixin, View):
         "Acceso limitado a Produccion",
         "Acceso limitado a Finanzas"
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
+    headers = [
+        "Nombre",
+        "SKU",
+        "Deficit",
+        "Categoría",
+        "Control por lote",
+        "Control por serie",
+        "Perecible",
+    ]
+    filename_prefix = "Lilis_Productos"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
         qs = product_service.list().filter(is_active=True).select_related("category").order_by('name')
         if q:
             qs = qs.filter(
@@ -348,39 +368,26 @@ class ProductExportView(GroupRequiredMixin, View):
                 Q(category__name__icontains=q)
             )
         
-        qs_limit = request.GET.get("limit")
+        qs_limit = params.get("limit")
         if qs_limit:
             try:
                 limit = int(qs_limit)
                 if limit > 0:
                     qs = qs[:limit] 
             except ValueError:
-                pass 
-
-        headers = [
-            "Nombre",
-            "SKU",
-            "Deficit",
-            "Categoría",
-            "Control por lote",
-            "Control por serie",
-            "Perecible",
+                pass
+        return qs
+
+    def export_row(self, p):
+        return [
+            p.name,
+            p.sku,
+            p.deficit,
+            p.category.name,
+            p.batch_control,
+            p.serie_control,
+            "Sí" if p.is_perishable else "No",
         ]
-        data_rows = []
-        
-        for p in qs:
-            is_perishable_str = "Sí" if p.is_perishable else "No"
-            data_rows.append([
-                p.name,
-                p.sku,
-                p.deficit,
-                p.category.name,
-                p.batch_control,
-                p.serie_control,
-                is_perishable_str,
-            ])
-
-        return generate_excel_response(headers, data_rows, "Lilis_Productos")
 
 def supplier_search(request):
     q = request.GET.get('q', '')
@@ -413,8 +420,8 @@ def supplier_search(request):
         })
     return JsonResponse({'data':data}, safe=False)
 
-def supplier_all(request):
-    suppliers = supplier_service.model.objects.filter(is_active=True)
+def supplier_catalogo():
+    suppliers = supplier_service.list_actives()
     data = []
     for s in suppliers:
         if s.trade_terms:
@@ -437,7 +444,15 @@ def supplier_all(request):
             'payment_terms_days': s.payment_terms_days,
             'discount_percentage': s.discount_percentage,
         })
-    return JsonResponse({'data':data}, safe=False)
+    return data
+
+CATALOGO_PROVEEDORES = ('proveedores', (supplier_service.model,), supplier_catalogo)
+
+def proveedores_activos():
+    return catalogo_datos(*CATALOGO_PROVEEDORES)
+
+def supplier_all(request):
+    return catalogo_response(*CATALOGO_PROVEEDORES)
 
 class SupplierDetailView(GroupRequiredMixin, DetailView):
     model = supplier_service.model
@@ -556,7 +571,7 @@ class SupplierDeleteView(GroupRequiredMixin, DeleteView):
         self.object.save()
         return HttpResponseRedirect(self.get_success_url())
     
-class SupplierExportView(GroupRequiredMixin, View):
+class SupplierExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Compras',
@@ -564,8 +579,11 @@ class SupplierExportView(GroupRequiredMixin, View):
         "Acceso limitado a Produccion",
         "Acceso limitado a Finanzas"
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
+    headers = ["Nombre Fantasía", "Razón Social", "RUT", "Email", "Teléfono", "Términos"]
+    filename_prefix = "Lilis_Proveedores"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
         qs = supplier_service.list().order_by('fantasy_name')
         if q:
             qs = qs.filter(
@@ -576,7 +594,7 @@ class SupplierExportView(GroupRequiredMixin, View):
                 Q(phone__icontains=q) |
                 Q(trade_terms__icontains=q)
             )
-        qs_limit = request.GET.get("limit")
+        qs_limit = params.get("limit")
         if qs_limit:
             try:
                 limit = int(qs_limit)
@@ -584,18 +602,17 @@ class SupplierExportView(GroupRequiredMixin, View):
                     qs = qs[:limit] 
             except ValueError:
                 pass
-        headers = ["Nombre Fantasía", "Razón Social", "RUT", "Email", "Teléfono", "Términos"]
-        data_rows = []
-        for s in qs:
-            data_rows.append([
-                s.fantasy_name,
-                s.bussiness_name,
-                s.rut,
-                s.email,
-                s.phone,
-                s.trade_terms
-            ])
-        return generate_excel_response(headers, data_rows, "Lilis_Proveedores")
+        return qs
+
+    def export_row(self, s):
+        return [
+            s.fantasy_name,
+            s.bussiness_name,
+            s.rut,
+            s.email,
+            s.phone,
+            s.trade_terms
+        ]
 
 class RawMaterialListView(GroupRequiredMixin, ListView):
     model = raw_material_service.model
@@ -688,8 +705,8 @@ def raw_material_search(request):
         })
     return JsonResponse({'data':data}, safe=False)
 
-def raw_material_all(request):
-    raw_materials = raw_material_service.model.objects.filter(is_active=True)
+def raw_material_catalogo():
+    raw_materials = raw_material_service.list_actives().select_related('category')
     data = []
     for rm in raw_materials:
         data.append({
@@ -708,8 +725,17 @@ def raw_material_all(request):
             'price':rm.price,
             'iva':rm.iva,
             'min_stock':rm.min_stock,
+            'measurement_unit':rm.measurement_unit,
         })
-    return JsonResponse({'data':data}, safe=False)
+    return data
+
+CATALOGO_MATERIAS_PRIMAS = ('materias_primas', (raw_material_service.model, category_service.model), raw_material_catalogo)
+
+def materias_primas_activas():
+    return catalogo_datos(*CATALOGO_MATERIAS_PRIMAS)
+
+def raw_material_all(request):
+    return catalogo_response(*CATALOGO_MATERIAS_PRIMAS)
 
 class RawMaterialView(GroupRequiredMixin, DetailView):
     model = raw_material_service.model
@@ -824,7 +850,7 @@ class RawMaterialDeleteView(GroupRequiredMixin, DeleteView):
         self.object.save()
         return HttpResponseRedirect(self.get_success_url())
     
-class RawMaterialExportView(GroupRequiredMixin, View):
+class RawMaterialExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Compras',
@@ -832,8 +858,11 @@ class RawMaterialExportView(GroupRequiredMixin, View):
         "Acceso limitado a Produccion",
         "Acceso limitado a Finanzas"
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
+    headers = ["Nombre", "Proveedor", "Categoría", "Perecible", 'Unidad de medida']
+    filename_prefix = "Lilis_Materias_Primas"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
         qs = raw_material_service.list_actives().select_related(
             "supplier", 
             "category"
@@ -846,27 +875,24 @@ class RawMaterialExportView(GroupRequiredMixin, View):
                 Q(category__name__icontains=q)
             )
         
-        qs_limit = request.GET.get("limit")
+        qs_limit = params.get("limit")
         if qs_limit:
             try:
                 limit = int(qs_limit)
                 if limit > 0:
                     qs = qs[:limit] 
             except ValueError:
-                pass 
+                pass
+        return qs
 
-        headers = ["Nombre", "Proveedor", "Categoría", "Perecible", 'Unidad de medida']
-        data_rows = []
-        
-        for rm in qs:
-            data_rows.append([
-                rm.name,
-                rm.supplier.fantasy_name,
-                rm.category.name,
-                "Sí" if rm.is_perishable else "No",
-                rm.measurement_unit,
-            ])
-        return generate_excel_response(headers, data_rows, "Lilis_Materias_Primas")
+    def export_row(self, rm):
+        return [
+            rm.name,
+            rm.supplier.fantasy_name,
+            rm.category.name,
+            "Sí" if rm.is_perishable else "No",
+            rm.measurement_unit,
+        ]
 
 class InventoryListView(GroupRequiredMixin, ListView):
     model = inventory_service.model
@@ -882,7 +908,8 @@ class InventoryListView(GroupRequiredMixin, ListView):
     )
 
     def get_queryset(self):
-        qs = super().get_queryset()
+        qs = super().get_queryset().select_related('producto', 'materia_prima', 'bodega')
+        qs = inventory_service.con_alertas(inventory_service.con_proxima_expiracion(qs))
         q = (self.request.GET.get("q") or "").strip()
         if q:
             qs = qs.filter(
@@ -903,12 +930,24 @@ class InventoryListView(GroupRequiredMixin, ListView):
         qs = qs.order_by(order_by_field)
         return qs
     
+    def paginate_queryset(self, queryset, page_size):
+        if not modo_cursor(self.request):
+            return super().paginate_queryset(queryset, page_size)
+        ordering = tuple(o for o in queryset.query.order_by if o.lstrip('-') == 'stock_total') or ('-stock_total',)
+        paginator = CursorPaginator(queryset, page_size, ordering=ordering)
+        page = paginator.page(self.request.GET.get('cursor'))
+        return (paginator, page, page.object_list, page.has_other_pages())
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         query = self.request.GET.copy()
         if 'page' in query:
             query.pop('page')
+        query.pop('cursor', None)
         context['querystring'] = query.urlencode()
+        if modo_cursor(self.request):
+            context['paginacion_cursor'] = True
+            context['total'] = conteo_aproximado(self.object_list)
         q = (self.request.GET.get("q") or "").strip()
         sort_by = self.request.GET.get('sort_by', 'stock_total')
         order = self.request.GET.get('order', 'desc')
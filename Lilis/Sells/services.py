@@ -1,20 +1,46 @@
 from django.shortcuts import render
 from Main.CRUD import CRUD
 from .models import Client, Warehouse, WareClient
-from Products.models import Transaction, Inventario, Lote, Serie, TransactionDetail
+from Products.models import Transaction, Inventario, Lote, Serie, TransactionDetail, MovimientoStock, SnapshotStock
 from .forms import LoteProductoForm,TransactionForm,ClientForm, WarehouseForm
 from Products.models import RawMaterialClass, Producto
 from Products.services import ProductService,RawMaterialService
+from Products import fulltext
 from decimal import Decimal
-from django.db.models import Sum
+from django.db.models import Sum, Count, Case, When, Value, Exists, OuterRef, Subquery, DecimalField, BigIntegerField, BooleanField
+from django.db.models.functions import Coalesce
+from django.db.models.expressions import RawSQL
 from django.utils import timezone
 import datetime
 from django.db.models import Q
 from django.db.models import F
+from django.conf import settings
+from django.core.cache import cache
+from Main.cache import invalidar, invalidar_modelos
+from django.db import transaction as db_transaction, IntegrityError
 from itertools import chain
+from collections import defaultdict
 
 LILIS_RUT = "2519135-8"
 
+ESTRATEGIAS_CONSUMO = {
+    'FEFO': (F('fecha_expiracion').asc(nulls_last=True), 'fecha_creacion', 'id'),
+    'FIFO': ('fecha_creacion', 'id'),
+    'LIFO': ('-fecha_creacion', '-id'),
+}
+
+ORIGENES_MOVIMIENTO = {
+    'ingreso': 'I',
+    'salida': 'S',
+    'devolucion': 'D',
+    'transferencia': 'T',
+    'produccion': 'P',
+}
+
+EPOCA = datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+
+KPIS_CACHE_KEY = 'transacciones:kpis:{fecha}'
+
 
 class ClientService(CRUD):  
     def __init__(self):
@@ -129,197 +155,300 @@ class InventarioService(CRUD):
         self.raw_class = RawMaterialClass
         self.product_class = Producto
         self.serie = Serie
+        self.movimientos = MovimientoStock
+        self.snapshots = SnapshotStock
         self.bodegas = WarehouseService
     
-    
+    def movimiento(self, inventario, cantidad, transaction=None, lote_id=None, serie_id=None):
+        return self.movimientos(
+            inventario_id=inventario.pk,
+            producto_id=inventario.producto_id,
+            materia_prima_id=inventario.materia_prima_id,
+            bodega_id=inventario.bodega_id,
+            lote_id=lote_id,
+            serie_id=serie_id,
+            transaction=transaction,
+            cantidad=cantidad,
+            origen=ORIGENES_MOVIMIENTO.get(getattr(transaction, 'type', None), 'A'),
+        )
+
+    def registrar_movimientos(self, movimientos, chunk_size=1000):
+        if movimientos:
+            self.movimientos.objects.bulk_create(movimientos, batch_size=chunk_size)
+
+    def token_cambios(self):
+        limite = timezone.now() - datetime.timedelta(seconds=settings.SYNC_MARGEN_SEGUNDOS)
+        return (limite - EPOCA) // datetime.timedelta(microseconds=1)
+
+    def cambios_desde(self, qs, token):
+        return qs.filter(updated_at__gt=EPOCA + datetime.timedelta(microseconds=token))
+
+    def anotar_snapshot(self, qs, fecha):
+        snapshot = self.snapshots.objects.filter(inventario=OuterRef('pk'), fecha__lte=fecha).order_by('-fecha', '-id')
+        return qs.annotate(
+            snapshot_stock=Coalesce(
+                Subquery(snapshot.values('stock')[:1]), Value(Decimal('0')),
+                output_field=DecimalField(max_digits=20, decimal_places=2),
+            ),
+            snapshot_movimiento=Coalesce(Subquery(snapshot.values('ultimo_movimiento')[:1]), Value(0), output_field=BigIntegerField()),
+        )
+
+    def suma_movimientos(self, **filtros):
+        deltas = (
+            self.movimientos.objects
+            .filter(inventario=OuterRef('pk'), id__gt=OuterRef('snapshot_movimiento'), **filtros)
+            .values('inventario')
+            .annotate(total=Sum('cantidad'))
+            .values('total')
+        )
+        return Coalesce(Subquery(deltas), Value(Decimal('0')), output_field=DecimalField(max_digits=20, decimal_places=2))
+
+    def tomar_snapshots(self, chunk_size=2000):
+        ahora = timezone.now()
+        reciente = self.movimientos.objects.filter(inventario=OuterRef('pk')).order_by('-id').values('id')[:1]
+        pendientes = (
+            self.anotar_snapshot(self.model.objects.all(), ahora)
+            .annotate(movimiento_reciente=Subquery(reciente))
+            .filter(movimiento_reciente__gt=F('snapshot_movimiento'))
+            .annotate(stock=F('snapshot_stock') + self.suma_movimientos(id__lte=OuterRef('movimiento_reciente')))
+            .order_by('id')
+            .values_list('id', 'stock', 'movimiento_reciente')
+        )
+        creados = 0
+        bloque = []
+        with db_transaction.atomic():
+            for id, stock, ultimo in pendientes.iterator(chunk_size=chunk_size):
+                bloque.append(self.snapshots(inventario_id=id, fecha=ahora, stock=stock, ultimo_movimiento=ultimo))
+                if len(bloque) >= chunk_size:
+                    self.snapshots.objects.bulk_create(bloque)
+                    creados += len(bloque)
+                    bloque = []
+            self.snapshots.objects.bulk_create(bloque)
+        return creados + len(bloque)
+
+    def stock_en_fecha(self, fecha, **filtros):
+        return (
+            self.anotar_snapshot(self.model.objects.filter(**filtros), fecha)
+            .annotate(stock_en_fecha=F('snapshot_stock') + self.suma_movimientos(fecha__lte=fecha))
+        )
+
+    def stock_inventario_en_fecha(self, inventario, fecha):
+        inventario_id = getattr(inventario, 'pk', inventario)
+        return self.stock_en_fecha(fecha, id=inventario_id).values_list('stock_en_fecha', flat=True).first()
+
+    def stock_bodega_en_fecha(self, bodega, fecha):
+        return self.stock_en_fecha(fecha, bodega=bodega).select_related('producto', 'materia_prima')
 
     
-    def actualizar_stock(self, inventario):
-        if inventario.lotes.exists():
-            print("actualizando stock, lotes")
-            lotes = inventario.lotes.all()
-            stock_total = lotes.aggregate(stock_total=Sum('cantidad_actual'))['stock_total'] or 0
-            inventario.stock_total = stock_total
-            inventario.save()
-            print("nuevo stock", inventario.stock_total)
-        else:
-            print("actualizando stock, series")
-            series = inventario.series.all().filter(estado='A')
-            stock_total = series.count()
-            inventario.stock_total = stock_total
-            inventario.save()
-            print("nuevo stock ", inventario.stock_total)
-        try:
-            deficit = Decimal(inventario.producto.deficit)
-            if inventario.stock_total > deficit:
-                inventario.stock_total -= deficit
-                inventario.producto.deficit = 0
-                inventario.producto.save()
-        except:
-            deficit = Decimal(inventario.materia_prima.deficit)
-            if inventario.stock_total > deficit:
-                inventario.stock_total -= deficit
-                inventario.materia_prima.deficit = 0
-                inventario.materia_prima.save()
+    def aplicar_delta_stock(self, inventario, delta):
+        delta = Decimal(delta)
+        if delta == 0:
+            return
+        if not isinstance(inventario, self.model):
+            inventario = self.model.objects.only('id', 'producto_id', 'materia_prima_id').get(pk=inventario)
+        ahora = timezone.now()
+        self.model.objects.filter(id=inventario.pk).update(stock_total=F('stock_total') + delta, updated_at=ahora)
+        self.item_de(inventario).update(stock_actual=F('stock_actual') + delta, updated_at=ahora)
+        db_transaction.on_commit(lambda: invalidar('inventario'))
+        if delta > 0:
+            self.saldar_deficit(inventario)
+
+    def item_de(self, inventario):
+        if inventario.producto_id:
+            return self.product_class.objects.filter(pk=inventario.producto_id)
+        return self.raw_class.objects.filter(pk=inventario.materia_prima_id)
 
-    def crear_lote_entrada(self, data):
+    def saldar_deficit(self, inventario):
+        items = self.item_de(inventario)
+        saldados = items.filter(
+            deficit__gt=0,
+            inventario__id=inventario.pk,
+            inventario__stock_total__gt=F('deficit'),
+        ).update(deficit=0, updated_at=timezone.now())
+        if saldados:
+            db_transaction.on_commit(lambda: invalidar_modelos(items.model))
+
+    def stock_esperado(self):
+        lotes = (
+            self.lote.objects.filter(inventario=OuterRef('pk'))
+            .values('inventario')
+            .annotate(total=Sum('cantidad_actual'))
+            .values('total')
+        )
+        series = (
+            self.serie.objects.filter(inventario=OuterRef('pk'), estado='A')
+            .values('inventario')
+            .annotate(total=Count('id'))
+            .values('total')
+        )
+        return self.model.objects.annotate(
+            stock_esperado=Case(
+                When(
+                    Exists(self.lote.objects.filter(inventario=OuterRef('pk'))),
+                    then=Coalesce(Subquery(lotes), Value(Decimal('0')), output_field=DecimalField(max_digits=20, decimal_places=2)),
+                ),
+                default=Coalesce(Subquery(series), Value(0)),
+                output_field=DecimalField(max_digits=20, decimal_places=2),
+            )
+        )
+
+    def reconciliar_stock(self, reparar=False, chunk_size=2000):
+        descuadres = []
+        qs = self.stock_esperado().only('id', 'stock_total').order_by('id')
+        for inv in qs.iterator(chunk_size=chunk_size):
+            if inv.stock_total != inv.stock_esperado:
+                descuadres.append((inv.id, inv.stock_total, inv.stock_esperado))
+        if reparar and descuadres:
+            ahora = timezone.now()
+            self.model.objects.bulk_update(
+                [self.model(id=id, stock_total=esperado, updated_at=ahora) for id, _, esperado in descuadres],
+                ['stock_total', 'updated_at'],
+                batch_size=chunk_size,
+            )
+            self.recalcular_stock_items(chunk_size)
+        return descuadres
+
+    def recalcular_stock_items(self, chunk_size=2000):
+        corregidos = 0
+        for item_model, campo in ((self.product_class, 'producto'), (self.raw_class, 'materia_prima')):
+            total = (
+                self.model.objects.filter(**{campo: OuterRef('pk')})
+                .values(campo)
+                .annotate(total=Sum('stock_total'))
+                .values('total')
+            )
+            qs = (
+                item_model.objects
+                .annotate(esperado=Coalesce(Subquery(total), Value(Decimal('0')), output_field=DecimalField(max_digits=20, decimal_places=2)))
+                .only('id', 'stock_actual')
+                .order_by('id')
+            )
+            ahora = timezone.now()
+            cambios = [
+                item_model(id=item.id, stock_actual=item.esperado, updated_at=ahora)
+                for item in qs.iterator(chunk_size=chunk_size)
+                if item.stock_actual != item.esperado
+            ]
+            item_model.objects.bulk_update(cambios, ['stock_actual', 'updated_at'], batch_size=chunk_size)
+            corregidos += len(cambios)
+        return corregidos
+
+    def crear_lote_entrada(self, data, transaction=None):
         if not data:
             return False, None
         lote = self.lote.objects.create(**data)
-        self.actualizar_stock(lote.inventario)
+        self.aplicar_delta_stock(lote.inventario, lote.cantidad_actual)
+        self.registrar_movimientos([self.movimiento(lote.inventario, lote.cantidad_actual, transaction, lote_id=lote.pk)])
         return True, lote
     
-    def crear_serie_entrada(self, data):
+    def crear_serie_entrada(self, data, transaction=None):
         if not data:
             return False, None
         serie = self.serie.objects.create(**data)
-        print("serie creada ",serie)
-        self.actualizar_stock(serie.inventario)
+        self.aplicar_delta_stock(serie.inventario, 1)
+        self.registrar_movimientos([self.movimiento(serie.inventario, 1, transaction, serie_id=serie.pk)])
         return True, serie
 
-    def consumir_series_p(self, producto, cantidad):
-        resta = Decimal(cantidad)
-        series = self.serie.objects.filter(inventario__producto=producto, estado='A').order_by('-fecha_expiracion')
-        for s in series:
-            if resta == 0:
-                break
-            s.estado = 'I'
-            s.save()
-            resta -= 1
-            self.actualizar_stock(s.inventario)
-        if resta > 0:
-            producto.deficit += resta
-            producto.save()
-        return True
-    
-    def consumir_series_m(self, materia_prima, cantidad):
-        resta = Decimal(cantidad)
-        series = self.serie.objects.filter(inventario__materia_prima=materia_prima, estado='A').order_by('-fecha_expiracion')
-        for s in series:
-            if resta == 0:
-                break
-            s.estado = 'I'
-            s.save()
-            resta -= 1
-            self.actualizar_stock(s.inventario)
-        if resta > 0:
-            materia_prima.deficit += resta
-            materia_prima.save()
-        return True
+    def codigos_serie(self, codigo, cantidad):
+        return [f'{codigo}-{i}' for i in range(1, int(cantidad) + 1)]
 
-    def consumir_lotes_p(self, producto, cantidad):
-        resta = Decimal(cantidad)
-        lotes = self.lote.objects.filter(inventario__producto=producto).order_by('-fecha_expiracion')
-        for l in lotes:
-            if resta == 0:
-                break
-            if l.cantidad_actual == 0:
-                continue
-            if l.cantidad_actual >= resta:
-                l.cantidad_actual -= resta
-                l.save()
-                self.actualizar_stock(l.inventario)
-                return True
-            resta -= l.cantidad_actual
-            l.cantidad_actual = 0
-            l.save()
-            self.actualizar_stock(l.inventario)
-        if resta > 0:
-            producto.deficit += resta
-            producto.save()
-        return True
+    def emitir_series(self, inventario, codigos, fecha_expiracion=None, chunk_size=1000, transaction=None):
+        series = []
+        for i in range(0, len(codigos), chunk_size):
+            bloque = codigos[i:i + chunk_size]
+            creadas = self.serie.objects.bulk_create([
+                self.serie(codigo=c, inventario=inventario, estado='A', fecha_expiracion=fecha_expiracion)
+                for c in bloque
+            ])
+            if creadas and creadas[0].pk is None:
+                ids = dict(
+                    self.serie.objects.filter(inventario=inventario, codigo__in=bloque)
+                    .order_by('id')
+                    .values_list('codigo', 'id')
+                )
+                for serie in creadas:
+                    serie.pk = ids[serie.codigo]
+            self.registrar_movimientos([self.movimiento(inventario, 1, transaction, serie_id=s.pk) for s in creadas], chunk_size)
+            series.extend(creadas)
+        self.aplicar_delta_stock(inventario, len(series))
+        return series
+
+    def orden_consumo(self, estrategia=None):
+        estrategia = (estrategia or getattr(settings, 'INVENTARIO_ESTRATEGIA_CONSUMO', 'FEFO')).upper()
+        if estrategia not in ESTRATEGIAS_CONSUMO:
+            raise ValueError(f'Estrategia de consumo desconocida: {estrategia}')
+        return ESTRATEGIAS_CONSUMO[estrategia]
 
-    def consumir_lotes_m(self, materia_prima, cantidad):
-        resta = Decimal(cantidad)
-        lotes = self.lote.objects.filter(inventario__materia_prima=materia_prima).order_by('-fecha_expiracion')
+    def planificar_consumo_lotes(self, lotes, cantidad):
+        restante = Decimal(cantidad)
+        plan = []
         for l in lotes:
-            if resta == 0:
+            if restante <= 0:
                 break
-            if l.cantidad_actual == 0:
-                continue
-            if l.cantidad_actual >= resta:
-                l.cantidad_actual -= resta
-                l.save()
-                self.actualizar_stock(l.inventario)
-                return True
-            resta -= l.cantidad_actual
-            l.cantidad_actual = 0
-            l.save()
-            self.actualizar_stock(l.inventario)
-        if resta > 0:
-            materia_prima.deficit += resta
-            materia_prima.save()
-        return True
+            tomado = min(l.cantidad_actual, restante)
+            l.cantidad_actual -= tomado
+            restante -= tomado
+            plan.append((l, tomado))
+        return plan, restante
 
-    def consumir_lotes_inventario(self, inventario, cantidad):
-        cantidad = Decimal(cantidad)
-        print("consumiendo lotes")
-        lotes = self.lote.objects.filter(inventario=inventario).order_by('-fecha_expiracion')
-        print("estos son los lotes",lotes)
-        for l in lotes:
-            print("lote ",l)
-            if l.cantidad_actual == 0:
-                print("lote sin stock")
-                continue
-            if l.cantidad_actual >= cantidad:
-                print("lote con stock suficiente")
-                l.cantidad_actual -= cantidad
-                l.save()
-                self.actualizar_stock(l.inventario)
-                return True
-            print("lote con stock insuficiente")
-            cantidad -= l.cantidad_actual
-            l.cantidad_actual = 0
-            l.save()
-            self.actualizar_stock(l.inventario)
-        if cantidad > 0:
-            try: 
-                inventario.producto.deficit += cantidad
-                inventario.producto.save()
-                print("deficit actualizado",inventario.deficit)
-                return True
-            except:
-                inventario.materia_prima.deficit += cantidad
-                inventario.materia_prima.save()
-                print("deficit actualizado",inventario.deficit)
-                return True
-        return False
-    
-    def consumir_series_inventario(self, inventario, cantidad):
+    def consumir(self, cantidad, producto=None, materia_prima=None, inventario=None, estrategia=None, transaction=None):
+        if inventario is not None:
+            filtro = {'inventario': inventario}
+            item = inventario.producto or inventario.materia_prima
+        elif producto is not None:
+            filtro = {'inventario__producto': producto}
+            item = producto
+        elif materia_prima is not None:
+            filtro = {'inventario__materia_prima': materia_prima}
+            item = materia_prima
+        else:
+            return False
         cantidad = Decimal(cantidad)
-        print("consumiendo series")
-        series = self.serie.objects.filter(inventario=inventario).order_by('-fecha_expiracion')
-        print(series)
-        i = 0
-        for s in series:
-            if cantidad == 0:
-                break
-            i += 1
-            print(i,"- serie ",s.id)
-            if s.estado == 'I':
-                print("serie inactiva")
-                continue
-            s.estado = 'I'
-            s.save()
-            cantidad -= 1
-            print('serie activa ',s.id)
-            self.actualizar_stock(s.inventario)
-            print("cantidad restante ",cantidad)
-        if cantidad > 0:
-            try:
-                inventario.producto.deficit += cantidad
-                inventario.producto.save()
-                print("deficit actualizado",inventario.producto.deficit)
-                return True
-            except:
-                inventario.materia_prima.deficit += cantidad
-                inventario.materia_prima.save()
-                print("deficit actualizado",inventario.materia_prima.deficit)
-                return True
-        return False
+        orden = self.orden_consumo(estrategia)
+        with db_transaction.atomic(savepoint=False):
+            if item.batch_control:
+                lotes = (
+                    self.lote.objects.select_for_update().filter(cantidad_actual__gt=0, **filtro)
+                    .order_by(*orden)
+                    .only('id', 'inventario_id', 'cantidad_actual')
+                )
+                plan, restante = self.planificar_consumo_lotes(lotes.iterator(), cantidad)
+                ahora = timezone.now()
+                for l, _ in plan:
+                    l.updated_at = ahora
+                self.lote.objects.bulk_update([l for l, _ in plan], ['cantidad_actual', 'updated_at'])
+                deltas = defaultdict(Decimal)
+                for l, tomado in plan:
+                    deltas[l.inventario_id] -= tomado
+                consumos = [(l.inventario_id, -tomado, l.id, None) for l, tomado in plan]
+            else:
+                series = list(
+                    self.serie.objects.select_for_update().filter(estado='A', **filtro)
+                    .order_by(*orden)
+                    .values_list('id', 'inventario_id')[:max(int(cantidad), 0)]
+                )
+                self.serie.objects.filter(id__in=[s[0] for s in series]).update(estado='I', updated_at=timezone.now())
+                restante = cantidad - len(series)
+                deltas = defaultdict(Decimal)
+                for _, inventario_id in series:
+                    deltas[inventario_id] -= 1
+                consumos = [(inventario_id, -1, None, id) for id, inventario_id in series]
+            inventarios = self.model.objects.only('id', 'producto_id', 'materia_prima_id', 'bodega_id').in_bulk(list(deltas))
+            for inventario_id, delta in deltas.items():
+                self.aplicar_delta_stock(inventarios[inventario_id], delta)
+            self.registrar_movimientos([
+                self.movimiento(inventarios[inventario_id], cant, transaction, lote_id=lote_id, serie_id=serie_id)
+                for inventario_id, cant, lote_id, serie_id in consumos
+            ])
+            if restante > 0:
+                type(item).objects.filter(pk=item.pk).update(deficit=F('deficit') + restante, updated_at=timezone.now())
+                db_transaction.on_commit(lambda: invalidar_modelos(type(item)))
+        return True
 
     def agregar_lotes_inventario(self, inventario, cantidad):
         cantidad = Decimal(cantidad)
+        agregado = cantidad
+        lote = None
         lotes = self.lote.objects.filter(inventario=inventario).order_by('-fecha_expiracion')
         for l in lotes:
             if cantidad == 0:
@@ -327,11 +456,13 @@ class InventarioService(CRUD):
             if l.cantidad_actual == 0:
                 l.cantidad_actual += cantidad
                 l.save()
+                lote = l
                 cantidad = 0
                 break
         if cantidad > 0:
-            self.lote.objects.create(inventario=inventario, fecha_expiracion=None, cantidad_actual=cantidad)
-        self.actualizar_stock(inventario)
+            lote = self.lote.objects.create(inventario=inventario, fecha_expiracion=None, cantidad_actual=cantidad)
+        self.aplicar_delta_stock(inventario, agregado)
+        self.registrar_movimientos([self.movimiento(inventario, agregado, lote_id=lote.pk if lote else None)])
         return True
     
     def agregar_series_inventario(self, inventario, cantidad):
@@ -342,7 +473,6 @@ class InventarioService(CRUD):
             return False
             
         if cantidad_a_agregar <= 0:
-            self.actualizar_stock(inventario)
             return True
             
         series_inactivas_qs = self.serie.objects.filter(
@@ -351,22 +481,29 @@ class InventarioService(CRUD):
         ).values_list('id', flat=True) 
         num_a_reusar = min(cantidad_a_agregar, series_inactivas_qs.count())
         
+        ids_a_activar = []
         if num_a_reusar > 0:
             ids_a_activar = list(series_inactivas_qs[:num_a_reusar])
-            self.serie.objects.filter(id__in=ids_a_activar).update(estado='A')
+            self.serie.objects.filter(id__in=ids_a_activar).update(estado='A', updated_at=timezone.now())
             
         cantidad_restante_a_crear = cantidad_a_agregar - num_a_reusar
-            
+        nuevas_series = []
         if cantidad_restante_a_crear > 0:
             nuevas_series = [
                 self.serie(inventario=inventario, estado='A', fecha_expiracion=None)
                 for _ in range(cantidad_restante_a_crear)
             ]
             self.serie.objects.bulk_create(nuevas_series)
-        self.actualizar_stock(inventario)
+        self.aplicar_delta_stock(inventario, cantidad_a_agregar)
+        self.registrar_movimientos(
+            [self.movimiento(inventario, 1, serie_id=id) for id in ids_a_activar] +
+            [self.movimiento(inventario, 1, serie_id=s.pk) for s in nuevas_series]
+        )
         return True
     
+    @db_transaction.atomic
     def editar_stock(self, inventario, cantidad):
+        inventario = self.model.objects.select_for_update().select_related('producto', 'materia_prima').get(pk=inventario.pk)
         try:
             stock = float(inventario.stock_total)
             cant = float(cantidad)
@@ -381,10 +518,7 @@ class InventarioService(CRUD):
             item = inventario.materia_prima
         match diferencia:
             case diferencia if diferencia < 0:
-                if item.batch_control:
-                    self.consumir_lotes_inventario(inventario, abs(diferencia))
-                else:
-                    self.consumir_series_inventario(inventario, abs(diferencia))
+                self.consumir(abs(diferencia), inventario=inventario)
             case diferencia if diferencia > 0:
                 if item.batch_control:
                     self.agregar_lotes_inventario(inventario, diferencia)
@@ -415,11 +549,11 @@ class InventarioService(CRUD):
                 case item if item.batch_control:
                     print("es un producto con control de lotes")
                     control = "lotes"
-                    self.consumir_lotes_inventario(inventario, cantidad)
+                    self.consumir(cantidad, inventario=inventario, transaction=transaction)
                 case item if item.serie_control:
                     print("es un producto con control de series")
                     control = "series"
-                    self.consumir_series_inventario(inventario, cantidad)
+                    self.consumir(cantidad, inventario=inventario, transaction=transaction)
         print("transferencia exitosa")
         print("creando control")
         match control:
@@ -433,25 +567,54 @@ class InventarioService(CRUD):
                     "fecha_creacion": transaction.date,
                     "origen": "T"
                 }
-                ok, l = self.crear_lote_entrada(data)
+                ok, l = self.crear_lote_entrada(data, transaction)
                 controles.append(l)
                 batch = True
             case "series":
-                for i in range(int(cantidad)):
-                    print("creando serie", i+1)
-                    data = {
-                        "codigo": transaction.code + "-" + str(i+1),
-                        "inventario":nuevo_inventario,
-                        "fecha_expiracion": transaction.expiration_date,
-                        "fecha_creacion": transaction.date,
-                        "estado": "A"
-                    }
-                    ok, s = self.crear_serie_entrada(data)
-                    controles.append(s)
-        self.actualizar_stock(nuevo_inventario)
-        self.actualizar_stock(inventario)
+                controles = self.emitir_series(
+                    nuevo_inventario,
+                    self.codigos_serie(transaction.code, cantidad),
+                    transaction.expiration_date,
+                    transaction=transaction,
+                )
         return True, controles, batch
             
+    def con_proxima_expiracion(self, qs=None):
+        qs = self.model.objects.all() if qs is None else qs
+        lotes = self.lote.objects.filter(inventario=OuterRef('pk'), cantidad_actual__gt=0, fecha_expiracion__isnull=False)
+        series = self.serie.objects.filter(inventario=OuterRef('pk'), estado='A', fecha_expiracion__isnull=False)
+        return qs.annotate(
+            proxima_expiracion=Coalesce(
+                Subquery(lotes.order_by('fecha_expiracion').values('fecha_expiracion')[:1]),
+                Subquery(series.order_by('fecha_expiracion').values('fecha_expiracion')[:1]),
+            ),
+        )
+
+    def con_alertas(self, qs=None):
+        qs = self.model.objects.all() if qs is None else qs
+        return (
+            qs.annotate(
+                alerta_stock=Coalesce('producto__alerta_bajo_stock', 'materia_prima__alerta_bajo_stock'),
+                alerta_por_vencer=Coalesce('producto__alerta_por_vencer', 'materia_prima__alerta_por_vencer'),
+                stock_minimo=Coalesce('producto__min_stock', 'materia_prima__min_stock'),
+                nivel_reorden=Coalesce('producto__reordering_level', 'materia_prima__reordering_level'),
+            )
+            .annotate(
+                bajo_stock=Case(
+                    When(alerta_stock=True, stock_total__lt=F('stock_minimo'), then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                ),
+            )
+            .annotate(
+                reordenar=Case(
+                    When(bajo_stock=True, nivel_reorden__gt=0, then=Value(True)),
+                    default=Value(False),
+                    output_field=BooleanField(),
+                ),
+            )
+        )
+
     def inventarios_por_producto(self, producto):
         return self.model.objects.all().filter(producto=producto)
             
@@ -515,10 +678,19 @@ class TransactionService(CRUD):
             'code':request.POST.get('codigo'),
             'expiration_date':request.POST.get('vencimiento'),
             'date':request.POST.get('fecha'),
+            'idempotency_key':request.POST.get('idempotency_key'),
         }
+        return self.crear_transaccion(data)
+
+    def crear_transaccion(self, data):
         if not data['expiration_date']:
             data['expiration_date'] = None
         type_ = data['type']
+        key = data.get('idempotency_key') or None
+        if key:
+            previa = self.model.objects.filter(idempotency_key=key).first()
+            if previa:
+                return True, previa
         data['warehouse'] = self.warehouse_service.get(data['warehouse'])
         try:
             data['client'] = self.client_service.get(data['client'])
@@ -528,7 +700,14 @@ class TransactionService(CRUD):
             cantidad = float(data['quantity'])
         except (ValueError, TypeError):
             return False, None
-        producto, materia_prima, inventario = self.resolver(data)
+        resuelto = self.resolver(data)
+        if resuelto is None:
+            return False, None
+        producto, materia_prima, inventario = resuelto
+        if type_ == 'produccion' and not producto:
+            return False, None
+        if type_ == 'transferencia' and not inventario:
+            return False, None
         transaction_data = {
             'warehouse': data['warehouse'],
             'client': data['client'],
@@ -537,36 +716,69 @@ class TransactionService(CRUD):
             'quantity': cantidad,
             'code': data['code'],
             'expiration_date': data['expiration_date'],
-            'type': type_
+            'type': type_,
+            'idempotency_key': key,
         }
         try:
-            transaction = self.model.objects.create(**transaction_data)
-        except:
+            self.asegurar_inventario(type_, data['warehouse'], producto, materia_prima, inventario)
+            with db_transaction.atomic():
+                self.bloquear_inventarios(type_, data['warehouse'], producto, materia_prima, inventario)
+                transaction = self.model.objects.create(**transaction_data)
+                ok = self.procesar(transaction, type_, producto, materia_prima, inventario, cantidad)
+                if not ok:
+                    db_transaction.set_rollback(True)
+                    return False, None
+                self.actualizar_documentos_busqueda([transaction.id])
+                db_transaction.on_commit(self.invalidar_kpis)
+        except IntegrityError:
+            previa = self.model.objects.filter(idempotency_key=key).first() if key else None
+            if previa:
+                return True, previa
             return False, None
-        if type_ == 'ingreso':
-            ok, ingresos = self.procesar_ingreso(transaction, materia_prima, cantidad)
-            if not ok:
-                return False, None
-        if type_ == 'salida':
-            ok = self.procesar_salida(transaction,producto, cantidad)
-            if not ok:
-                return False, None
-        if type_ == 'devolucion':
-            ok = self.procesar_devolucion(transaction, producto, materia_prima, cantidad)
-            if not ok:
-                return False, None
-        if type_ == 'transferencia':
-            ok = self.procesar_transferencia(transaction, inventario, cantidad)
-            if not ok:
-                return False, None
-        if type_ == 'produccion':
-            if not producto:
-                return False, None
-            ok = self.procesar_produccion(transaction, producto, cantidad)
-            if not ok:
-                return False, None
         return True, transaction
 
+    def asegurar_inventario(self, type_, warehouse, producto, materia_prima, inventario):
+        inventarios = self.inventario.model.objects
+        match type_:
+            case 'ingreso' | 'produccion' | 'devolucion':
+                inventarios.get_or_create(producto=producto, materia_prima=materia_prima, bodega=warehouse)
+            case 'transferencia':
+                inventarios.get_or_create(producto_id=inventario.producto_id, materia_prima_id=inventario.materia_prima_id, bodega=warehouse)
+
+    def bloquear_inventarios(self, type_, warehouse, producto, materia_prima, inventario):
+        inventarios = self.inventario.model.objects
+        match type_:
+            case 'salida' if producto:
+                qs = inventarios.filter(producto=producto)
+            case 'salida' if materia_prima:
+                qs = inventarios.filter(materia_prima=materia_prima)
+            case 'salida':
+                return []
+            case 'transferencia':
+                qs = inventarios.filter(
+                    Q(id=inventario.id) |
+                    Q(bodega=warehouse, producto_id=inventario.producto_id, materia_prima_id=inventario.materia_prima_id)
+                )
+            case _:
+                qs = inventarios.filter(producto=producto, materia_prima=materia_prima, bodega=warehouse)
+        return list(qs.select_for_update().order_by('id').values_list('id', flat=True))
+
+    def procesar(self, transaction, type_, producto, materia_prima, inventario, cantidad):
+        match type_:
+            case 'ingreso':
+                ok, _ = self.procesar_ingreso(transaction, materia_prima, cantidad)
+            case 'salida':
+                ok = self.procesar_salida(transaction, producto, materia_prima, cantidad)
+            case 'devolucion':
+                ok, _ = self.procesar_devolucion(transaction, producto, materia_prima, cantidad)
+            case 'transferencia':
+                ok = self.procesar_transferencia(transaction, inventario, cantidad)
+            case 'produccion':
+                ok, _ = self.procesar_produccion(transaction, producto, cantidad)
+            case _:
+                ok = True
+        return ok
+
     def procesar_transferencia(self, transaction, inventario, cantidad):
         ok, control, batch = self.inventario.transferir(transaction, inventario, cantidad)
         if not ok:
@@ -581,22 +793,13 @@ class TransactionService(CRUD):
                 }
                 self.crear_detalle_transaccion(detail_data)
         else:
-            for c in control:
-                detail_data = {
-                    'transaction': transaction,
-                    'code': transaction.code,
-                    'batch': None,
-                    'serie': c
-                }
-                self.crear_detalle_transaccion(detail_data)
+            self.crear_detalles_series(transaction, control)
         return True
 
 
-    def procesar_salida(self, transaction, producto, cantidad):
-        if producto.batch_control:
-            self.inventario.consumir_lotes_p(producto, cantidad)
-        else:
-            self.inventario.consumir_series_p(producto, cantidad)
+    def procesar_salida(self, transaction, producto, materia_prima, cantidad):
+        if not self.inventario.consumir(cantidad, producto=producto, materia_prima=materia_prima, transaction=transaction):
+            return False
         detail_data = {
             'transaction': transaction,
             'code': transaction.code,
@@ -606,19 +809,19 @@ class TransactionService(CRUD):
         self.crear_detalle_transaccion(detail_data)
         return True
 
-    def procesar_produccion(self, transaction, product, cantidad):
-        inventario = self.inventario.model.objects.get_or_create(producto=product, materia_prima=None, bodega=transaction.warehouse)[0]
-        if product.batch_control:
+    def registrar_entrada(self, transaction, cantidad, origen, producto=None, materia_prima=None):
+        item = producto or materia_prima
+        inventario = self.inventario.model.objects.get_or_create(producto=producto, materia_prima=materia_prima, bodega=transaction.warehouse)[0]
+        if item.batch_control:
             data_lote = {
                 'inventario': inventario,
                 'cantidad_actual': cantidad,
                 'fecha_creacion': timezone.localdate(),
                 'fecha_expiracion': transaction.expiration_date,
-                'origen': "devolucion"
+                'origen': origen
             }
-            ok, lote = self.inventario.crear_lote_entrada(data_lote)
+            ok, lote = self.inventario.crear_lote_entrada(data_lote, transaction)
             if not ok:
-                print("algo paso")
                 return False, None
             detail_data = {
                 'transaction': transaction,
@@ -626,184 +829,115 @@ class TransactionService(CRUD):
                 'batch': lote,
                 'serie': None
             }
-            ok, detalle = self.crear_detalle_transaccion(detail_data)
-            if not ok:
-                print("algo paso2")
-                return False, None
-            return True, detalle
-        else:
-            detalles = []
-            codigo = transaction.code
-            for i in range(int(cantidad)):
-                code = codigo,'-',i+1
-                data_serie = {
-                    'codigo': code,
-                    'inventario': inventario,
-                    'estado': 'A',
-                    'fecha_creacion': timezone.localdate(),
-                    'fecha_expiracion': transaction.expiration_date,
-                }
-                ok, serie = self.inventario.crear_serie_entrada(data_serie)
-                if not ok:
-                    return False, None
-                detail_data = {
-                    'transaction': transaction,
-                    'code': code,
-                    'batch': None,
-                    'serie': serie
-                }
-                ok, detalle = self.crear_detalle_transaccion(detail_data)
-                if not ok:
-                    return False, None
-                detalles.append(detalle)
-            return True, detalles
+            return self.crear_detalle_transaccion(detail_data)
+        series = self.inventario.emitir_series(
+            inventario,
+            self.inventario.codigos_serie(transaction.code, cantidad),
+            transaction.expiration_date,
+            transaction=transaction,
+        )
+        return True, self.crear_detalles_series(transaction, series)
+
+    def procesar_produccion(self, transaction, product, cantidad):
+        return self.registrar_entrada(transaction, cantidad, "devolucion", producto=product)
     
     def procesar_ingreso(self, transaction, materia_prima, cantidad):
-        inventario = self.inventario.model.objects.get_or_create(materia_prima=materia_prima, producto=None, bodega=transaction.warehouse)[0]
-        if materia_prima.batch_control:
-            data_lote = {
-                'inventario': inventario,
-                'cantidad_actual': cantidad,
-                'fecha_creacion': timezone.localdate(),
-                'fecha_expiracion': transaction.expiration_date,
-                'origen': "ingreso"
-            }
-            ok, lote = self.inventario.crear_lote_entrada(data_lote)
-            if not ok:
-                return False, None
-            detail_data = {
-                'transaction': transaction,
-                'code': transaction.code,
-                'batch': lote,
-                'serie': None
-            }
-            return self.crear_detalle_transaccion(detail_data)
-        else:
-            detalles = []
-            codigo = transaction.code
-            for i in range(int(cantidad)):
-                code = f'{codigo}-{i}'
-                data_serie = {
-                    'codigo': code,
-                    'inventario': inventario,
-                    'estado': 'A',
-                    'fecha_creacion': timezone.localdate(),
-                    'fecha_expiracion': transaction.expiration_date,
-                }
-                ok, serie = self.inventario.crear_serie_entrada(data_serie)
-                if not ok:
-                    return False, None
-                detail_data = {
-                    'transaction': transaction,
-                    'code': code,
-                    'batch': None,
-                    'serie': serie
-                }
-                ok, detalle = self.crear_detalle_transaccion(detail_data)
-                if not ok:
-                    return False, None
-                detalles.append(detalle)
-            return True, detalles
+        return self.registrar_entrada(transaction, cantidad, "ingreso", materia_prima=materia_prima)
     
     def crear_detalle_transaccion(self, data):
         detalle = self.transaction_detail.objects.create(**data)
         if not detalle:
             return False, None
         return True, detalle
+
+    def crear_detalles_series(self, transaction, series, chunk_size=1000):
+        detalles = [
+            self.transaction_detail(transaction=transaction, code=s.codigo, batch=None, serie=s)
+            for s in series
+        ]
+        return self.transaction_detail.objects.bulk_create(detalles, batch_size=chunk_size)
     
     def procesar_devolucion(self, transaction, product, materia_prima, cantidad):
         if product:
-            inventario = self.inventario.model.objects.get_or_create(producto=product, materia_prima=None, bodega=transaction.warehouse)[0]
-            if product.batch_control:
-                data_lote = {
-                    'inventario': inventario,
-                    'cantidad_actual': cantidad,
-                    'fecha_creacion': timezone.localdate(),
-                    'fecha_expiracion': transaction.expiration_date,
-                    'origen': "devolucion"
-                }
-                ok,lote = self.inventario.crear_lote_entrada(data_lote)
-                if not ok:
-                    return False, None
-                detail_data = {
-                    'transaction': transaction,
-                    'code': transaction.code,
-                    'batch': lote,
-                    'serie': None
-                }
-                self.crear_detalle_transaccion(detail_data)
-                return True, None
-            else:
-                detalles = []
-                for i in range(int(cantidad)):
-                    data_serie = {
-                        'inventario': inventario,
-                        'codigo': f"{transaction.code} - {i+1}",
-                        'estado': 'A',
-                        'fecha_creacion': timezone.localdate(),
-                        'fecha_expiracion': transaction.expiration_date,
-                    }
-                    ok, serie = self.inventario.crear_serie_entrada(data_serie)
-                    if not ok:
-                        return False, None
-                    detail_data = {
-                        'transaction': transaction,
-                        'code': transaction.code,
-                        'batch': None,
-                        'serie': serie
-                    }
-                    ok, detalle = self.crear_detalle_transaccion(detail_data)
-                    if not ok:
-                        return False, None
-                    detalles.append(detalle)
-                return True, detalles
+            return self.registrar_entrada(transaction, cantidad, "devolucion", producto=product)
+        return self.registrar_entrada(transaction, cantidad, "devolucion", materia_prima=materia_prima)
+
+    def kpis(self):
+        hoy = timezone.localdate()
+        key = KPIS_CACHE_KEY.format(fecha=hoy)
+        kpis = cache.get(key)
+        if kpis is None:
+            inicio = timezone.make_aware(datetime.datetime.combine(hoy, datetime.time.min))
+            kpis = {
+                'transactions_today': self.model.objects.filter(
+                    date__gte=inicio, date__lt=inicio + datetime.timedelta(days=1)
+                ).count(),
+                'stock': self.inventario.model.objects.aggregate(
+                    total=Coalesce(Sum('stock_total'), Value(Decimal('0')), output_field=DecimalField(max_digits=20, decimal_places=2))
+                )['total'],
+                'productos_unicos': self.product_service.list_actives().count(),
+            }
+            cache.set(key, kpis, getattr(settings, 'KPIS_CACHE_TTL', 60))
+        return kpis
+
+    def invalidar_kpis(self):
+        cache.delete(KPIS_CACHE_KEY.format(fecha=timezone.localdate()))
+
+    def actualizar_documentos_busqueda(self, ids, chunk_size=1000):
+        ids = list(ids)
+        for i in range(0, len(ids), chunk_size):
+            documentos = fulltext.documentos(self.model, self.transaction_detail, ids[i:i + chunk_size])
+            self.model.objects.bulk_update(
+                [self.model(id=id, search_document=doc) for id, doc in documentos.items()],
+                ['search_document'],
+            )
+
+    def actualizar_documentos_relacionados(self, model, ids, chunk_size=1000):
+        relacion, _ = fulltext.CAMPOS_RELACIONADOS[model._meta.label_lower]
+        if relacion == 'client':
+            transacciones = self.model.objects.filter(client_id__in=ids)
         else:
-            inventario = self.inventario.model.objects.get_or_create(materia_prima=materia_prima, producto=None, bodega=transaction.warehouse)[0]
-            if materia_prima.batch_control:
-                data_lote = {
-                    'inventario': inventario,
-                    'cantidad_actual': cantidad,
-                    'fecha_creacion': timezone.localdate(),
-                    'fecha_expiracion': transaction.expiration_date,
-                    'origen': "devolucion"
-                }
-                ok, lote = self.inventario.crear_lote_entrada(data_lote)
-                if not ok:
-                    return False, None
-                detail_data = {
-                    'transaction': transaction,
-                    'code': transaction.code,
-                    'batch': lote,
-                    'serie': None
-                }
-                ok, detalle = self.crear_detalle_transaccion(detail_data)
-                if not ok:
-                    return False, None
-                return True, detalle
-            else:
-                detalles = []
-                for i in range(int(cantidad)):
-                    data_serie = {
-                        'inventario': inventario,
-                        'codigo': f"{transaction.code} - {i+1}",
-                        'estado': 'A',
-                        'fecha_creacion': timezone.localdate(),
-                        'fecha_expiracion': transaction.expiration_date,
-                }
-                ok, serie = self.inventario.crear_serie_entrada(data_serie)
-                if not ok:
-                    return False, None
-                detail_data = {
-                    'transaction': transaction,
-                    'code': transaction.code,
-                    'batch': None,
-                    'serie': serie
-                }
-                ok, detalle = self.crear_detalle_transaccion(detail_data)
-                if not ok:
-                    return False, None
-                detalles.append(detalle)
-                return True, detalle
+            transacciones = self.model.objects.filter(
+                Q(**{f'details__batch__inventario__{relacion}_id__in': ids}) |
+                Q(**{f'details__serie__inventario__{relacion}_id__in': ids})
+            )
+        self.actualizar_documentos_busqueda(list(transacciones.values_list('id', flat=True).distinct()), chunk_size)
+
+    def reconstruir_documentos_busqueda(self, chunk_size=1000):
+        ids = self.model.objects.order_by('id').values_list('id', flat=True)
+        self.actualizar_documentos_busqueda(ids.iterator(chunk_size=chunk_size), chunk_size)
+        fulltext.reconstruir_indice()
+
+    def buscar(self, q, qs=None):
+        qs = self.model.objects.all() if qs is None else qs
+        palabras = fulltext.terminos(q)
+        if not palabras:
+            return qs
+        consulta = fulltext.consulta_ids(q)
+        if consulta:
+            return qs.filter(id__in=RawSQL(*consulta))
+        for palabra in palabras:
+            qs = qs.filter(search_document__icontains=palabra)
+        return qs
+
+    def listado(self, qs=None):
+        qs = self.model.objects.all() if qs is None else qs
+        detalle = (
+            self.transaction_detail.objects.filter(transaction=OuterRef('pk'))
+            .order_by('id')
+            .annotate(sku=Coalesce(
+                'serie__inventario__producto__sku',
+                'serie__inventario__materia_prima__sku',
+                'batch__inventario__producto__sku',
+                'batch__inventario__materia_prima__sku',
+            ))
+            .values('sku')[:1]
+        )
+        return qs.annotate(
+            cliente=Coalesce('client__rut', Value('Lilis')),
+            bodega=F('warehouse__name'),
+            sku=Subquery(detalle),
+        ).values('id', 'date', 'type', 'code', 'quantity', 'expiration_date', 'cliente', 'bodega', 'sku')
 
     def get_by_warehouse(self, warehouse_id):
         return self.model.objects.filter(warehouse=warehouse_id)
@@ -1,3 +1,457 @@
-from django.test import TestCase
+import datetime
+import io
+import threading
+from decimal import Decimal
+from unittest import mock
+from django.core.management import call_command
+from django.db import connection, connections
+from django.db.models import Sum
+from django.contrib.auth.models import Group, User
+from django.test import TestCase, TransactionTestCase, skipUnlessDBFeature
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from Accounts.models import Profile
+from Products.models import Category, Inventario, Lote, MovimientoStock, Producto, RawMaterialClass, Serie, Supplier, Transaction, TransactionDetail
+from .models import Client, Warehouse
+from .services import InventarioService, TransactionService
 
-# Create your tests here.
+
+def datos_transaccion(tipo, item, cantidad, bodega, codigo, cliente=None, **extra):
+    prefijo = 'producto' if isinstance(item, Producto) else 'materia_prima'
+    return {
+        'type': tipo, 'product': str(item.id) if tipo == 'ingreso' else f'{prefijo}-{item.id}',
+        'quantity': cantidad, 'warehouse': bodega.id, 'client': cliente.id if cliente else None,
+        'user': None, 'notes': None, 'expiration_date': None, 'code': codigo, 'idempotency_key': codigo,
+        **extra,
+    }
+
+
+@skipUnlessDBFeature('has_select_for_update')
+class TransaccionesConcurrentesTest(TransactionTestCase):
+    hilos = 8
+
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        self.producto = Producto.objects.create(sku='P1', name='p', category=categoria, batch_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.errores = []
+
+    def transaccion(self, tipo, cantidad, codigo):
+        data = {
+            'type': tipo, 'product': f'producto-{self.producto.id}', 'quantity': cantidad,
+            'warehouse': self.bodega.id, 'client': None, 'user': None, 'notes': None,
+            'expiration_date': None, 'code': codigo, 'idempotency_key': codigo,
+        }
+        try:
+            ok, _ = TransactionService().crear_transaccion(data)
+            if not ok:
+                self.errores.append(codigo)
+        except Exception as e:
+            self.errores.append(f'{codigo}: {e}')
+        finally:
+            connections.close_all()
+
+    def concurrentes(self, operaciones):
+        barrera = threading.Barrier(len(operaciones))
+
+        def ejecutar(tipo, cantidad, codigo):
+            barrera.wait()
+            self.transaccion(tipo, cantidad, codigo)
+
+        hilos = [threading.Thread(target=ejecutar, args=op) for op in operaciones]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        self.assertEqual(self.errores, [])
+
+    def assertStock(self, esperado):
+        inventarios = Inventario.objects.filter(producto=self.producto, bodega=self.bodega)
+        self.assertEqual(inventarios.count(), 1)
+        inventario = inventarios.get()
+        self.producto.refresh_from_db()
+        self.assertEqual(inventario.stock_total, esperado)
+        self.assertEqual(self.producto.stock_actual, esperado)
+        self.assertEqual(Lote.objects.filter(inventario=inventario).aggregate(total=Sum('cantidad_actual'))['total'], esperado)
+        self.assertEqual(MovimientoStock.objects.filter(inventario=inventario).aggregate(total=Sum('cantidad'))['total'], esperado)
+
+    def test_ingresos_y_salidas_concurrentes(self):
+        self.concurrentes([('produccion', 10, f'P{i}') for i in range(self.hilos)])
+        self.assertStock(Decimal(10 * self.hilos))
+        self.concurrentes(
+            [('salida', 5, f'S{i}') for i in range(self.hilos)] +
+            [('produccion', 3, f'Q{i}') for i in range(self.hilos)]
+        )
+        self.assertStock(Decimal(8 * self.hilos))
+
+
+class DocumentosBusquedaTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        self.producto = Producto.objects.create(sku='VIEJO1', name='p', category=categoria, batch_control=True)
+        self.cliente = Client.objects.create(bussiness_name='cl', rut='11-1')
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.service = TransactionService()
+        for tipo, codigo in (('produccion', 'T1'), ('salida', 'T2')):
+            data = {
+                'type': tipo, 'product': f'producto-{self.producto.id}', 'quantity': 2,
+                'warehouse': self.bodega.id, 'client': self.cliente.id, 'user': None, 'notes': None,
+                'expiration_date': None, 'code': codigo, 'idempotency_key': codigo,
+            }
+            ok, _ = self.service.crear_transaccion(data)
+            self.assertTrue(ok)
+
+    def codigos(self, q):
+        return sorted(self.service.buscar(q).values_list('code', flat=True))
+
+    def test_cambio_de_sku_actualiza_documentos(self):
+        self.assertEqual(self.codigos('VIEJO1'), ['T1'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.producto.sku = 'NUEVO1'
+            self.producto.save()
+        self.assertEqual(self.codigos('VIEJO1'), [])
+        self.assertEqual(self.codigos('NUEVO1'), ['T1'])
+
+    def test_cambio_de_rut_actualiza_documentos(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.cliente.rut = '22-2'
+            self.cliente.save()
+        self.assertEqual(self.codigos('22'), ['T1', 'T2'])
+        self.assertEqual(self.codigos('11'), [])
+
+    def test_guardado_sin_cambios_no_actualiza(self):
+        with mock.patch.object(TransactionService, 'actualizar_documentos_relacionados') as actualizar:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.producto.save()
+        actualizar.assert_not_called()
+
+
+class SalidaMateriaPrimaTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        proveedor = Supplier.objects.create(bussiness_name='s', rut='1-1')
+        self.materia_prima = RawMaterialClass.objects.create(sku='R1', name='r', category=categoria, supplier=proveedor, batch_control=True)
+        otra = RawMaterialClass.objects.create(sku='R2', name='r2', category=categoria, supplier=proveedor, batch_control=True)
+        self.producto = Producto.objects.create(sku='P1', name='p', category=categoria, batch_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.service = TransactionService()
+        for item, tipo, codigo in ((self.materia_prima, 'ingreso', 'I1'), (otra, 'ingreso', 'I2'), (self.producto, 'produccion', 'P1')):
+            ok, _ = self.service.crear_transaccion(datos_transaccion(tipo, item, 10, self.bodega, codigo))
+            self.assertTrue(ok)
+        self.inventario = Inventario.objects.get(materia_prima=self.materia_prima)
+
+    def test_salida_consume_materia_prima(self):
+        ok, transaccion = self.service.crear_transaccion(datos_transaccion('salida', self.materia_prima, 4, self.bodega, 'S1'))
+        self.assertTrue(ok)
+        self.inventario.refresh_from_db()
+        self.materia_prima.refresh_from_db()
+        self.assertEqual(self.inventario.stock_total, Decimal('6'))
+        self.assertEqual(self.materia_prima.stock_actual, Decimal('6'))
+        self.assertEqual(MovimientoStock.objects.filter(transaction=transaccion).aggregate(total=Sum('cantidad'))['total'], Decimal('-4'))
+
+    def test_salida_solo_bloquea_inventarios_del_item(self):
+        bloqueados = self.service.bloquear_inventarios('salida', self.bodega, None, self.materia_prima, None)
+        self.assertEqual(bloqueados, [self.inventario.id])
+        self.assertEqual(self.service.bloquear_inventarios('salida', self.bodega, None, None, self.inventario), [])
+
+    def test_salida_sin_item_no_se_registra(self):
+        data = datos_transaccion('salida', self.materia_prima, 4, self.bodega, 'S1', product=f'inventario-{self.inventario.id}')
+        self.assertEqual(self.service.crear_transaccion(data), (False, None))
+        self.assertFalse(Transaction.objects.filter(code='S1').exists())
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.stock_total, Decimal('10'))
+
+
+class TransactionListViewTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        producto = Producto.objects.create(sku='P1', name='p', category=categoria, batch_control=True)
+        bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        Client.objects.create(bussiness_name='cl', rut='11-1')
+        service = TransactionService()
+        for i in range(3):
+            ok, _ = service.crear_transaccion(datos_transaccion('produccion', producto, 1, bodega, f'T{i}'))
+            self.assertTrue(ok)
+        user = User.objects.create_user('u', password='x')
+        user.groups.add(Group.objects.create(name='Acceso Completo'))
+        Profile.objects.create(user=user, run='u', is_new=False)
+        self.client.force_login(user)
+
+    def test_no_carga_catalogos_y_cuenta_una_vez(self):
+        self.client.get(reverse('transaction_list'))
+        with CaptureQueriesContext(connection) as consultas:
+            response = self.client.get(reverse('transaction_list'))
+        self.assertEqual(response.context['total'], 3)
+        self.assertNotIn('products', response.context)
+        sql = [q['sql'] for q in consultas]
+        self.assertEqual(len([q for q in sql if 'COUNT(' in q]), 1, sql)
+        self.assertEqual(len([q for q in sql if 'lilis_cache' in q]), 1, sql)
+
+
+class ConsumoLotesTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        self.producto = Producto.objects.create(sku='P1', name='p', category=categoria, batch_control=True, stock_actual=12)
+        bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.inventario = Inventario.objects.create(producto=self.producto, bodega=bodega, stock_total=12)
+        hoy = timezone.localdate()
+        for codigo, expira, creado in (('L1', 10, 1), ('L2', 2, 3), ('L3', None, 5)):
+            lote = Lote.objects.create(
+                codigo=codigo, inventario=self.inventario, cantidad_actual=4,
+                fecha_expiracion=hoy + datetime.timedelta(days=expira) if expira else None,
+            )
+            Lote.objects.filter(id=lote.id).update(fecha_creacion=hoy - datetime.timedelta(days=creado))
+        self.service = InventarioService()
+
+    def lotes(self, estrategia=None):
+        return Lote.objects.filter(inventario=self.inventario).order_by(*self.service.orden_consumo(estrategia))
+
+    def cantidades(self):
+        return {l.codigo: l.cantidad_actual for l in Lote.objects.filter(inventario=self.inventario)}
+
+    def test_orden_por_estrategia(self):
+        for estrategia, esperado in (('FEFO', ['L2', 'L1', 'L3']), ('FIFO', ['L3', 'L2', 'L1']), ('LIFO', ['L1', 'L2', 'L3'])):
+            with self.subTest(estrategia=estrategia):
+                self.assertEqual([l.codigo for l in self.lotes(estrategia)], esperado)
+        with self.assertRaises(ValueError):
+            self.service.orden_consumo('XYZ')
+
+    def test_planificar_consumo_parcial(self):
+        plan, restante = self.service.planificar_consumo_lotes(self.lotes('FEFO'), 6)
+        self.assertEqual([(l.codigo, tomado) for l, tomado in plan], [('L2', Decimal('4')), ('L1', Decimal('2'))])
+        self.assertEqual(restante, Decimal('0'))
+        plan, restante = self.service.planificar_consumo_lotes(self.lotes('FEFO'), 15)
+        self.assertEqual(len(plan), 3)
+        self.assertEqual(restante, Decimal('3'))
+
+    def test_consumir_parcial_fifo(self):
+        self.assertTrue(self.service.consumir(6, producto=self.producto, estrategia='FIFO'))
+        self.assertEqual(self.cantidades(), {'L1': Decimal('4'), 'L2': Decimal('2'), 'L3': Decimal('0')})
+        self.inventario.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual((self.inventario.stock_total, self.producto.stock_actual, self.producto.deficit), (Decimal('6'), Decimal('6'), Decimal('0')))
+        movimientos = MovimientoStock.objects.filter(inventario=self.inventario).order_by('id')
+        self.assertEqual([(m.lote.codigo, m.cantidad) for m in movimientos], [('L3', Decimal('-4')), ('L2', Decimal('-2'))])
+
+    def test_consumir_mas_que_el_stock_registra_deficit(self):
+        self.assertTrue(self.service.consumir(15, producto=self.producto))
+        self.assertEqual(set(self.cantidades().values()), {Decimal('0')})
+        self.inventario.refresh_from_db()
+        self.producto.refresh_from_db()
+        self.assertEqual((self.inventario.stock_total, self.producto.stock_actual), (Decimal('0'), Decimal('0')))
+        self.assertEqual(self.producto.deficit, Decimal('3'))
+
+
+class StockConsistenciaTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        proveedor = Supplier.objects.create(bussiness_name='s', rut='1-1')
+        self.lotes = Producto.objects.create(sku='P1', name='p', category=categoria, batch_control=True)
+        self.series = Producto.objects.create(sku='P2', name='p2', category=categoria, serie_control=True)
+        self.materia_prima = RawMaterialClass.objects.create(sku='R1', name='r', category=categoria, supplier=proveedor, batch_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.destino = Warehouse.objects.create(name='w2', address='a', location='l', lilis=True)
+        self.cliente = Client.objects.create(bussiness_name='cl', rut='11-1')
+        self.service = TransactionService()
+
+    def registrar(self, tipo, item, cantidad, codigo, bodega=None, **extra):
+        ok, _ = self.service.crear_transaccion(datos_transaccion(tipo, item, cantidad, bodega or self.bodega, codigo, self.cliente, **extra))
+        self.assertTrue(ok, codigo)
+
+    def assertCuadrado(self):
+        self.assertEqual(self.service.inventario.reconciliar_stock(), [])
+        for inventario in Inventario.objects.all():
+            item = inventario.producto or inventario.materia_prima
+            if item.serie_control:
+                esperado = Serie.objects.filter(inventario=inventario, estado='A').count()
+            else:
+                esperado = Lote.objects.filter(inventario=inventario).aggregate(total=Sum('cantidad_actual'))['total']
+            self.assertEqual(inventario.stock_total, esperado, item.sku)
+
+    def test_deltas_mantienen_stock_igual_a_lotes_y_series(self):
+        self.registrar('produccion', self.lotes, 10, 'P1')
+        self.registrar('produccion', self.series, 5, 'P2')
+        self.registrar('ingreso', self.materia_prima, 8, 'I1')
+        self.assertCuadrado()
+        self.registrar('salida', self.lotes, 3, 'S1')
+        self.registrar('salida', self.series, 2, 'S2')
+        self.registrar('salida', self.materia_prima, 5, 'S3')
+        self.assertCuadrado()
+        origen = Inventario.objects.get(producto=self.lotes, bodega=self.bodega)
+        self.registrar('transferencia', self.lotes, 4, 'T1', bodega=self.destino, product=f'inventario-{origen.id}')
+        self.assertCuadrado()
+        self.assertEqual(
+            dict(Inventario.objects.filter(producto=self.lotes).values_list('bodega', 'stock_total')),
+            {self.bodega.id: Decimal('3'), self.destino.id: Decimal('4')},
+        )
+
+    def test_reconcile_stock_fix_repara_descuadre(self):
+        self.registrar('produccion', self.lotes, 10, 'P1')
+        inventario = Inventario.objects.get(producto=self.lotes)
+        Inventario.objects.filter(id=inventario.id).update(stock_total=99)
+        Producto.objects.filter(id=self.lotes.id).update(stock_actual=99)
+        salida = io.StringIO()
+        call_command('reconcile_stock', stdout=salida)
+        self.assertIn('1 inventarios descuadrados', salida.getvalue())
+        inventario.refresh_from_db()
+        self.assertEqual(inventario.stock_total, Decimal('99'))
+        call_command('reconcile_stock', '--fix', stdout=io.StringIO())
+        inventario.refresh_from_db()
+        self.lotes.refresh_from_db()
+        self.assertEqual((inventario.stock_total, self.lotes.stock_actual), (Decimal('10'), Decimal('10')))
+        self.assertCuadrado()
+
+    def assertStockActual(self, *items):
+        for item in items:
+            item.refresh_from_db()
+            total = Inventario.objects.filter(**{'producto' if isinstance(item, Producto) else 'materia_prima': item}).aggregate(total=Sum('stock_total'))['total']
+            self.assertEqual(item.stock_actual, total, item.sku)
+
+    def test_stock_actual_igual_a_la_suma_de_inventarios(self):
+        self.registrar('produccion', self.lotes, 10, 'P1')
+        self.registrar('ingreso', self.materia_prima, 8, 'I1')
+        self.registrar('ingreso', self.materia_prima, 4, 'I2', bodega=self.destino)
+        self.assertStockActual(self.lotes, self.materia_prima)
+        self.registrar('salida', self.lotes, 3, 'S1')
+        self.registrar('salida', self.materia_prima, 5, 'S2')
+        self.assertStockActual(self.lotes, self.materia_prima)
+        origen = Inventario.objects.get(producto=self.lotes, bodega=self.bodega)
+        self.registrar('transferencia', self.lotes, 4, 'T1', bodega=self.destino, product=f'inventario-{origen.id}')
+        self.assertStockActual(self.lotes, self.materia_prima)
+        self.assertEqual(self.lotes.stock_actual, Decimal('7'))
+        self.assertEqual(self.materia_prima.stock_actual, Decimal('7'))
+
+
+class EmisionSeriesTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        self.producto = Producto.objects.create(sku='P1', name='p', category=categoria, serie_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.inventario = Inventario.objects.create(producto=self.producto, bodega=self.bodega)
+        self.service = TransactionService()
+
+    def emitir(self, codigo, cantidad):
+        with CaptureQueriesContext(connection) as consultas:
+            series = self.service.inventario.emitir_series(self.inventario, self.service.inventario.codigos_serie(codigo, cantidad))
+        return series, len(consultas)
+
+    def test_codigos_serie(self):
+        self.assertEqual(self.service.inventario.codigos_serie('T1', 3), ['T1-1', 'T1-2', 'T1-3'])
+        self.assertEqual(self.service.inventario.codigos_serie('T1', 0), [])
+
+    def test_emite_en_bloque_con_consultas_constantes(self):
+        for retorna_ids in (True, False):
+            with self.subTest(retorna_ids=retorna_ids), mock.patch.object(
+                type(connection.features), 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock, return_value=retorna_ids,
+            ):
+                _, consultas_pocas = self.emitir(f'A{retorna_ids}', 3)
+                _, consultas_bloque = self.emitir(f'C{retorna_ids}', 50)
+                muchas, consultas_muchas = self.emitir(f'B{retorna_ids}', 200)
+                self.assertEqual(consultas_bloque, consultas_pocas)
+                self.assertLess(consultas_muchas, 15)
+                self.assertEqual(len(muchas), 200)
+                guardadas = dict(Serie.objects.filter(id__in=[s.pk for s in muchas]).values_list('id', 'codigo'))
+                self.assertEqual([guardadas[s.pk] for s in muchas], [f'B{retorna_ids}-{i}' for i in range(1, 201)])
+                self.assertEqual(MovimientoStock.objects.filter(serie__in=muchas).count(), 200)
+        self.inventario.refresh_from_db()
+        self.assertEqual(self.inventario.stock_total, Decimal('506'))
+
+    def test_produccion_enlaza_detalles_con_las_series(self):
+        ok, transaccion = self.service.crear_transaccion(datos_transaccion('produccion', self.producto, 25, self.bodega, 'T1'))
+        self.assertTrue(ok)
+        detalles = TransactionDetail.objects.filter(transaction=transaccion).select_related('serie').order_by('id')
+        self.assertEqual(len(detalles), 25)
+        self.assertEqual(sorted(d.serie.codigo for d in detalles), sorted(f'T1-{i}' for i in range(1, 26)))
+        self.assertTrue(all(d.serie.inventario_id == self.inventario.id for d in detalles))
+
+
+
+class KpisCacheTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        self.producto = Producto.objects.create(sku='P1', name='p', category=categoria, batch_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.service = TransactionService()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.crear_transaccion(datos_transaccion('produccion', self.producto, 10, self.bodega, 'T1'))
+
+    def test_kpis_cacheados_hasta_el_commit(self):
+        kpis = self.service.kpis()
+        self.assertEqual((kpis['transactions_today'], kpis['stock'], kpis['productos_unicos']), (1, Decimal('10'), 1))
+        with self.assertNumQueries(1):
+            self.assertEqual(self.service.kpis(), kpis)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.service.crear_transaccion(datos_transaccion('produccion', self.producto, 5, self.bodega, 'T2'))
+            self.assertEqual(self.service.kpis(), kpis)
+        kpis = self.service.kpis()
+        self.assertEqual((kpis['transactions_today'], kpis['stock']), (2, Decimal('15')))
+
+    def test_transaccion_rechazada_no_invalida(self):
+        kpis = self.service.kpis()
+        with self.captureOnCommitCallbacks() as callbacks:
+            ok, _ = self.service.crear_transaccion(datos_transaccion('produccion', self.producto, 'x', self.bodega, 'T2'))
+        self.assertFalse(ok)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(self.service.kpis(), kpis)
+
+
+class ListadoTransaccionesTest(TestCase):
+    def setUp(self):
+        categoria = Category.objects.create(name='c')
+        proveedor = Supplier.objects.create(bussiness_name='s', rut='1-1')
+        lotes = Producto.objects.create(sku='PL', name='p', category=categoria, batch_control=True)
+        series = Producto.objects.create(sku='PS', name='p2', category=categoria, serie_control=True)
+        materia_prima = RawMaterialClass.objects.create(sku='RM', name='r', category=categoria, supplier=proveedor, batch_control=True)
+        bodega = Warehouse.objects.create(name='Central', address='a', location='l', lilis=True)
+        cliente = Client.objects.create(bussiness_name='cl', rut='11-1')
+        service = TransactionService()
+        for tipo, item, codigo, con_cliente in (
+            ('produccion', lotes, 'T1', True), ('produccion', series, 'T2', False), ('ingreso', materia_prima, 'T3', False),
+        ):
+            ok, _ = service.crear_transaccion(datos_transaccion(tipo, item, 2, bodega, codigo, cliente if con_cliente else None))
+            self.assertTrue(ok)
+        self.service = service
+
+    def test_filas_planas_en_una_consulta(self):
+        with self.assertNumQueries(1):
+            filas = {f['code']: f for f in self.service.listado()}
+        self.assertEqual(set(filas['T1']), {'id', 'date', 'type', 'code', 'quantity', 'expiration_date', 'cliente', 'bodega', 'sku'})
+        self.assertEqual({c: (f['type'], f['sku'], f['cliente'], f['bodega']) for c, f in filas.items()}, {
+            'T1': ('produccion', 'PL', '11-1', 'Central'),
+            'T2': ('produccion', 'PS', 'Lilis', 'Central'),
+            'T3': ('ingreso', 'RM', 'Lilis', 'Central'),
+        })
+
+
+class BootstrapEtagTest(TestCase):
+    def setUp(self):
+        self.categoria = Category.objects.create(name='c')
+        producto = Producto.objects.create(sku='P1', name='p', category=self.categoria, batch_control=True)
+        self.bodega = Warehouse.objects.create(name='w', address='a', location='l', lilis=True)
+        self.inventario = Inventario.objects.create(producto=producto, bodega=self.bodega)
+
+    def get(self, tipo, **headers):
+        return self.client.get(reverse('get_by_type'), {'type': tipo}, headers=headers)
+
+    def test_tipo_desconocido(self):
+        self.assertEqual(self.get('otro').status_code, 400)
+        self.assertEqual(self.client.get(reverse('get_by_type')).status_code, 400)
+
+    def test_etag_responde_304_hasta_que_cambia_el_catalogo(self):
+        response = self.get('produccion')
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        self.assertEqual(self.get('produccion', if_none_match=etag).status_code, 304)
+        with self.captureOnCommitCallbacks(execute=True):
+            Producto.objects.create(sku='P2', name='nuevo', category=self.categoria, batch_control=True)
+        response = self.get('produccion', if_none_match=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertIn('P2', response.content.decode())
+
+    def test_transferencia_depende_del_inventario(self):
+        produccion, transferencia = self.get('produccion')['ETag'], self.get('transferencia')['ETag']
+        Inventario.objects.get(id=self.inventario.id).save()
+        self.assertEqual(self.get('produccion', if_none_match=produccion).status_code, 304)
+        self.assertEqual(self.get('transferencia', if_none_match=transferencia).status_code, 200)
@@ -3,16 +3,26 @@ from django.contrib.auth.decorators import login_required
 from django.db.models import Q
 from .services import ClientService, WarehouseService, TransactionService
 from Main.decorator import permission_or_redirect
-from Main.utils import generate_excel_response
-from django.http import JsonResponse, HttpResponse, HttpResponseRedirect
+from django.http import JsonResponse, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
+from django.core.serializers.json import DjangoJSONEncoder
+import json
 from Products.services import ProductService, RawMaterialService, SupplierService
-from datetime import date
+from Accounts.services import LilisService
 from django.views import View
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView
 from django.urls import reverse_lazy
 from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
-from Main.mixins import GroupRequiredMixin
-import requests
+from Main.mixins import GroupRequiredMixin, ExportMixin
+from Main.permisos import autorizacion
+from Main.pagination import CursorPaginator, conteo_aproximado, modo_cursor
+from Main.cache import version, catalogo_datos, catalogo_response
+from Products.views import productos_activos, materias_primas_activas, proveedores_activos
+from django.core.cache import cache
+from django.conf import settings
+from django.db.models import Prefetch
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+import uuid
 from django.core.serializers import serialize
 from django.db.models.functions import Coalesce
 from django.template.defaultfilters import truncatechars
@@ -23,8 +33,8 @@ transaction_service = TransactionService()
 product_service = ProductService()
 raw_material_service = RawMaterialService()
 supplier_service = SupplierService()
+lilis_service = LilisService()
 
-API_ENDPOINT = 'http://3.228.61.121/api/lilis/'
 
 # ===================================
 # VISTAS DE CLIENTES
@@ -140,7 +150,7 @@ class ClientDeleteView(GroupRequiredMixin, DeleteView):
         self.object.save()
         return HttpResponseRedirect(self.get_success_url())
 
-class ClientExportView(GroupRequiredMixin, View):
+class ClientExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Ventas',
@@ -148,8 +158,11 @@ class ClientExportView(GroupRequiredMixin, View):
         "Acceso limitado a Produccion",
         "Acceso limitado a Finanzas"
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
+    headers = ["Nombre Fantasía", "Razón Social", "RUT", "Email", "Teléfono"]
+    filename_prefix = "Lilis_Clientes"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
         qs = client_service.list().order_by('fantasy_name')
         if q:
             qs = qs.filter(
@@ -159,7 +172,7 @@ class ClientExportView(GroupRequiredMixin, View):
                 Q(email__icontains=q) |
                 Q(phone__icontains=q)
             )
-        qs_limit = request.GET.get("limit")
+        qs_limit = params.get("limit")
         if qs_limit:
             try:
                 limit = int(qs_limit)
@@ -167,17 +180,16 @@ class ClientExportView(GroupRequiredMixin, View):
                     qs = qs[:limit] 
             except ValueError:
                 pass
-        headers = ["Nombre Fantasía", "Razón Social", "RUT", "Email", "Teléfono"]
-        data_rows = []
-        for c in qs:
-            data_rows.append([
-                c.fantasy_name,
-                c.bussiness_name,
-                c.rut,
-                c.email,
-                c.phone,
-            ])
-        return generate_excel_response(headers, data_rows, "Lilis_Clientes")
+        return qs
+
+    def export_row(self, c):
+        return [
+            c.fantasy_name,
+            c.bussiness_name,
+            c.rut,
+            c.email,
+            c.phone,
+        ]
 
 def client_search(request):
     q = request.GET.get('q', '')
@@ -210,8 +222,8 @@ def client_search(request):
         })
     return JsonResponse({'data': data}, safe=False)
 
-def client_all(request):
-    clients = client_service.model.objects.filter(is_active=True)
+def client_catalogo():
+    clients = client_service.list_actives()
     data = []
     for s in clients:
         if s.trade_terms:
@@ -234,7 +246,26 @@ def client_all(request):
             'payment_terms_days': s.payment_terms_days,
             'discount_percentage': s.discount_percentage,
         })
-    return JsonResponse({'data': data}, safe=False)
+    return data
+
+CATALOGO_CLIENTES = ('clientes', (client_service.model,), client_catalogo)
+
+def clientes_activos():
+    return catalogo_datos(*CATALOGO_CLIENTES)
+
+def client_all(request):
+    return catalogo_response(*CATALOGO_CLIENTES)
+
+
+def bodegas_lilis_catalogo():
+    warehouses = warehouse_service.list().filter(lilis=True).filter(is_active=True)
+    return [warehouse_to_dict(w) for w in warehouses]
+
+
+CATALOGO_BODEGAS_LILIS = ('bodegas_lilis', (warehouse_service.model,), bodegas_lilis_catalogo)
+
+def bodegas_lilis():
+    return catalogo_datos(*CATALOGO_BODEGAS_LILIS)
 
 class ClientDetailView(GroupRequiredMixin, DetailView):
     required_group =(
@@ -492,7 +523,7 @@ class WarehouseListWithoutThisClientView(GroupRequiredMixin, View):
         except Exception as e:
             return HttpResponse(str(e))
 
-class WarehouseExportView(GroupRequiredMixin, View):
+class WarehouseExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Ventas',
@@ -500,10 +531,13 @@ class WarehouseExportView(GroupRequiredMixin, View):
         "Acceso limitado a Produccion",
         "Acceso limitado a Finanzas"
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
+    headers = ["Nombre", "Dirección", "Ubicación", "Área Total", "Propietario"]
+    filename_prefix = "Lilis_Bodegas"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
         qs = warehouse_service.model.objects.all().order_by('name')
-        limit = request.GET.get("limit")
+        limit = params.get("limit")
         if q:
             qs = qs.filter(
                 Q(name__icontains=q) |  
@@ -515,17 +549,16 @@ class WarehouseExportView(GroupRequiredMixin, View):
                 qs = qs[:limit]
             except ValueError:
                 pass
-        headers = ["Nombre", "Dirección", "Ubicación", "Área Total", "Propietario"]
-        data_rows = []
-        for warehouse in qs:
-            data_rows.append([
-                warehouse.name,
-                warehouse.address,
-                warehouse.location,
-                warehouse.total_area,
-                warehouse.lilis,
-            ])
-        return generate_excel_response(headers, data_rows, "Lilis_Bodegas")
+        return qs
+
+    def export_row(self, warehouse):
+        return [
+            warehouse.name,
+            warehouse.address,
+            warehouse.location,
+            warehouse.total_area,
+            warehouse.lilis,
+        ]
 
 def get_warehouses(request): 
     id = request.GET.get('id')
@@ -599,6 +632,23 @@ def supplier_base_dict(s):
     }
 
 
+def item_catalogo_dict(i):
+    return {
+        'id': i['id'],
+        'name': i['name'],
+        'sku': i['sku'],
+        'measurement_unit': i['measurement_unit'],
+    }
+
+
+def cliente_catalogo_dict(c):
+    return {
+        'id': c['id'],
+        'bussiness_name': c['bussiness_name'],
+        'rut': c['rut'],
+    }
+
+
 def get_warehouses_for_client(client):
     warehouses = warehouse_service.filter_by_client(client)
     return [warehouse_to_dict(w) for w in warehouses]
@@ -613,28 +663,27 @@ def handle_ingreso():
         'warehouses': [],
         'suppliers': [],
     }
-    warehouses = warehouse_service.list().filter(lilis=True).filter(is_active=True)
-    for w in warehouses:
-        warehouse_data = warehouse_to_dict(w)
-        data['warehouses'].append(warehouse_data)
-    print(data)
-    suppliers = supplier_service.list_actives()
+    data['warehouses'] = bodegas_lilis()
+    suppliers = supplier_service.list_actives().prefetch_related(
+        Prefetch('raw_materials', queryset=transaction_service.inventario.raw_class.objects.order_by('id'))
+    )
     for s in suppliers:
         supplier_data = supplier_base_dict(s)
-        rms = transaction_service.inventario.raw_class.objects.filter(supplier_id=s.id)
-        supplier_data['raw_materials'] = [raw_material_to_dict(rm) for rm in rms]
+        supplier_data['raw_materials'] = [raw_material_to_dict(rm) for rm in s.raw_materials.all()]
         data['suppliers'].append(supplier_data)
     return JsonResponse({'data': data})
 
 def handle_salida():
     data = []
-    clients = client_service.list_actives()
+    clients = client_service.list_actives().prefetch_related(
+        Prefetch('wareclients', queryset=warehouse_service.wareclient_model.objects.select_related('warehouse'))
+    )
     for c in clients:
         client_data = {
             'id': c.id,
             'bussiness_name': c.bussiness_name,
             'rut': c.rut,
-            'warehouses': get_warehouses_for_client(c),
+            'warehouses': [warehouse_to_dict(wc.warehouse) for wc in c.wareclients.all()],
         }
         data.append(client_data)
 
@@ -648,21 +697,15 @@ def handle_devolucion():
         'raw_materials': [],
         'warehouses': [],
     }
-    clients = client_service.list_actives()
-    for c in clients:
-        data['clients'].append(supplier_base_dict(c))
-    suppliers = supplier_service.list_actives()
-    for s in suppliers:
-        data['clients'].append(supplier_base_dict(s))
-    products = transaction_service.inventario.product_class.objects.all().filter(is_active=True)
-    for p in products:
-        data['products'].append(raw_material_to_dict(p))
-    raw_materials = transaction_service.inventario.raw_class.objects.all().filter(is_active=True)
-    for rm in raw_materials:
-        data['raw_materials'].append(raw_material_to_dict(rm))
-    warehouses = warehouse_service.list().filter(is_active=True).filter(lilis=True)
-    for w in warehouses:
-        data['warehouses'].append(warehouse_to_dict(w))
+    for c in clientes_activos():
+        data['clients'].append(cliente_catalogo_dict(c))
+    for s in proveedores_activos():
+        data['clients'].append(cliente_catalogo_dict(s))
+    for p in productos_activos():
+        data['products'].append(item_catalogo_dict(p))
+    for rm in materias_primas_activas():
+        data['raw_materials'].append(item_catalogo_dict(rm))
+    data['warehouses'] = bodegas_lilis()
     return JsonResponse({'data': data})
 
 def inventario_to_dict(i):
@@ -695,29 +738,26 @@ def get_stock_by_inventory(request):
     return JsonResponse({'stock': stock})
 
 def handle_transfer():
-    c = requests.get(API_ENDPOINT).json()[0]
+    c = lilis_service.perfil()
     data = {
-        'clients': [c],
+        'clients': [c] if c else [],
         'inventory': [],
     }
-    inventarios = transaction_service.inventario.list().filter(stock_total__gt=0)
+    inventarios = transaction_service.inventario.list().filter(stock_total__gt=0).select_related('producto', 'materia_prima')
     for i in inventarios:
         data['inventory'].append(inventario_to_dict(i))
     return JsonResponse({'data': data})
 
 def handle_produccion():
-    lilis = requests.get(API_ENDPOINT).json()[0]
+    lilis = lilis_service.perfil()
     data = {
-        'clients': [lilis],
+        'clients': [lilis] if lilis else [],
         'products': [],
         'warehouses': [],
     }
-    products = product_service.list_actives()
-    for p in products:
-        data['products'].append(raw_material_to_dict(p))
-    warehouses = warehouse_service.list().filter(lilis=True).filter(is_active=True)
-    for w in warehouses:
-        data['warehouses'].append(warehouse_to_dict(w))
+    for p in productos_activos():
+        data['products'].append(item_catalogo_dict(p))
+    data['warehouses'] = bodegas_lilis()
     return JsonResponse({'data': data})
 
 
@@ -747,19 +787,35 @@ def get_raw_materials_by_supplier(request):
             })
         return JsonResponse({'p': p})
 
+BOOTSTRAP_HANDLERS = {
+    'ingreso': (handle_ingreso, ('catalogos',)),
+    'salida': (handle_salida, ('catalogos',)),
+    'devolucion': (handle_devolucion, ('catalogos',)),
+    'transferencia': (handle_transfer, ('catalogos', 'inventario')),
+    'produccion': (handle_produccion, ('catalogos',)),
+}
+
+def bootstrap_etag(request):
+    tipo = request.GET.get('type')
+    if tipo not in BOOTSTRAP_HANDLERS:
+        return None
+    _, dependencias = BOOTSTRAP_HANDLERS[tipo]
+    return '-'.join([tipo, *(str(version(d)) for d in dependencias)])
+
+@condition(etag_func=bootstrap_etag)
 def get_by_type(request):
     tipo = request.GET.get('type')
-    match tipo:
-        case 'ingreso':
-            return handle_ingreso()
-        case 'salida':
-            return handle_salida()
-        case 'devolucion':
-            return handle_devolucion()
-        case 'transferencia':
-            return handle_transfer()
-        case 'produccion':
-            return handle_produccion()
+    if tipo not in BOOTSTRAP_HANDLERS:
+        return JsonResponse({'data': None}, status=400)
+    handler, _ = BOOTSTRAP_HANDLERS[tipo]
+    key = f'bootstrap:{bootstrap_etag(request)}'
+    contenido = cache.get(key)
+    if contenido is None:
+        contenido = handler().content
+        cache.set(key, contenido, getattr(settings, 'BOOTSTRAP_CACHE_TTL', 300))
+    response = HttpResponse(contenido, content_type='application/json')
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
         
 class TransactionView(GroupRequiredMixin, View):
     required_group =(
@@ -791,55 +847,47 @@ class TransactionView(GroupRequiredMixin, View):
                 Q(client__rut__startswith=q)|
                 Q(client__bussiness_name__icontains=q)
             )
-        qs = qs.order_by(order_by_field)
-        paginator = Paginator(qs, per_page)
-        page_number = request.GET.get("page")
-        try:
-            page_obj = paginator.get_page(page_number)
-        except PageNotAnInteger:
-            page_obj = paginator.page(1)
-        except EmptyPage:
-            page_obj = paginator.page(paginator.num_pages)
+        if modo_cursor(request):
+            orden = order_by_field if sort_by == 'date' else '-date'
+            page_obj = CursorPaginator(qs, per_page, ordering=(orden,)).page(request.GET.get("cursor"))
+            total = conteo_aproximado(qs)
+        else:
+            qs = qs.order_by(order_by_field)
+            paginator = Paginator(qs, per_page)
+            page_number = request.GET.get("page")
+            try:
+                page_obj = paginator.get_page(page_number)
+            except PageNotAnInteger:
+                page_obj = paginator.page(1)
+            except EmptyPage:
+                page_obj = paginator.page(paginator.num_pages)
+            total = paginator.count
         params_pagination = request.GET.copy()
         params_pagination.pop("page", None)
+        params_pagination.pop("cursor", None)
         querystring_pagination = params_pagination.urlencode()
         params_sorting = request.GET.copy()
         params_sorting.pop("page", None)
+        params_sorting.pop("cursor", None)
         params_sorting.pop("sort_by", None)
         params_sorting.pop("order", None)
         querystring_sorting = params_sorting.urlencode()
-        products = transaction_service.inventario.product_class.objects.all().filter(is_active=True)
-        raw_materials = transaction_service.inventario.raw_class.objects.all().filter(is_active=True)
-        clients = client_service.list_actives()
-        transactions = transaction_service.list()
-        productos_unicos = len(products)
-        stock = 0
-        inventarios = transaction_service.inventario.list()
-        for i in inventarios:
-            stock += i.stock_total
-        today = []
-        for t in transactions:
-            t.date = t.date.date()
-            if t.date == date.today():
-                today.append(t)
-        transactions_today = len(today)
+        kpis = transaction_service.kpis()
         return render(request,'transactions/transaction.html',{
-            'products': products, 
-            'raw_materials': raw_materials,
-            'clients': clients, 
-            'transactions': transactions, 
-            'transactions_today': transactions_today,
-            'stock': stock,
-            'productos_unicos': productos_unicos,
+            'transactions_today': kpis['transactions_today'],
+            'stock': kpis['stock'],
+            'productos_unicos': kpis['productos_unicos'],
             "page_obj": page_obj,  
             "q": q,
             "per_page": per_page,
-            "total": qs.count(),
+            "total": total,
+            "paginacion_cursor": modo_cursor(request),
             "querystring": querystring_pagination, 
             "querystring_sorting": querystring_sorting,
             "current_sort_by": sort_by,
             "current_order": order,
             "order_next": "desc" if order == "asc" else "asc",
+            "idempotency_key": uuid.uuid4().hex,
             })
 
     def post(self, request, *args, **kwargs):
@@ -848,13 +896,12 @@ class TransactionView(GroupRequiredMixin, View):
             'Acceso limitado a Ventas',
             "Acceso limitado a Produccion",
         )
-        user = request.user
-        if not user.groups.filter(name__in=required_group).exists():
+        if not autorizacion(request.user).en_grupo(*required_group):
             return redirect('transaction_list')
         transaction_service.create_transaction(request)
         return redirect('transaction_list')
         
-class TransactionExportView(GroupRequiredMixin, View):
+class TransactionExportView(GroupRequiredMixin, ExportMixin, View):
     required_group =(
         'Acceso Completo',
         'Acceso limitado a Ventas',
@@ -862,10 +909,13 @@ class TransactionExportView(GroupRequiredMixin, View):
         "Acceso limitado a Produccion",
         "Acceso limitado a Finanzas"
     )
-    def get(self, request):
-        q = (request.GET.get("q") or "").strip()
-        qs = transaction_service.list().order_by('date')
-        limit = request.GET.get("limit")
+    headers = ["Tipo", "Cliente", "Código", "Fecha", "Vencimiento", "Observaciones"]
+    filename_prefix = "Lilis_Transacciones"
+
+    def get_export_queryset(self, params):
+        q = (params.get("q") or "").strip()
+        qs = transaction_service.list().select_related('client').order_by('date')
+        limit = params.get("limit")
         if q:
             qs = qs.filter(
                 Q(type__icontains=q)|
@@ -878,22 +928,17 @@ class TransactionExportView(GroupRequiredMixin, View):
                 qs = qs[:limit]
             except ValueError:
                 pass
-        data_rows = []
-        for transaction in qs:
-            if transaction.client:
-                c = transaction.client.rut
-            else:
-                c = "Lilis"
-            data_rows.append([
-                transaction.type,
-                c,
-                transaction.code,
-                transaction.date.strftime("%Y-%m-%d"),
-                transaction.expiration_date.strftime("%Y-%m-%d") if transaction.expiration_date else "",
-                transaction.notes,
-            ])
-        headers = ["Tipo", "Cliente", "Código", "Fecha", "Vencimiento", "Observaciones"]
-        return generate_excel_response(headers, data_rows, "Lilis_Transacciones")
+        return qs
+
+    def export_row(self, transaction):
+        return [
+            transaction.type,
+            transaction.client.rut if transaction.client else "Lilis",
+            transaction.code,
+            transaction.date.strftime("%Y-%m-%d"),
+            transaction.expiration_date.strftime("%Y-%m-%d") if transaction.expiration_date else "",
+            transaction.notes,
+        ]
 
 @login_required
 @permission_or_redirect('Sells.change_transaction','dashboard', 'No teni permiso')
@@ -902,7 +947,8 @@ def transaction_update(request, id):
     if request.method == 'POST':
         form = transaction_service.form_class(request.POST, base_transaction=original)
         if form.is_valid():
-            form.save() 
+            transaction = form.save() 
+            transaction_service.actualizar_documentos_busqueda([transaction.id])
             return redirect('transaction_list')
     else:
         form = transaction_service.form_class(base_transaction=original)
@@ -936,24 +982,31 @@ def product_batch_list(request):
             Q(inventario__producto__sku__icontains=q)
         )
         
-    qs = qs.order_by(order_by_field)
+    if modo_cursor(request):
+        page_obj = CursorPaginator(qs, per_page, ordering=('-fecha_creacion',)).page(request.GET.get("cursor"))
+        total = conteo_aproximado(qs)
+    else:
+        qs = qs.order_by(order_by_field)
 
-    paginator = Paginator(qs, per_page)
-    page_number = request.GET.get("page")
+        paginator = Paginator(qs, per_page)
+        page_number = request.GET.get("page")
 
-    try:
-        page_obj = paginator.get_page(page_number)
-    except PageNotAnInteger:
-        page_obj = paginator.page(1)
-    except EmptyPage:
-        page_obj = paginator.page(paginator.num_pages)
+        try:
+            page_obj = paginator.get_page(page_number)
+        except PageNotAnInteger:
+            page_obj = paginator.page(1)
+        except EmptyPage:
+            page_obj = paginator.page(paginator.num_pages)
+        total = qs.count()
 
     params_pagination = request.GET.copy()
     params_pagination.pop("page", None)
+    params_pagination.pop("cursor", None)
     querystring_pagination = params_pagination.urlencode()
 
     params_sorting = request.GET.copy()
     params_sorting.pop("page", None)
+    params_sorting.pop("cursor", None)
     params_sorting.pop("sort_by", None)
     params_sorting.pop("order", None)
     querystring_sorting = params_sorting.urlencode()
@@ -962,7 +1015,8 @@ def product_batch_list(request):
         "page_obj": page_obj,  
         "q": q,
         "per_page": per_page,
-        "total": qs.count(),
+        "total": total,
+        "paginacion_cursor": modo_cursor(request),
         
         "querystring": querystring_pagination, 
         
@@ -1002,38 +1056,6 @@ def product_batch_create(request):
         'products': products,
     })
 
-def transaction_search(request):
-    q = (request.GET.get("q") or "").strip()
-    filtros = Q(client__fantasy_name__icontains=q) | \
-              Q(client__bussiness_name__icontains=q) | \
-              Q(client__rut__icontains=q) | \
-              Q(type__icontains=q) | \
-              Q(code__icontains=q) | \
-              Q(details__batch__inventario__producto__sku__icontains=q) | \
-              Q(details__batch__inventario__producto__name__icontains=q) | \
-              Q(details__batch__inventario__material__sku__icontains=q) | \
-              Q(details__batch__inventario__material__name__icontains=q) | \
-              Q(details__serie__inventario__producto__sku__icontains=q) | \
-              Q(details__serie__inventario__producto__name__icontains=q) | \
-              Q(details__serie__inventario__material__sku__icontains=q) | \
-              Q(details__serie__inventario__material__name__icontains=q)
-    
-    qs_ids = transaction_service.model.objects.filter(filtros).values_list('id', flat=True).distinct()
-    
-    transactions = transaction_service.model.objects.filter(id__in=qs_ids)
-    data = []
-    for t in transactions:
-        data.append({
-            'id': t.id,
-            'fecha': t.date.strftime("%Y-%m-%d") if hasattr(t, 'date') else 'N/A',
-            'tipo': t.type,
-            'codigo': t.code,
-            'cliente': t.client.fantasy_name,
-            'producto_info': obtener_info_producto_material(t),
-        })
-        
-    return JsonResponse({'data': data}, safe=False)
-
 def post_process_transaction_results(qs_values):
     resultados_finales = {}
     
@@ -1070,78 +1092,46 @@ def post_process_transaction_results(qs_values):
     return list(resultados_finales.values())
 
 
-def obtener_info_producto_material(t):
-    item = None
-    details = transaction_service.transaction_detail.objects.filter(transaction=t).select_related('batch', 'serie').first()
-    if details:
-        if details.batch:
-            item = details.batch.inventario
-        if details.serie:
-            item = details.serie.inventario
-    else:
-        return None
-    if item:
-        try:
-            return item.producto.sku
-        except:
-            return item.materia_prima.sku
-    return None
+def transaction_to_dict(row):
+    return {
+        'id': row['id'],
+        'fecha': row['date'].strftime("%Y-%m-%d") if row['date'] else 'N/A',
+        'tipo': row['type'],
+        'codigo': row['code'],
+        'cliente': row['cliente'],
+        'sku': row['sku'],
+        'bodega': row['bodega'],
+        'cantidad' : row['quantity'],
+        'vencimiento': row['expiration_date']
+    }
+
+def transactions_response(request, qs):
+    filas = transaction_service.listado(qs).order_by('-date', '-id')
+    if request.GET.get('format') == 'ndjson':
+        lineas = (
+            json.dumps(transaction_to_dict(row), cls=DjangoJSONEncoder) + '\n'
+            for row in filas.iterator(chunk_size=2000)
+        )
+        return StreamingHttpResponse(lineas, content_type='application/x-ndjson')
+    if 'page' not in request.GET and 'per_page' not in request.GET:
+        return JsonResponse({'data': [transaction_to_dict(row) for row in filas]}, safe=False)
+    try:
+        page = max(int(request.GET.get('page', 1)), 1)
+        per_page = min(max(int(request.GET.get('per_page', 100)), 1), 1000)
+    except ValueError:
+        page, per_page = 1, 100
+    inicio = (page - 1) * per_page
+    rows = list(filas[inicio:inicio + per_page + 1])
+    return JsonResponse({
+        'data': [transaction_to_dict(row) for row in rows[:per_page]],
+        'page': page,
+        'per_page': per_page,
+        'has_next': len(rows) > per_page,
+    }, safe=False)
 
 def transaction_search(request):
     q = (request.GET.get("q") or "").strip()
-    qs = transaction_service.model.objects.filter(
-        Q(client__fantasy_name__icontains=q) |
-        Q(client__bussiness_name__icontains=q) |
-        Q(client__rut__icontains=q)|
-        Q(type__icontains=q)|
-        Q(code__icontains=q)|
-        Q(details__batch__inventario__producto__sku__icontains=q)|
-        Q(details__batch__inventario__producto__name__icontains=q)|
-        Q(details__batch__inventario__materia_prima__sku__icontains=q)|
-        Q(details__batch__inventario__materia_prima__name__icontains=q)|
-        Q(details__serie__inventario__producto__sku__icontains=q)|
-        Q(details__serie__inventario__producto__name__icontains=q)|
-        Q(details__serie__inventario__materia_prima__sku__icontains=q)|
-        Q(details__serie__inventario__materia_prima__name__icontains=q)
-    ).order_by('-date').distinct()
-    data = []
-    for t in qs:
-        if t in data:
-            continue
-        try:
-            rut = t.client.rut
-        except:
-            rut = "Lilis"
-        data.append({
-            'id': t.id,
-            'fecha': t.date.strftime("%Y-%m-%d") if hasattr(t, 'date') else 'N/A',
-            'tipo': t.type,
-            'codigo': t.code,
-            'cliente': rut,
-            'sku': obtener_info_producto_material(t),
-            'bodega': t.warehouse.name,
-            'cantidad' : t.quantity,
-            'vencimiento': t.expiration_date
-        })
-    return JsonResponse({'data': data}, safe=False)
+    return transactions_response(request, transaction_service.buscar(q))
 
 def transaction_all(request):
-    data = []
-    transactions = transaction_service.list().order_by('-date')
-    for t in transactions:
-        try:
-            rut = t.client.rut
-        except:
-            rut = "Lilis"
-        data.append({
-            'id': t.id,
-            'fecha': t.date.strftime("%Y-%m-%d") if hasattr(t, 'date') else 'N/A',
-            'tipo': t.type,
-            'codigo': t.code,
-            'cliente': rut,
-            'sku': obtener_info_producto_material(t),
-            'bodega': t.warehouse.name,
-            'cantidad' : t.quantity,
-            'vencimiento': t.expiration_date
-        })
-    return JsonResponse({'data': data}, safe=False)
\ No newline at end of file
+    return transactions_response(request, transaction_service.list())